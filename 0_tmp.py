@@ -1,8 +1,8 @@
 import os
-import requests
-import json
-import base64
-import binascii
+import http_client
+from uuid_codec import decompress_uuid
+import config_store
+import json_codec
 import urllib3
 import time
 from concurrent.futures import ThreadPoolExecutor
@@ -15,6 +15,7 @@ SETTINGS_URL = BASE_RES_URL + "src/settings.4229e.json"
 
 TARGET_BUNDLES = ["GardenCommon"] 
 SAVE_DIR = "Raw_Assets_Binary" # 名字改一下，表示这里面可能是二进制文件
+MAX_WORKERS = 32
 
 HEADERS = {
     "Host": "game.sweet-home-maid.com",
@@ -31,29 +32,6 @@ HEADERS = {
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 print_lock = threading.Lock()
 
-def decompress_uuid(uuid_str):
-    """
-    【核心修正】
-    必须把 Cocos 的 22位 短码还原成 36位 标准 UUID
-    因为服务器上的文件夹和文件名都是用的 36位 UUID！
-    """
-    if len(uuid_str) == 36: return uuid_str
-    if len(uuid_str) != 22 and len(uuid_str) != 23: return uuid_str
-    
-    # 移除可能存在的下划线前缀或后缀处理
-    temp_uuid = uuid_str[1:] if uuid_str.startswith('_') else uuid_str
-    
-    try:
-        b64 = temp_uuid[2:].replace('-', '+').replace('_', '/')
-        pad = len(b64) % 4
-        if pad > 0: b64 += '=' * (4 - pad)
-        data = base64.b64decode(b64)
-        hex_s = binascii.hexlify(data).decode('utf-8')
-        prefix = temp_uuid[:2]
-        return f"{prefix}{hex_s[0:6]}-{hex_s[6:10]}-{hex_s[10:14]}-{hex_s[14:18]}-{hex_s[18:]}"
-    except:
-        return uuid_str
-
 def decode_versions(uuids, version_array):
     v_map = {}
     if not version_array: return v_map
@@ -66,12 +44,8 @@ def decode_versions(uuids, version_array):
 
 def try_download(url, save_path):
     try:
-        resp = requests.get(url, headers=HEADERS, verify=False, timeout=10)
-        if resp.status_code == 200:
-            with open(save_path, 'wb') as f:
-                f.write(resp.content)
-            return True, resp.status_code
-        return False, resp.status_code
+        status = http_client.download_to_file(url, save_path, headers=HEADERS, timeout=10)
+        return status == 200, status
     except Exception as e:
         return False, str(e)
 
@@ -122,9 +96,10 @@ def process_file_task(args):
 
 def main():
     print(f"=== DMM 资源下载器 (.cconb 适配版) ===")
+    http_client.configure(MAX_WORKERS)
     
     try:
-        settings = requests.get(SETTINGS_URL, headers=HEADERS, verify=False, timeout=10).json()
+        settings = json_codec.loads(http_client.get(SETTINGS_URL, headers=HEADERS, verify=False, timeout=10).content)
         bundle_vers = settings.get('assets', {}).get('bundleVers', {})
     except Exception as e:
         print(f"[X] Settings 获取失败: {e}")
@@ -137,10 +112,8 @@ def main():
             print(f"    [!] 包名未找到")
             continue
 
-        try:
-            config_url = f"{BASE_RES_URL}assets/{bundle_name}/config.{bundle_hash}.json"
-            config = requests.get(config_url, headers=HEADERS, verify=False, timeout=10).json()
-        except:
+        config = config_store.load_config(BASE_RES_URL, bundle_name, bundle_hash, headers=HEADERS)
+        if config is None:
             print(f"    [X] Config 下载失败")
             continue
 
@@ -160,12 +133,13 @@ def main():
         for raw_uuid, ver in import_map.items():
             tasks.append((raw_uuid, ver, bundle_name, bundle_save_dir, counter, total))
             
-        with ThreadPoolExecutor(max_workers=32) as executor:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
             executor.map(process_file_task, tasks)
 
     print(f"\n\n✅ 任务结束。")
+    print(http_client.format_stats())
     print(f"请检查 '{SAVE_DIR}' 文件夹。")
-    print("注意：下载下来的可能是 .cconb 文件，这是一种二进制格式，后续需要反序列化才能看到里面的 Spine 数据。")
+    print("注意：下载下来的可能是 .cconb 二进制文件，可用 ccon_reader / cocos_import.read_file 读取，Spine 提取脚本也会自动识别。")
     print("先确认文件是否有内容（大小 > 0KB）。")
 
 if __name__ == "__main__":
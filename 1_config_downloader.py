@@ -1,6 +1,10 @@
 import os
-import json
-import requests
+import json_codec
+import http_client
+import verifier
+import retry_scheduler
+import metrics
+import asset_index
 import urllib3
 import concurrent.futures
 from tqdm import tqdm
@@ -28,20 +32,18 @@ def get_settings_locally():
     if os.path.exists(filename):
         print(f"[-] 📄 发现本地 Settings ({filename})，直接读取...")
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return json_codec.load_path(filename)
         except Exception as e:
             print(f"[!] 本地 Settings 读取失败，尝试重新下载: {e}")
 
     # 2. 下载并保存
     print(f"[-] ☁️ 正在下载 Settings...")
     try:
-        resp = requests.get(SETTINGS_URL, headers=HEADERS, verify=False, timeout=15)
+        resp = http_client.get(SETTINGS_URL, headers=HEADERS, verify=False, timeout=15)
         if resp.status_code == 200:
-            data = resp.json()
+            data = json_codec.loads(resp.content)
             # 保存到本地
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False)
+            json_codec.dump_path(filename, data)
             print(f"[-] ✅ Settings 已保存至本地: {filename}")
             return data
         else:
@@ -52,6 +54,11 @@ def get_settings_locally():
         return None
 
 def download_config_file(args):
+    with metrics.task(args[0]) as t:
+        t.ok = fetch_config_file(args)
+        return t.ok
+
+def fetch_config_file(args):
     bundle_name, bundle_ver = args
     save_dir = os.path.join(DOWNLOAD_ROOT, bundle_name)
     os.makedirs(save_dir, exist_ok=True)
@@ -59,26 +66,24 @@ def download_config_file(args):
     filename = f"config.{bundle_ver}.json"
     save_path = os.path.join(save_dir, filename)
     
-    # [核心修改] 断点续传：如果文件存在且有内容，直接跳过
-    if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
+    # [核心修改] 断点续传：如果文件存在且内容与版本 hash 一致 (或无法校验)，直接跳过
+    if verifier.existing_ok(save_path, bundle_ver):
         return True # 已存在，视为成功
 
     url = f"{BASE_RES_URL}assets/{bundle_name}/{filename}"
     
+    # 5xx / 超时 / 内容与版本 hash 不符时退避后重新下载同一个 URL，最多 MAX_ATTEMPTS 次
     try:
-        resp = requests.get(url, headers=HEADERS, verify=False, timeout=10)
-        if resp.status_code == 200:
-            with open(save_path, 'wb') as f:
-                f.write(resp.content)
-            return True
-        else:
-            return False
+        return retry_scheduler.call_with_retry(http_client.fetch_to_file, url, save_path, headers=HEADERS, timeout=10,
+                                               expected_hash=bundle_ver, on_retry=metrics.record_retry)
     except Exception as e:
         # print(f"Error downloading {bundle_name}: {e}")
         return False
 
 def main():
     print("=== DMM Config 文件抓取器 (本地缓存版) ===")
+    http_client.configure(MAX_WORKERS)
+    metrics.start("config", MAX_WORKERS)
     
     settings = get_settings_locally()
     if not settings:
@@ -105,5 +110,12 @@ def main():
 
     print(f"\n✅ 全部完成！Config 文件保存在: {os.path.abspath(DOWNLOAD_ROOT)}")
 
+    # 重新编译全局资源索引，后续脚本直接查询，无需再解析 Config
+    count = asset_index.build_index(DOWNLOAD_ROOT, bundle_vers=bundle_vers)
+    print(f"[-] 资源索引已更新: {count} 条 -> {os.path.abspath(asset_index.INDEX_FILE)}")
+    print(http_client.format_stats())
+    metrics.finish()
+    print(metrics.format_stats())
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,13 @@
 import os
-import json
-import requests
-import base64
-import binascii
+import json_codec
+import http_client
+import verifier
+import retry_scheduler
+import metrics
+from uuid_codec import decompress_uuid
+import manifest
+import asset_index
+import cocos_import
 import urllib3
 import concurrent.futures
 from tqdm import tqdm
@@ -21,96 +26,67 @@ HEADERS = {
 # ===============================================
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-EXISTING_UUIDS = set()
+MANIFEST = None  # 在 main 中打开
 
 def get_settings_filename():
     return os.path.basename(SETTINGS_URL)
 
-def decompress_uuid(uuid_str):
-    suffix = ""
-    base_uuid = uuid_str
-    if "@" in uuid_str:
-        parts = uuid_str.split("@", 1)
-        base_uuid = parts[0]
-        suffix = "@" + parts[1]
-
-    real_base = base_uuid
-    if len(base_uuid) == 22 or len(base_uuid) == 23:
-        temp_uuid = base_uuid[1:] if base_uuid.startswith('_') else base_uuid
-        try:
-            b64 = temp_uuid[2:].replace('-', '+').replace('_', '/')
-            pad = len(b64) % 4
-            if pad > 0: b64 += '=' * (4 - pad)
-            data = base64.b64decode(b64)
-            hex_s = binascii.hexlify(data).decode('utf-8')
-            prefix = temp_uuid[:2]
-            real_base = f"{prefix}{hex_s[0:6]}-{hex_s[6:10]}-{hex_s[10:14]}-{hex_s[14:18]}-{hex_s[18:]}"
-        except:
-            pass
-    return real_base + suffix
-
-def scan_local_files():
-    """ 建立本地文件索引，实现极速跳过 """
-    print(f"[-] 正在索引本地文件: {os.path.abspath(SAVE_IMPORT_ROOT)}")
-    count = 0
-    if not os.path.exists(SAVE_IMPORT_ROOT):
-        return
-        
-    for root, dirs, files in os.walk(SAVE_IMPORT_ROOT):
-        for file in files:
-            if file.endswith(".json"):
-                try:
-                    name_part = file.replace(".json", "")
-                    if "." in name_part:
-                        candidate_uuid = name_part.rsplit(".", 1)[0]
-                        EXISTING_UUIDS.add(candidate_uuid)
-                    EXISTING_UUIDS.add(name_part)
-                    count += 1
-                except:
-                    pass
-    print(f"[-] 索引完成！本地已有 {count} 个文件。")
-
-def download_file(url, path):
-    # [核心修改] 双重检查：如果物理文件存在，坚决不下载
-    if os.path.exists(path) and os.path.getsize(path) > 0:
+def download_file(url, path, expected_hash=None, overwrite=False):
+    # [核心修改] 双重检查：如果物理文件存在且内容与版本 hash 一致，坚决不下载 (调用方已经校验过时传 overwrite，避免重复读文件)
+    if not overwrite and verifier.existing_ok(path, expected_hash):
         return True
 
+    # 404 返回 False (换下一种写法的 URL)；5xx / 超时 / 内容不符在本线程退避后重新下载同一个 URL，用尽后抛出 RetryLater
     try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        resp = requests.get(url, headers=HEADERS, verify=False, timeout=10)
-        if resp.status_code == 200:
-            with open(path, 'wb') as f:
-                f.write(resp.content)
-            return True
-        return False
+        return retry_scheduler.call_with_retry(http_client.fetch_to_file, url, path, headers=HEADERS, timeout=10,
+                                               expected_hash=expected_hash, on_retry=metrics.record_retry)
+    except retry_scheduler.RetryLater:
+        raise
     except:
         return False
 
 def worker_task(args):
+    with metrics.task(args[0], "import") as t:
+        t.ok = fetch_import(args)
+        return t.ok
+
+def fetch_import(args):
+    """ 返回是否已有 / 下载到该 import 文件 """
     bundle_name, compressed_uuid, import_ver = args
     import_prefix = compressed_uuid[:2]
     real_uuid = decompress_uuid(compressed_uuid)
 
-    # 1. 索引检查 (内存级跳过)
-    if real_uuid in EXISTING_UUIDS: return
-    if compressed_uuid in EXISTING_UUIDS: return
-        
-    # 2. 物理路径检查 (磁盘级跳过，针对长UUID路径)
-    rel_path_long = f"{bundle_name}/import/{import_prefix}/{real_uuid}.{import_ver}.json"
-    save_path_long = os.path.join(SAVE_IMPORT_ROOT, rel_path_long)
-    if os.path.exists(save_path_long) and os.path.getsize(save_path_long) > 0:
-        return
+    # 清单里没有或未校验过的才会走到这里：先 .json 再二进制 .cconb，各自先长 UUID 再短 UUID
+    rel_paths = [f"{bundle_name}/import/{import_prefix}/{u}.{import_ver}{ext}"
+                 for ext in cocos_import.IMPORT_EXTS for u in (real_uuid, compressed_uuid)]
 
-    # 下载
-    url_long = f"{BASE_RES_URL}assets/{rel_path_long}"
-    if download_file(url_long, save_path_long):
-        return
+    verified = verifier.should_verify(import_ver)
+
+    # 1. 清单建立之前就已下载的旧文件 / 清单中未校验的文件：校验内容后补记到清单，下次规划时直接跳过 (损坏的重新下载)
+    for rel_path in rel_paths:
+        save_path = os.path.join(SAVE_IMPORT_ROOT, rel_path)
+        if verifier.existing_ok(save_path, import_ver):
+            MANIFEST.record(bundle_name, compressed_uuid, "import", import_ver, save_path,
+                            ext=os.path.splitext(save_path)[1], verified=verified)
+            return True
+
+    # 2. 下载 (第 1 步已经校验过本地文件，不再重复读取)
+    for rel_path in rel_paths:
+        save_path = os.path.join(SAVE_IMPORT_ROOT, rel_path)
+        try:
+            ok = download_file(f"{BASE_RES_URL}assets/{rel_path}", save_path, import_ver, overwrite=True)
+        except retry_scheduler.RetryLater:
+            # 源站一直出错 / 内容一直不符：换其他写法的 URL 也无济于事，本次放弃
+            return False
+        if ok:
+            MANIFEST.record(bundle_name, compressed_uuid, "import", import_ver, save_path,
+                            ext=os.path.splitext(save_path)[1], verified=verified)
+            return True
+    return False
 
-    # 尝试短UUID
-    rel_path_short = f"{bundle_name}/import/{import_prefix}/{compressed_uuid}.{import_ver}.json"
-    save_path_short = os.path.join(SAVE_IMPORT_ROOT, rel_path_short)
-    url_short = f"{BASE_RES_URL}assets/{rel_path_short}"
-    download_file(url_short, save_path_short)
+def is_known(known, uuid, ver):
+    entry = known.get((uuid, ver))
+    return entry is not None and verifier.trusted(entry[3], ver)
 
 def parse_version_array(uuids, ver_array):
     v_map = {}
@@ -124,56 +100,78 @@ def parse_version_array(uuids, ver_array):
 
 def main():
     print("=== DMM Import 智能补全下载器 (Pre-Scan Mode) ===")
+    http_client.configure(MAX_WORKERS)
+    metrics.start("import", MAX_WORKERS)
     
     # 0. 检查 Settings (仅为了确认连接性或后续扩展，本脚本主要依赖 Config)
     local_settings = get_settings_filename()
     if not os.path.exists(local_settings):
         print(f"[!] 提示：未找到本地 {local_settings}，建议先运行脚本 1 获取最新配置。")
     
-    scan_local_files()
+    global MANIFEST
+    MANIFEST = manifest.DownloadManifest()
+    print(f"[-] 下载清单: {os.path.abspath(MANIFEST.path)} (已记录 {MANIFEST.count('import')} 个 import)")
 
     if not os.path.exists(LOCAL_CONFIG_DIR):
         print(f"❌ 找不到配置目录 {LOCAL_CONFIG_DIR}")
         return
 
     print("[-] 正在解析任务列表...")
-    config_files = []
-    for root, dirs, files in os.walk(LOCAL_CONFIG_DIR):
-        for f in files:
-            if f.startswith("config.") and f.endswith(".json"):
-                config_files.append(os.path.join(root, f))
-    
     tasks = []
     skipped_count = 0
-    
-    for cfg_path in tqdm(config_files, unit="cfg"):
-        try:
-            bundle_name = os.path.basename(os.path.dirname(cfg_path))
-            with open(cfg_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            uuids = data.get('uuids', [])
-            import_vers = parse_version_array(uuids, data.get('versions', {}).get('import', []))
-            
-            for uuid, ver in import_vers.items():
-                real = decompress_uuid(uuid)
-                # 检查索引
-                if (real in EXISTING_UUIDS) or (uuid in EXISTING_UUIDS):
+
+    # 有全局索引时直接按 Bundle 取 import hash，不再逐个解析 Config
+    index = asset_index.AssetIndex.load()
+    if index is not None:
+        print(f"[-] 使用全局索引: {len(index.bundle_names)} 个 Bundle，{len(index)} 条资源")
+        for bundle_name in tqdm(index.bundle_names, unit="pkg"):
+            # 按 Bundle 批量查询清单，(uuid, hash) 命中且已校验即跳过，未校验的交给下载器读一遍文件
+            known = MANIFEST.lookup_bundle(bundle_name, "import")
+            for e in index.bundle_assets(bundle_name):
+                if not e.import_hash:
+                    continue
+                if is_known(known, e.uuid, e.import_hash):
                     skipped_count += 1
                 else:
-                    tasks.append((bundle_name, uuid, ver))
-        except:
-            pass
+                    tasks.append((bundle_name, e.uuid, e.import_hash))
+    else:
+        config_files = []
+        for root, dirs, files in os.walk(LOCAL_CONFIG_DIR):
+            for f in files:
+                if f.startswith("config.") and f.endswith(".json"):
+                    config_files.append(os.path.join(root, f))
+
+        for cfg_path in tqdm(config_files, unit="cfg"):
+            try:
+                bundle_name = os.path.basename(os.path.dirname(cfg_path))
+                data = json_codec.load_path(cfg_path)
+
+                uuids = data.get('uuids', [])
+                import_vers = parse_version_array(uuids, data.get('versions', {}).get('import', []))
+                known = MANIFEST.lookup_bundle(bundle_name, "import")
+
+                for uuid, ver in import_vers.items():
+                    if is_known(known, uuid, ver):
+                        skipped_count += 1
+                    else:
+                        tasks.append((bundle_name, uuid, ver))
+            except:
+                pass
 
     print(f"\n✅ 统计结果：本地已有 {skipped_count}，需要下载 {len(tasks)}")
 
     if not tasks:
+        MANIFEST.close()
         return
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         list(tqdm(executor.map(worker_task, tasks), total=len(tasks), unit="file"))
+    MANIFEST.close()
 
     print("\n✅ 补全完成！")
+    print(http_client.format_stats())
+    metrics.finish()
+    print(metrics.format_stats())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
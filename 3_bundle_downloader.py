@@ -1,12 +1,16 @@
 import os
-import requests
-import json
-import base64
-import binascii
+import http_client
+import verifier
+import metrics
+from uuid_codec import decompress_uuid
+import ext_predictor
+import manifest
+import bundle_scheduler
+import config_store
+import asset_index
+import json_codec
+import cocos_import
 import urllib3
-import concurrent.futures
-import time
-from tqdm import tqdm
 
 # ================= ⚙️ 配置区域 =================
 BASE_RES_URL = "https://game.sweet-home-maid.com/r/7LCHDxB8msHV/"
@@ -14,7 +18,15 @@ SETTINGS_URL = BASE_RES_URL + "src/settings.4229e.json"
 DOWNLOAD_ROOT = "assets_restored" 
 LOCAL_IMPORT_ROOT = "imports"  # 指定 Script 2 下载的 import 文件夹
 OVERWRITE = False
-MAX_WORKERS = 8 
+MAX_WORKERS = 16  # 并发上限，实际在途请求数由 http_client 按服务器反馈自适应调整
+
+# 后缀试探方式: "serial" 按预测顺序逐个 GET；
+# "race" 先 GET 预测的第一个候选，落空后再对其余候选并发 HEAD，只 GET 胜出的那个 (404 多时更快，但请求更多)
+# config/import 都解析不出后缀的资源使用 UNRESOLVED_PROBE_MODE，其余类型可在下面单独指定
+UNRESOLVED_PROBE_MODE = "serial"
+PROBE_MODE_BY_TYPE = {
+    # "cc.TextAsset": "race",  # .atlas / .txt / .text 混用，预测经常落空时可以打开
+}
 
 # 🎯 指定下载目标 (测试用)，空列表代表全部
 # TARGET_BUNDLES = ["AdvStillstill102030"] 
@@ -29,6 +41,10 @@ HEADERS = {
 # ===============================================
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+EXT_PREDICTOR = ext_predictor.ExtensionPredictor()
+metrics.register_collector("ext_predictor", EXT_PREDICTOR.stats)
+MANIFEST = None  # 在 main 中打开
+ASSET_INDEX = None  # 在 main 中加载，没有索引时逐个解析 Config
 
 # --- 辅助函数 ---
 def get_settings_locally():
@@ -36,68 +52,58 @@ def get_settings_locally():
     if os.path.exists(filename):
         # print(f"[-] 📄 读取本地 Settings: {filename}") # 减少刷屏，这一行可以注释掉
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return json_codec.load_path(filename)
         except:
             pass
             
     print(f"[-] ☁️ 下载 Settings...")
     try:
-        resp = requests.get(SETTINGS_URL, headers=HEADERS, verify=False)
-        data = resp.json()
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+        resp = http_client.get(SETTINGS_URL, headers=HEADERS, verify=False)
+        data = json_codec.loads(resp.content)
+        json_codec.dump_path(filename, data)
         return data
     except Exception as e:
         print(f"[X] Settings 获取失败: {e}")
         return None
 
-def decompress_uuid(uuid_str):
-    if len(uuid_str) == 36: return uuid_str
-    if len(uuid_str) != 22 and len(uuid_str) != 23: return uuid_str
-    temp_uuid = uuid_str[1:] if uuid_str.startswith('_') else uuid_str
-    try:
-        b64 = temp_uuid[2:].replace('-', '+').replace('_', '/')
-        pad = len(b64) % 4
-        if pad > 0: b64 += '=' * (4 - pad)
-        data = base64.b64decode(b64)
-        hex_s = binascii.hexlify(data).decode('utf-8')
-        prefix = temp_uuid[:2]
-        return f"{prefix}{hex_s[0:6]}-{hex_s[6:10]}-{hex_s[10:14]}-{hex_s[14:18]}-{hex_s[18:]}"
-    except:
-        return uuid_str
-
-def decode_versions(uuids, version_array):
-    v_map = {}
-    if not version_array: return v_map
-    for i in range(0, len(version_array), 2):
-        idx = version_array[i]
-        ver = version_array[i+1]
-        if idx < len(uuids):
-            v_map[uuids[idx]] = ver
-    return v_map
-
-def download_native_file(url, path):
-    # [核心修改] 文件已存在则直接返回 True
-    if not OVERWRITE and os.path.exists(path) and os.path.getsize(path) > 0:
+def download_native_file(url, path, overwrite=False):
+    # URL 形如 <uuid>.<native hash><ext>，用其中的版本 hash 校验内容
+    expected_hash = verifier.hash_from_url(url)
+    # [核心修改] 文件已存在且内容与版本 hash 一致 (旧版本 / 损坏的文件会重新下载) 则直接返回 True
+    # 调用方已经校验过本地文件时传 overwrite，避免重复读取
+    if not (overwrite or OVERWRITE) and verifier.existing_ok(path, expected_hash):
         return True
 
-    retries = 3
-    for attempt in range(retries):
-        try:
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            resp = requests.get(url, headers=HEADERS, verify=False, timeout=15)
-            if resp.status_code == 200:
-                with open(path, 'wb') as f:
-                    f.write(resp.content)
-                return True
-            elif resp.status_code == 404:
-                return False
-            else:
-                time.sleep(1)
-        except:
-            time.sleep(1)
-    return False
+    # 404 直接返回 False；5xx / 429 / 超时 / 内容不符抛出 RetryLater，由调度器退避后重新入队，不在工作线程里 sleep
+    return http_client.fetch_to_file(url, path, headers=HEADERS, timeout=15, expected_hash=expected_hash)
+
+def get_probe_mode(known_type, resolved):
+    if known_type in PROBE_MODE_BY_TYPE:
+        return PROBE_MODE_BY_TYPE[known_type]
+    return "serial" if resolved else UNRESOLVED_PROBE_MODE
+
+def race_native_file(native_prefix_url, save_dir, real_name, exts_to_try):
+    """ 先下载预测的第一个后缀，落空后并发试探其余候选，只下载胜出者；返回 (命中后缀, 在候选中的位置) 或 None """
+    if not OVERWRITE:
+        # 只校验第一个已存在的候选 (按路径命名，其余后缀的同名文件基本不会有)，下面下载时不再重复读取
+        for probes, ext in enumerate(exts_to_try, 1):
+            path = os.path.join(save_dir, f"{real_name}{ext}")
+            if os.path.exists(path):
+                if verifier.existing_ok(path, verifier.hash_from_url(f"{native_prefix_url}{ext}")):
+                    return ext, probes
+                break
+    # 预测器命中时和 serial 一样只有一次 GET，不额外发 HEAD
+    first = exts_to_try[0]
+    if download_native_file(f"{native_prefix_url}{first}", os.path.join(save_dir, f"{real_name}{first}"), True):
+        return first, 1
+    rest = exts_to_try[1:]
+    idx = http_client.race_probe([f"{native_prefix_url}{ext}" for ext in rest], headers=HEADERS)
+    if idx is None:
+        return None
+    ext = rest[idx]
+    if download_native_file(f"{native_prefix_url}{ext}", os.path.join(save_dir, f"{real_name}{ext}"), True):
+        return ext, idx + 2
+    return None
 
 def get_extension_by_type(resource_type):
     if not resource_type: return None
@@ -119,26 +125,10 @@ def get_extension_by_type(resource_type):
 
 def parse_import_data_in_memory(json_data):
     try:
-        native_ext = None
-        resource_type = ""
-        # 简单兼容两种格式
-        if isinstance(json_data, list) and len(json_data) >= 6:
-            types_def = json_data[3]
-            instances = json_data[5]
-            if types_def and instances:
-                if isinstance(types_def[0], list) and len(types_def[0]) > 0:
-                     resource_type = types_def[0][0] 
-                fields = types_def[0][1] 
-                values = instances[0]     
-                if "_native" in fields:
-                    ext_idx = fields.index("_native") + 1
-                    if ext_idx < len(values): 
-                        native_ext = values[ext_idx]
-        elif isinstance(json_data, dict):
-            resource_type = json_data.get("__type__", "")
-            native_ext = json_data.get("_native")
-        if not native_ext:
-            native_ext = get_extension_by_type(resource_type)
+        imp = cocos_import.load(json_data)
+        native_ext = imp.field("_native")
+        if not native_ext and imp.root is not None:
+            native_ext = get_extension_by_type(imp.root.type)
         return native_ext
     except:
         return None
@@ -150,23 +140,25 @@ def process_asset_task(args):
     import_prefix = compressed_uuid[:2] 
     native_prefix = real_uuid[:2]
     
+    # 0. 清单中已有记录但未校验 (规划时重新入队) 的资源，后缀已知，先核对记录的那个文件
+    recorded = None if OVERWRITE else MANIFEST.lookup(bundle_name, compressed_uuid, "native", native_hash)
+
     # 1. 优先使用 Config 中已知的类型
     ext_from_config = get_extension_by_type(known_type)
     
     # 2. 尝试获取 Import 数据来解析后缀
     ext_from_import = None
-    if not ext_from_config and import_hash:
+    if not ext_from_config and not recorded and import_hash:
         # 优先查本地 imports 目录
         local_import_rel = f"{bundle_name}/import/{import_prefix}/{real_uuid}.{import_hash}.json"
-        local_import_path = os.path.join(LOCAL_IMPORT_ROOT, local_import_rel)
+        local_import_path = cocos_import.find_import_file(LOCAL_IMPORT_ROOT, bundle_name, compressed_uuid, real_uuid, import_hash)
         
         got_import = False
         import_data = None
 
-        if os.path.exists(local_import_path):
+        if local_import_path:
             try:
-                with open(local_import_path, 'r', encoding='utf-8') as f:
-                    import_data = json.load(f)
+                import_data = cocos_import.read_file(local_import_path)
                 got_import = True
             except:
                 pass
@@ -174,9 +166,9 @@ def process_asset_task(args):
         if not got_import:
             import_url = f"{BASE_RES_URL}assets/{local_import_rel}"
             try:
-                imp_resp = requests.get(import_url, headers=HEADERS, verify=False, timeout=10)
+                imp_resp = http_client.get(import_url, headers=HEADERS, verify=False, timeout=10)
                 if imp_resp.status_code == 200:
-                    import_data = imp_resp.json()
+                    import_data = cocos_import.parse_bytes(imp_resp.content)
                     got_import = True
             except:
                 pass
@@ -204,91 +196,73 @@ def process_asset_task(args):
         if g not in exts_to_try:
             exts_to_try.append(g)
 
+    # 4. 按历史命中记录重排，让第一次请求尽量命中
+    pred_key = EXT_PREDICTOR.make_key(known_type, bundle_name, path_info)
+    exts_to_try = EXT_PREDICTOR.order(pred_key, exts_to_try, pinned=ext_from_import)
+    if recorded and recorded[2]:
+        if recorded[2] in exts_to_try: exts_to_try.remove(recorded[2])
+        exts_to_try.insert(0, recorded[2])
+
     native_prefix_url = f"{BASE_RES_URL}assets/{bundle_name}/native/{native_prefix}/{real_uuid}.{native_hash}"
     found = False
 
-    for try_ext in exts_to_try:
+    # 5. 后缀无法确定时并发试探，一个 RTT 定位真实后缀
+    if get_probe_mode(known_type, ext_from_config or ext_from_import or recorded) == "race":
+        hit = race_native_file(native_prefix_url, save_dir, real_name, exts_to_try)
+        if hit:
+            EXT_PREDICTOR.record(pred_key, hit[0], hit[1])
+            MANIFEST.record(bundle_name, compressed_uuid, "native", native_hash,
+                            os.path.join(save_dir, f"{real_name}{hit[0]}"), ext=hit[0],
+                            verified=verifier.should_verify(native_hash))
+        return hit is not None
+
+    for probes, try_ext in enumerate(exts_to_try, 1):
         final_filename = f"{real_name}{try_ext}"
         final_path = os.path.join(save_dir, final_filename)
         
         if download_native_file(f"{native_prefix_url}{try_ext}", final_path):
+            EXT_PREDICTOR.record(pred_key, try_ext, probes)
+            MANIFEST.record(bundle_name, compressed_uuid, "native", native_hash, final_path, ext=try_ext,
+                            verified=verifier.should_verify(native_hash))
             found = True
             break 
     
     return found
 
-def process_bundle(bundle_name, bundle_ver, pbar_main):
-    if TARGET_BUNDLES and bundle_name not in TARGET_BUNDLES:
-        pbar_main.update(1)
-        return
-
-    # 这里不再更新 pbar_main 的描述，而是通过内层进度条展示
+def prepare_bundle(bundle_name, bundle_ver):
+    """ 获取 Config 并生成该 Bundle 的下载任务，失败返回 None """
     save_dir = os.path.join(DOWNLOAD_ROOT, bundle_name)
     os.makedirs(save_dir, exist_ok=True)
     
-    config_url = f"{BASE_RES_URL}assets/{bundle_name}/config.{bundle_ver}.json"
-    try:
-        resp = requests.get(config_url, headers=HEADERS, verify=False, timeout=10)
-        if resp.status_code != 200: 
-            pbar_main.update(1)
-            return
-        config = resp.json()
-    except:
-        pbar_main.update(1)
-        return
-
-    uuids = config.get('uuids', [])
-    paths = config.get('paths', {}) 
-    types = config.get('types', [])
-    
-    import_vers_map = decode_versions(uuids, config.get('versions', {}).get('import', []))
-    native_ver_arr = config.get('versions', {}).get('native', [])
+    # 全局索引中版本一致时直接使用；否则读取 1_config_downloader 已保存的同版本 Config，未命中才下载
+    if ASSET_INDEX is not None and ASSET_INDEX.has_bundle(bundle_name, bundle_ver):
+        entries = ASSET_INDEX.bundle_assets(bundle_name)
+    else:
+        config = config_store.load_config(BASE_RES_URL, bundle_name, bundle_ver, headers=HEADERS)
+        if config is None:
+            return None
+        entries = asset_index.entries_from_config(bundle_name, config)
     
+    # 清单中已记录且校验过的 (uuid, native hash) 直接跳过，不再逐个后缀 stat；未校验的重新入队读一遍文件
+    known = {} if OVERWRITE else MANIFEST.lookup_bundle(bundle_name, "native")
     tasks = []
     
-    for i in range(0, len(native_ver_arr), 2):
-        idx = native_ver_arr[i]
-        native_hash = native_ver_arr[i+1]
-        
-        if idx >= len(uuids): continue
+    for e in entries:
+        native_hash = e.native_hash
+        if not native_hash: continue
             
-        compressed_uuid = uuids[idx]
+        compressed_uuid = e.uuid
+        entry = known.get((compressed_uuid, native_hash))
+        if entry is not None and verifier.trusted(entry[3], native_hash): continue
         
-        path_info = None
-        resource_type = None 
-        
-        str_idx = str(idx)
-        if str_idx in paths:
-            data_arr = paths[str_idx]
-            if isinstance(data_arr, list) and len(data_arr) > 0:
-                path_info = data_arr[0]
-                if len(data_arr) > 1:
-                    type_idx = data_arr[1]
-                    if isinstance(type_idx, int) and type_idx < len(types):
-                        resource_type = types[type_idx] 
-
-        import_hash = import_vers_map.get(compressed_uuid, "")
-        tasks.append((bundle_name, compressed_uuid, native_hash, import_hash, save_dir, path_info, resource_type))
-        
-    if not tasks:
-        pbar_main.update(1)
-        return
-
-    # ================= ⚡ 进度条改进核心 =================
-    # 创建内层进度条，专门显示当前 Bundle 内文件的进度
-    # leave=False 表示跑完这个 Bundle 后，进度条会消失，保持界面清爽
-    # desc 显示当前正在跑哪个 Bundle
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_asset_task, task) for task in tasks]
+        tasks.append((bundle_name, compressed_uuid, native_hash, e.import_hash or "", save_dir, e.path, e.type))
         
-        # 使用 as_completed 实时更新内层进度条
-        for _ in tqdm(concurrent.futures.as_completed(futures), total=len(tasks), desc=f"   ⬇️ {bundle_name}", leave=False, unit="file"):
-            pass
-            
-    pbar_main.update(1)
+    return tasks
 
 def main():
     print("=== DMM 资源下载器 (Local-Import 优先版) ===")
+    http_client.configure(MAX_WORKERS)
+    metrics.start("native", MAX_WORKERS)
     print(f"[-] 保存位置: {os.path.abspath(DOWNLOAD_ROOT)}")
     print(f"[-] 辅助 Import 库: {os.path.abspath(LOCAL_IMPORT_ROOT)}")
     
@@ -301,19 +275,33 @@ def main():
         print(f"[X] Settings 解析失败: {e}")
         return
 
-    if TARGET_BUNDLES:
-        total_tasks = len(TARGET_BUNDLES)
-    else:
-        total_tasks = len(bundle_vers)
-
-    print(f"[-] 开始处理 {total_tasks} 个 Bundle...")
-
-    # 外层进度条：只显示 Bundle 计数
-    with tqdm(total=total_tasks, unit="pkg", desc="📦 Total Bundles") as pbar:
-        for b_name, b_ver in bundle_vers.items():
-            process_bundle(b_name, b_ver, pbar)
-
+    bundles_to_run = [b for b in bundle_vers if not TARGET_BUNDLES or b in TARGET_BUNDLES]
+    print(f"[-] 开始处理 {len(bundles_to_run)} 个 Bundle...")
+
+    global MANIFEST, ASSET_INDEX
+    MANIFEST = manifest.DownloadManifest()
+    ASSET_INDEX = asset_index.AssetIndex.load()
+
+    # ================= ⚡ 全局调度 =================
+    # 所有 Bundle 共用一个线程池，边解析 Config 边投递任务，
+    # 小 Bundle 不会让线程闲置，单个长尾资源也不会卡住后面的 Bundle
+    scheduler = bundle_scheduler.BundleScheduler(process_asset_task, MAX_WORKERS, total_bundles=len(bundles_to_run))
+    for b_name in bundles_to_run:
+        tasks = prepare_bundle(b_name, bundle_vers[b_name])
+        if tasks is None:
+            scheduler.skip_bundle()
+            continue
+        scheduler.submit_bundle(b_name, tasks)
+    scheduler.join()
+    print(scheduler.format_summary())
+
+    EXT_PREDICTOR.save()
+    MANIFEST.close()
     print("\n✅ 完成！")
+    print(EXT_PREDICTOR.format_stats())
+    print(http_client.format_stats())
+    metrics.finish()
+    print(metrics.format_stats())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
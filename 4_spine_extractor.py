@@ -1,183 +1,173 @@
 import os
-import json
-import base64
-import binascii
+import sys
+import fnmatch
+import concurrent.futures
+import json_codec
+import spine_locator
+import cocos_import
+import asset_index
+from tqdm import tqdm
 
 # ================= ⚙️ 配置区域 =================
 CONFIG_DIR = "configs"        
 IMPORT_ROOT = "imports"       
 OUTPUT_ROOT = "assets_restored"  
+# 批量模式的进程数与每次派发给进程的文件数
+BATCH_WORKERS = os.cpu_count() or 4
+BATCH_CHUNK_SIZE = 8
 # ===============================================
 
-def decompress_uuid(uuid_str):
-    """ 解压 UUID 以匹配文件名 """
-    if len(uuid_str) == 36: return uuid_str
-    if len(uuid_str) != 22 and len(uuid_str) != 23: return uuid_str
-    temp_uuid = uuid_str[1:] if uuid_str.startswith('_') else uuid_str
-    try:
-        b64 = temp_uuid[2:].replace('-', '+').replace('_', '/')
-        pad = len(b64) % 4
-        if pad > 0: b64 += '=' * (4 - pad)
-        data = base64.b64decode(b64)
-        hex_s = binascii.hexlify(data).decode('utf-8')
-        prefix = temp_uuid[:2]
-        return f"{prefix}{hex_s[0:6]}-{hex_s[6:10]}-{hex_s[10:14]}-{hex_s[14:18]}-{hex_s[18:]}"
-    except:
-        return uuid_str
-
-def find_config_file(bundle_name):
-    target_dir = os.path.join(CONFIG_DIR, bundle_name)
-    if not os.path.exists(target_dir):
-        return None
-    for f in os.listdir(target_dir):
-        if f.startswith("config.") and f.endswith(".json"):
-            return os.path.join(target_dir, f)
-    return None
-
-def recursive_find_skeleton(d):
-    """ 
-    [核心修正] 递归查找包含 Spine 数据的字典 
-    结构特征: 字典包含 "skeleton"(dict) 和 "bones"(list) 作为顶层键
+LOCATOR = spine_locator.SkeletonLocator()
+
+def plan_spine_jobs(bundle_name, index=None):
     """
-    if isinstance(d, dict):
-        # 特征匹配：skeleton 和 bones 是兄弟节点
-        if "skeleton" in d and "bones" in d:
-            if isinstance(d["skeleton"], dict) and isinstance(d["bones"], list):
-                return d
-        
-        # 递归遍历字典的值
-        for k, v in d.items():
-            res = recursive_find_skeleton(v)
-            if res: return res
-
-    elif isinstance(d, list):
-        # 递归遍历列表的元素
-        for item in d:
-            res = recursive_find_skeleton(item)
-            if res: return res
-    
-    return None
+    生成该 Bundle 的提取任务 (每个 import 文件一个)：(bundle, 名称, import 路径或 None, 输出路径)
+    找不到 Config 返回 None
+    """
+    entries = asset_index.bundle_entries(bundle_name, index, config_dir=CONFIG_DIR)
+    if entries is None:
+        return None
+
+    save_dir = os.path.join(OUTPUT_ROOT, bundle_name)
+    jobs = []
+    for idx, entry in enumerate(e for e in entries if e.type == "sp.SkeletonData"):
+        uuid_str = entry.uuid
+        file_hash = entry.import_hash
+        if not file_hash:
+            continue
+
+        # 获取文件名 (优先使用 paths 里的名字)
+        original_name = entry.path if entry.path else f"spine_{idx}"
+        original_name = original_name.replace("/", "_") # 防止路径报错
+
+        # .json 或二进制 .cconb，长 / 短 uuid 均可
+        json_path = cocos_import.find_import_file(IMPORT_ROOT, bundle_name, uuid_str, entry.long_uuid, file_hash)
+        jobs.append((bundle_name, original_name, json_path, os.path.join(save_dir, f"{original_name}.json")))
+    return jobs
+
+def extract_one(job):
+    """ 处理单个 import 文件，返回 (bundle, 名称, 状态, 命中策略, 说明)；状态: ok / missing / not_found / error """
+    bundle_name, name, json_path, output_path = job
+    if not json_path:
+        return bundle_name, name, "missing", None, "import 文件缺失"
+    try:
+        # 先试同类文件上次命中的位置，再按字段读取，最后迭代搜索
+        spine_data, strategy = LOCATOR.locate(cocos_import.read_file(json_path), bundle_name)
+        if not spine_data:
+            return bundle_name, name, "not_found", None, os.path.basename(json_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        json_codec.dump_path(output_path, spine_data, indent=2)
+        return bundle_name, name, "ok", strategy, None
+    except Exception as e:
+        return bundle_name, name, "error", None, str(e)
 
 def extract_spine_from_bundle(bundle_name):
     print(f"\n🔍 正在分析 Bundle: {bundle_name}")
     
-    cfg_path = find_config_file(bundle_name)
-    if not cfg_path:
+    # 优先查全局索引 (python asset_index.py 生成)，没有索引时回退到直接解析 Config
+    jobs = plan_spine_jobs(bundle_name, asset_index.AssetIndex.load())
+    if jobs is None:
         print(f"❌ 找不到 {bundle_name} 的 Config 文件。")
         return
-
-    try:
-        with open(cfg_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-    except Exception as e:
-        print(f"❌ 读取 Config 失败: {e}")
-        return
-
-    # 定位类型索引
-    types = config.get("types", [])
-    try:
-        spine_type_idx = types.index("sp.SkeletonData")
-    except ValueError:
+    if not jobs:
         print("⚠️ 该 Bundle 中不包含 'sp.SkeletonData'。")
         return
 
-    # 解析 paths
-    paths = config.get("paths", {})
-    target_uuid_indices = []
-    for str_idx, info in paths.items():
-        if len(info) > 1 and info[1] == spine_type_idx:
-            target_uuid_indices.append(int(str_idx))
-
-    if not target_uuid_indices:
-        print("⚠️ 未在 paths 中找到 Spine 资源引用。")
-        return
-
-    print(f"[-] 找到 {len(target_uuid_indices)} 个 Spine 资源，开始提取...")
-
-    # Version Map
-    uuids_list = config.get("uuids", [])
-    import_vers = config.get("versions", {}).get("import", [])
-    ver_map = {}
-    for i in range(0, len(import_vers), 2):
-        ver_map[import_vers[i]] = import_vers[i+1]
-
-    save_dir = os.path.join(OUTPUT_ROOT, bundle_name)
-    os.makedirs(save_dir, exist_ok=True)
+    print(f"[-] 找到 {len(jobs)} 个 Spine 资源，开始提取...")
     success_count = 0
+    for job in jobs:
+        _, name, status, _, msg = extract_one(job)
+        if status == "ok":
+            success_count += 1
+            print(f"   ✅ 提取成功: {name}.json")
+        elif status == "missing":
+            print(f"❌ 文件缺失: {name}")
+        elif status == "not_found":
+            print(f"   ⚠️ 解析失败 (深度搜索未找到特征): {msg}")
+        else:
+            print(f"   ❌ 处理出错: {msg}")
 
-    for idx in target_uuid_indices:
-        if idx >= len(uuids_list): continue
-        
-        uuid_str = uuids_list[idx]
-        file_hash = ver_map.get(idx)
-        
-        # 获取文件名 (优先使用 paths 里的名字)
-        path_info = paths.get(str(idx))
-        original_name = path_info[0] if path_info else f"spine_{idx}"
-        original_name = original_name.replace("/", "_") # 防止路径报错
-
-        if not file_hash:
-            continue
-
-        real_uuid = decompress_uuid(uuid_str)
-        prefix = uuid_str[:2]
-        
-        possible_paths = [
-            os.path.join(IMPORT_ROOT, f"{bundle_name}/import/{prefix}/{real_uuid}.{file_hash}.json"),
-            os.path.join(IMPORT_ROOT, f"{bundle_name}/import/{prefix}/{uuid_str}.{file_hash}.json")
-        ]
-        
-        json_path = None
-        for p in possible_paths:
-            if os.path.exists(p):
-                json_path = p
-                break
-        
-        if not json_path:
-            print(f"❌ 文件缺失: {real_uuid}.{file_hash}.json")
-            continue
+    print(f"\n🎉 处理完成！共提取 {success_count} 个骨骼文件。")
+    print(LOCATOR.format_stats(bundle_name))
+    print(f"📁 保存位置: {os.path.abspath(os.path.join(OUTPUT_ROOT, bundle_name))}")
+
+def resolve_bundles(patterns, index=None):
+    """ patterns 为 Bundle 名或通配符 (如 Chara*)；"all" 表示 Config 类型中含 sp.SkeletonData 的全部 Bundle """
+    if index is not None:
+        known = index.bundle_names
+    else:
+        known = sorted(d for d in os.listdir(CONFIG_DIR) if os.path.isdir(os.path.join(CONFIG_DIR, d))) \
+            if os.path.exists(CONFIG_DIR) else []
+
+    if patterns == ["all"]:
+        if index is not None:
+            return index.bundles_with_type("sp.SkeletonData")
+        result = []
+        for b_name in known:
+            entries = asset_index.bundle_entries(b_name, config_dir=CONFIG_DIR) or []
+            if any(e.type == "sp.SkeletonData" for e in entries):
+                result.append(b_name)
+        return result
+
+    result = []
+    for p in patterns:
+        matched = fnmatch.filter(known, p) if any(c in p for c in "*?[") else [p]
+        result.extend(b for b in matched if b not in result)
+    return result
+
+def run_batch(patterns, workers=BATCH_WORKERS):
+    """ 非交互批量模式：所有 Bundle 的 import 文件交给进程池并行提取 """
+    index = asset_index.AssetIndex.load()
+    bundles = resolve_bundles(patterns, index)
+    if not bundles:
+        print("❌ 没有匹配的 Bundle。")
+        return
 
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # [策略 A] 直接定位 (针对你的文件结构 data[5][0][4])
-            # 你的文件里: Element 5 是 list, Element 5[0] 是 Instance, 里面的 Index 4 是 Spine Dict
-            spine_data = None
-            try:
-                # 尝试直接读取数组结构，这比递归快且准
-                if isinstance(data, list) and len(data) >= 6:
-                    instances = data[5]
-                    if isinstance(instances, list) and len(instances) > 0:
-                        first_instance = instances[0]
-                        if isinstance(first_instance, list) and len(first_instance) >= 5:
-                            candidate = first_instance[4]
-                            if isinstance(candidate, dict) and "skeleton" in candidate and "bones" in candidate:
-                                spine_data = candidate
-            except:
-                pass
-
-            # [策略 B] 如果 A 失败，使用修正后的递归
-            if not spine_data:
-                spine_data = recursive_find_skeleton(data)
-            
-            if spine_data:
-                output_path = os.path.join(save_dir, f"{original_name}.json")
-                with open(output_path, 'w', encoding='utf-8') as f_out:
-                    json.dump(spine_data, f_out, indent=2, ensure_ascii=False)
-                success_count += 1
-                print(f"   ✅ 提取成功: {original_name}.json")
+    jobs, no_config = [], []
+    for b_name in bundles:
+        planned = plan_spine_jobs(b_name, index)
+        if planned is None:
+            no_config.append(b_name)
+        else:
+            jobs.extend(planned)
+    print(f"[-] {len(bundles)} 个 Bundle，共 {len(jobs)} 个 Spine 资源，{workers} 个进程")
+
+    # 每个进程各有一份 LOCATOR，统计在这里按 extract_one 返回的命中策略汇总
+    per_bundle = {}
+    strategies = {}
+    failures = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(extract_one, jobs, chunksize=BATCH_CHUNK_SIZE)
+        for b_name, name, status, strategy, msg in tqdm(results, total=len(jobs), unit="file", desc="🦴 Spine"):
+            counts = per_bundle.setdefault(b_name, {"ok": 0, "failed": 0, "strategies": {}})
+            if status == "ok":
+                counts["ok"] += 1
+                strategies[strategy] = strategies.get(strategy, 0) + 1
+                counts["strategies"][strategy] = counts["strategies"].get(strategy, 0) + 1
             else:
-                print(f"   ⚠️ 解析失败 (深度搜索未找到特征): {os.path.basename(json_path)}")
-
-        except Exception as e:
-            print(f"   ❌ 处理出错: {e}")
-
-    print(f"\n🎉 处理完成！共提取 {success_count} 个骨骼文件。")
-    print(f"📁 保存位置: {os.path.abspath(save_dir)}")
+                counts["failed"] += 1
+                failures.append((b_name, name, status, msg))
+
+    ok = sum(c["ok"] for c in per_bundle.values())
+    print(f"\n🎉 批量提取完成！成功 {ok}，失败 {len(failures)}")
+    print(f"[-] 命中策略: {', '.join(f'{k} {v}' for k, v in sorted(strategies.items())) or '无'}")
+    for b_name, counts in sorted(per_bundle.items()):
+        hits = ', '.join(f'{k} {v}' for k, v in sorted(counts["strategies"].items())) or '无'
+        mark = "⚠️" if counts["failed"] else "✅"
+        print(f"    {mark} {b_name}: 成功 {counts['ok']}，失败 {counts['failed']} (命中策略: {hits})")
+    for b_name, name, status, msg in failures:
+        print(f"    ❌ {b_name}/{name}: {status} {msg or ''}")
+    for b_name in no_config:
+        print(f"    ❌ {b_name}: 找不到 Config")
+    print(f"📁 保存位置: {os.path.abspath(OUTPUT_ROOT)}")
 
 def main():
     print("=== DMM Spine 自动提取器 (Fixed v2) ===")
+
+    # 带参数时进入批量模式: python 4_spine_extractor.py all | Bundle名/通配符 ...
+    if len(sys.argv) > 1:
+        run_batch(sys.argv[1:])
+        return
     
     while True:
         target = input("\n请输入要提取的 Bundle 名称 (输入 q 退出): ").strip()
@@ -187,4 +177,4 @@ def main():
         extract_spine_from_bundle(target)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
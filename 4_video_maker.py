@@ -1,29 +1,30 @@
-import json
 import os
-import base64
-import binascii
-from moviepy.editor import ImageClip, concatenate_videoclips
+import sys
+import fnmatch
+import functools
+import concurrent.futures
+from tqdm import tqdm
+import json_codec
+import cocos_import
+import asset_index
+import video_render
 
 # ================= ⚙️ 配置区域 =================
 CONFIG_DIR = "configs"        
 IMPORT_ROOT = "imports"       
+FPS = 30
+# "auto": 依次尝试 concat / ffmpeg 管道 / moviepy；也可固定为其中之一
+RENDER_BACKEND = "auto"
+
+# 批量模式: 图片目录为 ASSETS_ROOT/<bundle>，视频输出到同一目录
+ASSETS_ROOT = "assets_restored"
+BATCH_BUNDLE_PATTERN = "AdvStill*"
+# ffmpeg 自身是多线程的，同时渲染的动画数不宜过多
+RENDER_WORKERS = 2
+# 记录每个视频对应的动画配置 hash，相同则跳过
+RENDER_REGISTRY = "video_renders.json"
 # ===============================================
 
-def decompress_uuid(uuid_str):
-    if len(uuid_str) == 36: return uuid_str
-    if len(uuid_str) != 22 and len(uuid_str) != 23: return uuid_str
-    temp_uuid = uuid_str[1:] if uuid_str.startswith('_') else uuid_str
-    try:
-        b64 = temp_uuid[2:].replace('-', '+').replace('_', '/')
-        pad = len(b64) % 4
-        if pad > 0: b64 += '=' * (4 - pad)
-        data = base64.b64decode(b64)
-        hex_s = binascii.hexlify(data).decode('utf-8')
-        prefix = temp_uuid[:2]
-        return f"{prefix}{hex_s[0:6]}-{hex_s[6:10]}-{hex_s[10:14]}-{hex_s[14:18]}-{hex_s[18:]}"
-    except:
-        return uuid_str
-
 def find_animation_data(data):
     """递归查找包含 'stillPathList' 的配置节点 """
     if isinstance(data, dict):
@@ -39,56 +40,165 @@ def find_animation_data(data):
     return None
 
 def get_animation_config(bundle_name):
-    """根据 Bundle 名自动定位包含动画信息的 JSON """
-    target_dir = os.path.join(CONFIG_DIR, bundle_name)
-    if not os.path.exists(target_dir):
-        print(f"❌ 找不到 Bundle 目录: {target_dir}")
+    """根据 Bundle 名自动定位包含动画信息的 JSON (有多个时让用户选择) """
+    found = find_animation_configs(bundle_name, asset_index.AssetIndex.load())
+    if not found:
         return None
-
-    cfg_path = next((os.path.join(target_dir, f) for f in os.listdir(target_dir) if f.startswith("config.")), None)
-    if not cfg_path: return None
-
-    with open(cfg_path, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-
-    # 1. 寻找 cc.JsonAsset 的索引 
-    try:
-        json_type_idx = config.get("types", []).index("cc.JsonAsset")
-    except ValueError:
+    if len(found) > 1:
+        print(f"\n该 Bundle 中有 {len(found)} 个动画配置:")
+        for idx, (_, _, _, label) in enumerate(found):
+            print(f"  [{idx + 1}] {label}")
+        try:
+            found = [found[int(input("请选择动画配置序号: ")) - 1]]
+        except (ValueError, IndexError):
+            print("选择无效。")
+            return None
+    anim_config, import_path, _, _ = found[0]
+    print(f"✅ 已自动定位动画配置: {os.path.basename(import_path)}")
+    return anim_config
+
+def find_animation_configs(bundle_name, index=None):
+    """ 返回 [(动画配置, import 路径, import hash, 名称)]，每个含动画的 cc.JsonAsset 一项；找不到 Config 返回 None """
+    entries = asset_index.bundle_entries(bundle_name, index, config_dir=CONFIG_DIR)
+    if entries is None:
+        print(f"❌ 找不到 Bundle 的 Config: {os.path.join(CONFIG_DIR, bundle_name)}")
         return None
 
-    # 2. 筛选出所有 JsonAsset 资源 
-    uuids = config.get("uuids", [])
-    paths = config.get("paths", {})
-    import_vers = config.get("versions", {}).get("import", [])
-    ver_map = {import_vers[i]: import_vers[i+1] for i in range(0, len(import_vers), 2)}
-
-    for str_idx, info in paths.items():
-        if len(info) > 1 and info[1] == json_type_idx:
-            idx = int(str_idx)
-            uuid_str = uuids[idx]
-            file_hash = ver_map.get(idx)
+    found = []
+    # 只看 cc.JsonAsset 资源
+    for entry in entries:
+        if entry.type == "cc.JsonAsset":
+            uuid_str = entry.uuid
+            file_hash = entry.import_hash
             if not file_hash: continue
 
-            real_uuid = decompress_uuid(uuid_str)
-            prefix = uuid_str[:2]
-            
-            # 拼接 Import 路径 
-            import_path = os.path.join(IMPORT_ROOT, bundle_name, "import", prefix, f"{real_uuid}.{file_hash}.json")
-            if not os.path.exists(import_path):
-                import_path = os.path.join(IMPORT_ROOT, bundle_name, "import", prefix, f"{uuid_str}.{file_hash}.json")
-
-            if os.path.exists(import_path):
-                with open(import_path, 'r', encoding='utf-8') as f:
-                    import_data = json.load(f)
-                anim_config = find_animation_data(import_data)
+            # 定位 Import 文件 (.json 或 .cconb)
+            import_path = cocos_import.find_import_file(IMPORT_ROOT, bundle_name, uuid_str, entry.long_uuid, file_hash)
+
+            if import_path:
+                import_data = cocos_import.read_file(import_path)
+                # cc.JsonAsset 的内容在 json 字段里，先直接检查，不符合再递归
+                payload = cocos_import.json_payload(import_data)
+                if isinstance(payload, dict) and "stillPathList" in payload and "animation" in payload:
+                    anim_config = payload
+                else:
+                    anim_config = find_animation_data(payload if payload is not None else import_data)
                 if anim_config:
-                    print(f"✅ 已自动定位动画配置: {os.path.basename(import_path)}")
-                    return anim_config
-    return None
+                    # 名称用于区分同一 Bundle 里的多个配置 (输出文件名 / registry 键)
+                    label = entry.path.replace("/", "_") if entry.path else uuid_str
+                    found.append((anim_config, import_path, file_hash, label))
+    return found
+
+def make_resolver(path_list, img_dir):
+    """ stillPathList 下标 -> 图片路径 (.jpg 优先)，结果缓存 """
+    @functools.lru_cache(maxsize=None)
+    def resolve_image(img_idx):
+        base_name = path_list[img_idx]
+        for ext in (".jpg", ".png"):
+            img_path = os.path.join(img_dir, base_name + ext)
+            if os.path.exists(img_path):
+                return img_path
+        return None
+    return resolve_image
+
+def render_job(job):
+    """ 进程池任务：渲染单个动画，返回 (registry 键, 状态, 后端或错误信息) """
+    key, keys, path_list, img_dir, output_path = job
+    # 先写临时文件再改名，中断时不会留下看起来完整的视频
+    tmp_path = output_path[:-4] + ".part.mp4"
+    try:
+        segments = video_render.compile_timeline(keys, make_resolver(path_list, img_dir))
+        if not segments:
+            return key, "no_frames", None
+        backend = video_render.render(segments, tmp_path, fps=FPS, backend=RENDER_BACKEND)
+        os.replace(tmp_path, output_path)
+        return key, "ok", backend
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return key, "error", str(e)
+
+def load_registry():
+    if not os.path.exists(RENDER_REGISTRY):
+        return {}
+    try:
+        return json_codec.load_path(RENDER_REGISTRY)
+    except Exception:
+        return {}
+
+def save_registry(registry):
+    tmp_path = RENDER_REGISTRY + ".tmp"
+    json_codec.dump_path(tmp_path, registry, indent=2)
+    os.replace(tmp_path, RENDER_REGISTRY)
+
+def run_batch(patterns):
+    """ 非交互批量模式：渲染匹配 Bundle 中的全部动画，配置 hash 未变且视频存在的跳过 """
+    index = asset_index.AssetIndex.load()
+    if index is not None:
+        known = index.bundle_names
+    else:
+        known = sorted(os.listdir(CONFIG_DIR)) if os.path.exists(CONFIG_DIR) else []
+    bundles = []
+    for p in patterns:
+        bundles.extend(b for b in fnmatch.filter(known, p) if b not in bundles)
+    if not bundles:
+        print("❌ 没有匹配的 Bundle。")
+        return
+
+    registry = load_registry()
+    jobs, hashes = [], {}
+    skipped, missing = 0, []
+    for b_name in tqdm(bundles, unit="pkg", desc="🔍 解析动画配置"):
+        found = find_animation_configs(b_name, index)
+        img_dir = os.path.join(ASSETS_ROOT, b_name)
+        if not found or not os.path.isdir(img_dir):
+            missing.append(b_name)
+            continue
+        for anim_config, _, config_hash, label in found:
+            # 只有一个配置时沿用原来的文件名与 registry 键；多个配置时加上配置名，避免同名动画互相覆盖
+            prefix = f"{label}_" if len(found) > 1 else ""
+            for anim_name, anim_data in anim_config["animation"].items():
+                keys = anim_data.get("keys", [])
+                if not keys:
+                    continue
+                output_path = os.path.join(img_dir, f"{prefix}{anim_name}_output.mp4")
+                key = f"{b_name}/{label}/{anim_name}" if prefix else f"{b_name}/{anim_name}"
+                if registry.get(key) == config_hash and os.path.exists(output_path):
+                    skipped += 1
+                    continue
+                hashes[key] = config_hash
+                jobs.append((key, keys, anim_config["stillPathList"], img_dir, output_path))
+
+    print(f"[-] {len(bundles)} 个 Bundle，待渲染 {len(jobs)} 个动画，跳过 {skipped} 个 (配置未变)，{RENDER_WORKERS} 个进程")
+    failures = []
+    backends = {}
+    if jobs:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=RENDER_WORKERS) as executor:
+            futures = [executor.submit(render_job, job) for job in jobs]
+            for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), unit="video", desc="🎬 渲染"):
+                key, status, info = future.result()
+                if status == "ok":
+                    registry[key] = hashes[key]
+                    backends[info] = backends.get(info, 0) + 1
+                    save_registry(registry)  # 每完成一个就落盘，中断后可续跑
+                else:
+                    failures.append((key, status, info))
+
+    print(f"\n🎉 批量渲染完成！成功 {sum(backends.values())}，失败 {len(failures)}，跳过 {skipped}")
+    if backends:
+        print(f"[-] 渲染后端: {', '.join(f'{k} {v}' for k, v in sorted(backends.items()))}")
+    for key, status, info in failures:
+        print(f"    ❌ {key}: {status} {info or ''}")
+    for b_name in missing:
+        print(f"    ⚠️ {b_name}: 未找到动画配置或图片目录")
 
 def main():
     print("=== DMM 自动视频合成工具 (Bundle 模式) ===")
+
+    # 带参数时进入批量模式: python 4_video_maker.py all | Bundle名/通配符 ...
+    if len(sys.argv) > 1:
+        run_batch([BATCH_BUNDLE_PATTERN] if sys.argv[1:] == ["all"] else sys.argv[1:])
+        return
     
     bundle_name = input("请输入 Bundle 名称 (例如 AdvStillstill101005): ").strip()
     img_dir = input("请输入 [图片所在文件夹] 的完整路径: ").strip().strip('"')
@@ -122,38 +232,20 @@ def main():
     keys = anim_data.get("keys", [])
     if not keys: return
 
-    # 渲染逻辑 (沿用原 video_maker) 
-    clips = []
-    default_duration = 0.033 
-    print(f"正在处理 [{target_name}]...")
+    resolve_image = make_resolver(path_list, img_dir)
 
-    for i in range(len(keys)):
-        curr_key = keys[i]
-        img_idx = curr_key.get("idx", 0)
-        base_name = path_list[img_idx]
-        
-        img_path = os.path.join(img_dir, base_name + ".jpg")
-        if not os.path.exists(img_path):
-            img_path = os.path.join(img_dir, base_name + ".png")
-        
-        if not os.path.exists(img_path):
-            continue
-
-        duration = default_duration
-        if i < len(keys) - 1:
-            diff = keys[i+1].get("time", 0) - curr_key.get("time", 0)
-            if diff > 0.001: duration = diff
-        
-        clips.append(ImageClip(img_path).set_duration(duration))
+    # 编译时间轴：连续相同的图片合并为一段，时长精确对应原始 time
+    print(f"正在处理 [{target_name}]...")
+    segments = video_render.compile_timeline(keys, resolve_image)
+    print(f"[-] {len(keys)} 个关键帧 -> {len(segments)} 段")
 
-    if not clips:
+    if not segments:
         print("没有可合成的帧。")
         return
 
-    final_clip = concatenate_videoclips(clips, method="compose")
     output_path = os.path.join(img_dir, f"{target_name}_output.mp4")
-    final_clip.write_videofile(output_path, fps=30, codec="libx264", audio=False)
-    print(f"\n✅ 成功！文件保存在: {output_path}")
+    backend = video_render.render(segments, output_path, fps=FPS, backend=RENDER_BACKEND)
+    print(f"\n✅ 成功！({backend}) 文件保存在: {output_path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
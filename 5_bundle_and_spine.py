@@ -1,8 +1,16 @@
 import os
-import requests
-import json
-import base64
-import binascii
+import http_client
+import verifier
+import metrics
+from uuid_codec import decompress_uuid
+import ext_predictor
+import manifest
+import bundle_scheduler
+import config_store
+import asset_index
+import json_codec
+import cocos_import
+import spine_locator
 import urllib3
 import concurrent.futures
 import time
@@ -14,7 +22,18 @@ SETTINGS_URL = BASE_RES_URL + "src/settings.4229e.json"
 DOWNLOAD_ROOT = "assets_restored" 
 LOCAL_IMPORT_ROOT = "imports"  
 OVERWRITE = False
-MAX_WORKERS = 8  # 可以根据网速调高
+MAX_WORKERS = 16  # 并发上限，实际在途请求数由 http_client 按服务器反馈自适应调整
+# 使用 asyncio 引擎 (需要 aiohttp)，所有 Bundle 共享同一个在途请求上限
+USE_ASYNC_ENGINE = False
+ASYNC_MAX_IN_FLIGHT = 256
+
+# 后缀试探方式: "serial" 按预测顺序逐个 GET；
+# "race" 先 GET 预测的第一个候选，落空后再对其余候选并发 HEAD，只 GET 胜出的那个 (404 多时更快，但请求更多)
+# config/import 都解析不出后缀的资源使用 UNRESOLVED_PROBE_MODE，其余类型可在下面单独指定
+UNRESOLVED_PROBE_MODE = "serial"
+PROBE_MODE_BY_TYPE = {
+    # "cc.TextAsset": "race",  # .atlas / .txt / .text 混用，预测经常落空时可以打开
+}
 
 # [已修改] 默认留空，改为在运行时让用户输入
 TARGET_BUNDLES = [] 
@@ -26,6 +45,11 @@ HEADERS = {
 # ===============================================
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+EXT_PREDICTOR = ext_predictor.ExtensionPredictor()
+metrics.register_collector("ext_predictor", EXT_PREDICTOR.stats)
+MANIFEST = None  # 在 main 中打开
+SPINE_LOCATOR = spine_locator.SkeletonLocator()
+ASSET_INDEX = None  # 在 main 中加载，没有索引时逐个解析 Config
 
 # --- [基础工具函数] 100% 还原 3_bundle_downloader 逻辑 ---
 
@@ -33,40 +57,15 @@ def get_settings_locally():
     filename = os.path.basename(SETTINGS_URL)
     if os.path.exists(filename):
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return json_codec.load_path(filename)
         except: pass
     try:
-        resp = requests.get(SETTINGS_URL, headers=HEADERS, verify=False)
-        data = resp.json()
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+        resp = http_client.get(SETTINGS_URL, headers=HEADERS, verify=False)
+        data = json_codec.loads(resp.content)
+        json_codec.dump_path(filename, data)
         return data
     except: return None
 
-def decompress_uuid(uuid_str):
-    if len(uuid_str) == 36: return uuid_str
-    if len(uuid_str) != 22 and len(uuid_str) != 23: return uuid_str
-    temp_uuid = uuid_str[1:] if uuid_str.startswith('_') else uuid_str
-    try:
-        b64 = temp_uuid[2:].replace('-', '+').replace('_', '/')
-        pad = len(b64) % 4
-        if pad > 0: b64 += '=' * (4 - pad)
-        data = base64.b64decode(b64)
-        hex_s = binascii.hexlify(data).decode('utf-8')
-        prefix = temp_uuid[:2]
-        return f"{prefix}{hex_s[0:6]}-{hex_s[6:10]}-{hex_s[10:14]}-{hex_s[14:18]}-{hex_s[18:]}"
-    except: return uuid_str
-
-def decode_versions(uuids, version_array):
-    v_map = {}
-    if not version_array: return v_map
-    for i in range(0, len(version_array), 2):
-        idx = version_array[i]
-        ver = version_array[i+1]
-        if idx < len(uuids): v_map[uuids[idx]] = ver
-    return v_map
-
 def get_extension_by_type(resource_type):
     if not resource_type: return None
     mapping = {
@@ -78,32 +77,29 @@ def get_extension_by_type(resource_type):
 
 def parse_import_data_in_memory(json_data):
     try:
-        native_ext = None
-        if isinstance(json_data, list) and len(json_data) >= 6:
-            fields = json_data[3][0][1]
-            values = json_data[5][0]
-            if "_native" in fields:
-                native_ext = values[fields.index("_native") + 1]
-        elif isinstance(json_data, dict):
-            native_ext = json_data.get("_native")
-        return native_ext
+        return cocos_import.native_ext(json_data)
     except: return None
 
 # --- [下载核心] 100% 还原 3_bundle_downloader 的后缀尝试逻辑 ---
 
-def download_native_file(url, path):
-    if not OVERWRITE and os.path.exists(path) and os.path.getsize(path) > 0:
+def download_native_file(url, path, overwrite=False):
+    # URL 形如 <uuid>.<native hash><ext>，已有文件与版本 hash 不符 (旧版本 / 损坏) 时重新下载
+    expected_hash = verifier.hash_from_url(url)
+    if not (overwrite or OVERWRITE) and verifier.existing_ok(path, expected_hash):
         return True
-    try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        resp = requests.get(url, headers=HEADERS, verify=False, timeout=15)
-        if resp.status_code == 200:
-            with open(path, 'wb') as f: f.write(resp.content)
-            return True
-    except: pass
-    return False
+    # 404 直接返回 False；5xx / 429 / 超时 / 内容不符抛出 RetryLater，由 BundleScheduler 退避后重新入队
+    return http_client.fetch_to_file(url, path, headers=HEADERS, timeout=15, expected_hash=expected_hash)
 
-def process_asset_task(args):
+def get_probe_mode(known_type, resolved):
+    if known_type in PROBE_MODE_BY_TYPE:
+        return PROBE_MODE_BY_TYPE[known_type]
+    return "serial" if resolved else UNRESOLVED_PROBE_MODE
+
+def plan_asset_task(args):
+    """
+    生成 (试探方式, [(url, 保存路径), ...])，候选按优先级排列，线程池与异步引擎共用。
+    试探方式为 "serial" 或 "race"，见 PROBE_MODE_BY_TYPE。
+    """
     bundle_name, compressed_uuid, native_hash, import_hash, save_dir, path_info, known_type = args
     real_uuid = decompress_uuid(compressed_uuid)
     
@@ -115,121 +111,199 @@ def process_asset_task(args):
     if cfg_ext: exts_to_try.append(cfg_ext)
     
     # 2. 来自 Import 文件的内部定义 (解析本地 imports 文件夹)
-    local_import_rel = f"{bundle_name}/import/{compressed_uuid[:2]}/{real_uuid}.{import_hash}.json"
-    local_path = os.path.join(LOCAL_IMPORT_ROOT, local_import_rel)
-    if os.path.exists(local_path):
+    ext_from_imp = None
+    local_path = cocos_import.find_import_file(LOCAL_IMPORT_ROOT, bundle_name, compressed_uuid, real_uuid, import_hash) if import_hash else None
+    if local_path:
         try:
-            with open(local_path, 'r', encoding='utf-8') as f:
-                ext_from_imp = parse_import_data_in_memory(json.load(f))
-                if ext_from_imp and ext_from_imp not in exts_to_try: exts_to_try.append(ext_from_imp)
+            ext_from_imp = parse_import_data_in_memory(cocos_import.read_file(local_path))
+            if ext_from_imp and ext_from_imp not in exts_to_try: exts_to_try.append(ext_from_imp)
         except: pass
 
     # 3. 兜底枚举 (确保 .atlas, .bin 等不被漏掉)
     for g in [".png", ".jpg", ".bin", ".atlas", ".txt", ".mp3", ".json", ".plist", ".ttf"]:
         if g not in exts_to_try: exts_to_try.append(g)
 
+    # 4. 按历史命中记录重排，让第一次请求尽量命中
+    exts_to_try = EXT_PREDICTOR.order(EXT_PREDICTOR.make_key(known_type, bundle_name, path_info), exts_to_try, pinned=ext_from_imp)
+
+    # 5. 清单中已有记录但未校验 (规划时重新入队) 的资源，先核对记录的后缀，只读这一个文件
+    recorded = MANIFEST.lookup(bundle_name, compressed_uuid, "native", native_hash) if MANIFEST else None
+    if recorded and recorded[2] in exts_to_try:
+        exts_to_try.remove(recorded[2])
+        exts_to_try.insert(0, recorded[2])
+
     real_name = path_info if path_info else real_uuid
     native_base_url = f"{BASE_RES_URL}assets/{bundle_name}/native/{real_uuid[:2]}/{real_uuid}.{native_hash}"
     
-    for ext in exts_to_try:
-        if download_native_file(f"{native_base_url}{ext}", os.path.join(save_dir, f"{real_name}{ext}")):
+    mode = get_probe_mode(known_type, cfg_ext or ext_from_imp or recorded)
+    return mode, [(f"{native_base_url}{ext}", os.path.join(save_dir, f"{real_name}{ext}")) for ext in exts_to_try]
+
+def on_asset_done(args, hit):
+    """ hit: (尝试次数, url, 保存路径)，把命中的后缀反馈给预测器并写入下载清单 """
+    if not hit: return
+    probes, _, path = hit
+    bundle_name, compressed_uuid, native_hash, _, _, path_info, known_type = args
+    ext = os.path.splitext(path)[1]
+    EXT_PREDICTOR.record(EXT_PREDICTOR.make_key(known_type, bundle_name, path_info), ext, probes)
+    MANIFEST.record(bundle_name, compressed_uuid, "native", native_hash, path, ext=ext,
+                    verified=verifier.should_verify(native_hash))
+
+def race_native_file(candidates, overwrite=False):
+    """ 先下载预测的第一个候选，落空后并发试探其余候选，只下载胜出者；返回 (位置, url, 保存路径) 或 None """
+    if not (overwrite or OVERWRITE):
+        # 只校验第一个已存在的候选 (按路径命名，其余后缀的同名文件基本不会有)，下面下载时不再重复读取
+        for probes, (url, path) in enumerate(candidates, 1):
+            if os.path.exists(path):
+                if verifier.existing_ok(path, verifier.hash_from_url(url)):
+                    return probes, url, path
+                break
+    # 预测器命中时和 serial 一样只有一次 GET，不额外发 HEAD
+    url, path = candidates[0]
+    if download_native_file(url, path, True):
+        return 1, url, path
+    rest = candidates[1:]
+    idx = http_client.race_probe([url for url, _ in rest], headers=HEADERS)
+    if idx is None:
+        return None
+    url, path = rest[idx]
+    if download_native_file(url, path, True):
+        return idx + 2, url, path
+    return None
+
+def process_asset_task(args, overwrite=False):
+    """ overwrite: 忽略本地已有的同名文件 (增量同步中 hash 变化的资源，文件名按路径命名，旧版本就在目标路径上) """
+    mode, candidates = plan_asset_task(args)
+    if mode == "race":
+        hit = race_native_file(candidates, overwrite)
+        on_asset_done(args, hit)
+        return hit is not None
+    for probes, (url, path) in enumerate(candidates, 1):
+        if download_native_file(url, path, overwrite):
+            on_asset_done(args, (probes, url, path))
             return True
     return False
 
 # --- [Spine 提取工具] 递归寻找骨骼数据 ---
 
-def recursive_find_skeleton(d):
-    if isinstance(d, dict):
-        if "skeleton" in d and "bones" in d: return d
-        for v in d.values():
-            res = recursive_find_skeleton(v)
-            if res: return res
-    elif isinstance(d, list):
-        for item in d:
-            res = recursive_find_skeleton(item)
-            if res: return res
-    return None
-
-def extract_spines_for_bundle(bundle_name, config, save_dir):
-    types = config.get("types", [])
-    if "sp.SkeletonData" not in types: return
-    
-    spine_idx = types.index("sp.SkeletonData")
-    uuids = config.get("uuids", [])
-    paths = config.get("paths", {})
-    import_vers = decode_versions(uuids, config.get("versions", {}).get("import", []))
-
-    for str_idx, info in paths.items():
-        if len(info) > 1 and info[1] == spine_idx:
-            idx = int(str_idx)
-            u = uuids[idx]
-            i_hash = import_vers.get(u)
+def extract_spines_for_bundle(bundle_name, entries, save_dir):
+    for e in entries:
+        if e.type == "sp.SkeletonData" and e.path:
+            u = e.uuid
+            i_hash = e.import_hash
             if not i_hash: continue
             
-            real_u = decompress_uuid(u)
-            local_json = os.path.join(LOCAL_IMPORT_ROOT, bundle_name, "import", u[:2], f"{real_u}.{i_hash}.json")
+            local_json = cocos_import.find_import_file(LOCAL_IMPORT_ROOT, bundle_name, u, e.long_uuid, i_hash)
             
-            if os.path.exists(local_json):
+            if local_json:
                 try:
-                    with open(local_json, 'r', encoding='utf-8') as f:
-                        skel = recursive_find_skeleton(json.load(f))
-                        if skel:
-                            out_path = os.path.join(save_dir, f"{info[0].replace('/', '_')}.json")
-                            with open(out_path, 'w', encoding='utf-8') as f_out:
-                                json.dump(skel, f_out, indent=2, ensure_ascii=False)
+                    skel, _ = SPINE_LOCATOR.locate(cocos_import.read_file(local_json), bundle_name)
+                    if skel:
+                        out_path = os.path.join(save_dir, f"{e.path.replace('/', '_')}.json")
+                        json_codec.dump_path(out_path, skel, indent=2)
                 except: pass
 
 # --- [主流程] Bundle 遍历与子进度条 ---
 
-def process_bundle(bundle_name, bundle_ver, pbar_main):
-    # 使用全局变量 TARGET_BUNDLES 判断
-    if TARGET_BUNDLES and bundle_name not in TARGET_BUNDLES:
-        pbar_main.update(1)
-        return
-
+def prepare_bundle(bundle_name, bundle_ver):
+    """ 取得资源条目并生成该 Bundle 的下载任务，失败返回 None """
     save_dir = os.path.join(DOWNLOAD_ROOT, bundle_name)
     os.makedirs(save_dir, exist_ok=True)
     
-    # 获取 Config
-    try:
-        resp = requests.get(f"{BASE_RES_URL}assets/{bundle_name}/config.{bundle_ver}.json", timeout=10)
-        config = resp.json()
-    except:
-        pbar_main.update(1)
-        return
+    # 全局索引中版本一致时直接使用；否则获取 Config (本地 configs/ 优先，未命中才下载并写回)
+    if ASSET_INDEX is not None and ASSET_INDEX.has_bundle(bundle_name, bundle_ver):
+        entries = ASSET_INDEX.bundle_assets(bundle_name)
+    else:
+        config = config_store.load_config(BASE_RES_URL, bundle_name, bundle_ver, headers=HEADERS)
+        if config is None:
+            return None
+        entries = asset_index.entries_from_config(bundle_name, config)
 
-    uuids = config.get('uuids', [])
-    paths = config.get('paths', {})
-    types = config.get('types', [])
-    import_map = decode_versions(uuids, config.get('versions', {}).get('import', []))
-    native_ver_arr = config.get('versions', {}).get('native', [])
-    
+    # 清单中已记录且校验过的 (uuid, native hash) 直接跳过，不再逐个后缀 stat
+    known = {} if OVERWRITE else MANIFEST.lookup_bundle(bundle_name, "native")
+    return entries, save_dir, build_native_tasks(bundle_name, entries, save_dir, known)
+
+def build_native_tasks(bundle_name, entries, save_dir, known=None, only_uuids=None):
+    """
+    根据资源条目 (asset_index.AssetEntry) 生成原生资源任务元组。
+    known: 清单中已存在的 {(uuid, hash): (path, size, ext, verified)}，命中且可信 (见 verifier.trusted) 则跳过；
+    only_uuids: 只保留这些 uuid (增量同步用)
+    """
+    known = known or {}
     tasks = []
-    for i in range(0, len(native_ver_arr), 2):
-        idx = native_ver_arr[i]
-        n_hash = native_ver_arr[i+1]
-        if idx >= len(uuids): continue
+    for e in entries:
+        n_hash = e.native_hash
+        if not n_hash: continue
         
-        u = uuids[idx]
-        p_info = paths.get(str(idx))[0] if str(idx) in paths else None
-        res_type = types[paths.get(str(idx))[1]] if (str(idx) in paths and paths[str(idx)][1] < len(types)) else None
-        i_hash = import_map.get(u, "")
+        u = e.uuid
+        entry = known.get((u, n_hash))
+        if entry is not None and verifier.trusted(entry[3], n_hash): continue
+        if only_uuids is not None and u not in only_uuids: continue
         
-        tasks.append((bundle_name, u, n_hash, i_hash, save_dir, p_info, res_type))
-
-    # --- 核心：子进度条展示 ---
-    if tasks:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = [executor.submit(process_asset_task, t) for t in tasks]
-            for _ in tqdm(concurrent.futures.as_completed(futures), total=len(tasks), desc=f"   ⬇️ {bundle_name}", leave=False, unit="file"):
-                pass
-    
-    # 下载完成后，立即执行提取
-    extract_spines_for_bundle(bundle_name, config, save_dir)
-    pbar_main.update(1)
+        tasks.append((bundle_name, u, n_hash, e.import_hash or "", save_dir, e.path, e.type))
+    return tasks
+
+def process_bundles(bundles_to_run, bundle_vers):
+    """ 线程池模式：所有 Bundle 共用一个线程池，边解析 Config 边投递任务 """
+    def on_bundle_done(bundle_name, ctx):
+        # 该 Bundle 最后一个资源落地后，立即执行提取
+        entries, save_dir = ctx
+        extract_spines_for_bundle(bundle_name, entries, save_dir)
+
+    scheduler = bundle_scheduler.BundleScheduler(process_asset_task, MAX_WORKERS, on_bundle_done=on_bundle_done,
+                                                 total_bundles=len(bundles_to_run))
+    for b_name in bundles_to_run:
+        prepared = prepare_bundle(b_name, bundle_vers[b_name])
+        if not prepared:
+            scheduler.skip_bundle()
+            continue
+        entries, save_dir, tasks = prepared
+        scheduler.submit_bundle(b_name, tasks, context=(entries, save_dir))
+    scheduler.join()
+    print(scheduler.format_summary())
+
+def process_bundles_async(bundles_to_run, bundle_vers):
+    """ 异步模式：先汇总所有 Bundle 的任务，再由一个全局信号量统一调度 """
+    import async_engine
+
+    prepared_map = {}
+    remaining = {}
+    all_tasks = []
+    for b_name in tqdm(bundles_to_run, unit="pkg", desc="📦 解析 Config"):
+        prepared = prepare_bundle(b_name, bundle_vers[b_name])
+        if prepared:
+            prepared_map[b_name] = prepared
+            remaining[b_name] = len(prepared[2])
+            all_tasks.extend(prepared[2])
+
+    # Spine 提取放到独立线程，避免阻塞事件循环
+    hook_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def run_hook(b_name):
+        entries, save_dir, _ = prepared_map[b_name]
+        hook_executor.submit(extract_spines_for_bundle, b_name, entries, save_dir)
+
+    for b_name, count in remaining.items():
+        if count == 0:
+            run_hook(b_name)
+
+    def on_done(task, hit):
+        on_asset_done(task, hit)
+        b_name = task[0]
+        remaining[b_name] -= 1
+        if remaining[b_name] == 0:
+            run_hook(b_name)
+
+    async_engine.run_asset_tasks(all_tasks, plan_asset_task, headers=HEADERS,
+                                 max_in_flight=ASYNC_MAX_IN_FLIGHT, overwrite=OVERWRITE,
+                                 on_done=on_done)
+    hook_executor.shutdown(wait=True)
+    if async_engine.LAST_LIMITER is not None:
+        print(async_engine.LAST_LIMITER.format_stats())
 
 def main():
     print("=== DMM 终极整合下载器 (原生+Spine+双重进度条) ===")
+    http_client.configure(MAX_WORKERS)
+    metrics.start("native", MAX_WORKERS)
     
     # [新增] 用户输入逻辑
     global TARGET_BUNDLES
@@ -262,12 +336,23 @@ def main():
         print("❌ 没有可执行的任务。")
         return
 
-    with tqdm(total=len(bundles_to_run), unit="pkg", desc="📦 Total Bundles") as pbar:
-        for b_name in bundles_to_run:
-            if b_name in bundle_vers:
-                process_bundle(b_name, bundle_vers[b_name], pbar)
+    global MANIFEST, ASSET_INDEX
+    MANIFEST = manifest.DownloadManifest()
+    ASSET_INDEX = asset_index.AssetIndex.load()
+
+    if USE_ASYNC_ENGINE:
+        process_bundles_async(bundles_to_run, bundle_vers)
+    else:
+        process_bundles(bundles_to_run, bundle_vers)
 
+    EXT_PREDICTOR.save()
+    MANIFEST.close()
     print("\n✅ 所有任务已完成！")
+    print(EXT_PREDICTOR.format_stats())
+    print(SPINE_LOCATOR.format_stats())
+    print(http_client.format_stats())
+    metrics.finish()
+    print(metrics.format_stats())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,188 @@
+import os
+import importlib
+import functools
+import concurrent.futures
+from tqdm import tqdm
+import http_client
+import manifest
+import catalog_diff
+import config_store
+import asset_index
+import bundle_scheduler
+import metrics
+
+# 复用 1 / 2 / 5 号脚本中的下载逻辑 (文件名以数字开头，只能通过 importlib 导入)
+step1 = importlib.import_module("1_config_downloader")
+step2 = importlib.import_module("2_import_downloader")
+step5 = importlib.import_module("5_bundle_and_spine")
+
+# ================= ⚙️ 配置区域 =================
+CONFIG_DIR = config_store.CONFIG_DIR
+MAX_WORKERS = 16  # 并发上限，实际在途请求数由 http_client 按服务器反馈自适应调整
+# ===============================================
+
+
+def scan_local_versions():
+    """ 没有同步快照时，用 configs/ 下已有的 config.<ver>.json 推断上次的版本 (取最新修改的那个) """
+    versions = {}
+    if not os.path.exists(CONFIG_DIR):
+        return versions
+    for b_name in os.listdir(CONFIG_DIR):
+        b_dir = os.path.join(CONFIG_DIR, b_name)
+        if not os.path.isdir(b_dir):
+            continue
+        cfgs = [f for f in os.listdir(b_dir) if f.startswith("config.") and f.endswith(".json")]
+        if cfgs:
+            latest = max(cfgs, key=lambda f: os.path.getmtime(os.path.join(b_dir, f)))
+            versions[b_name] = latest[len("config."):-len(".json")]
+    return versions
+
+
+def main():
+    print("=== DMM 增量同步 (仅下载版本变化的资源) ===")
+    http_client.configure(MAX_WORKERS)
+    metrics.start("sync", MAX_WORKERS)
+
+    settings = step1.get_settings_locally()
+    if not settings: return
+    new_vers = settings.get('assets', {}).get('bundleVers', {})
+    if not new_vers:
+        print("[X] 未找到 bundleVers 信息")
+        return
+
+    snapshot = catalog_diff.load_snapshot()
+    if snapshot:
+        old_vers = snapshot.get("bundleVers", {})
+        print(f"[-] 上次同步: {snapshot.get('synced_at')} ({snapshot.get('settings')})")
+    else:
+        old_vers = scan_local_versions()
+        print(f"[-] 未找到同步快照，按本地 {CONFIG_DIR}/ 推断旧版本 ({len(old_vers)} 个 Bundle)")
+
+    # 1. Settings 层比对
+    bundle_diff = catalog_diff.diff_bundle_vers(old_vers, new_vers)
+    targets = list(bundle_diff["added"]) + list(bundle_diff["changed"])
+    print(f"[-] Bundle 新增 {len(bundle_diff['added'])}，变更 {len(bundle_diff['changed'])}，"
+          f"删除 {len(bundle_diff['removed'])}，未变 {bundle_diff['unchanged']}")
+
+    settings_name = os.path.basename(step1.SETTINGS_URL)
+    if not targets:
+        catalog_diff.save_snapshot(new_vers, settings_name)
+        print("\n✅ 没有需要同步的内容。")
+        return
+
+    # 2. 拉取新版本 Config (本地仓库已有的直接读取)
+    def fetch_config(b_name):
+        with metrics.task(b_name, "config") as t:
+            t.ok = config_store.load_config(step1.BASE_RES_URL, b_name, new_vers[b_name], headers=step1.HEADERS)
+            return t.ok
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        fetched = list(tqdm(executor.map(fetch_config, targets), total=len(targets), unit="cfg", desc="📄 Config"))
+
+    shared_manifest = manifest.DownloadManifest()
+    step2.MANIFEST = shared_manifest
+    step5.MANIFEST = shared_manifest
+
+    # 3. Config 层比对，只把 hash 变化的资源加入队列
+    import_tasks, native_tasks = [], []
+    failed_bundles = set()
+    new_entries = {}
+    report_bundles = {}
+    for b_name, new_cfg in zip(targets, fetched):
+        if not new_cfg:
+            failed_bundles.add(b_name)
+            report_bundles[b_name] = {"error": "config 下载失败"}
+            continue
+        new_entries[b_name] = asset_index.entries_from_config(b_name, new_cfg)
+        old_cfg = config_store.load_local(b_name, old_vers.get(b_name))
+        cfg_diff = catalog_diff.diff_config(old_cfg, new_cfg)
+
+        import_map = catalog_diff.version_map(new_cfg, "import")
+        for u in catalog_diff.changed_uuids(cfg_diff, "import"):
+            import_tasks.append((b_name, u, import_map[u]))
+
+        save_dir = os.path.join(step5.DOWNLOAD_ROOT, b_name)
+        os.makedirs(save_dir, exist_ok=True)
+        # 清单中已记录新 hash 的 (上次同步中途失败前已下好的) 不再重复下载
+        native_tasks.extend(step5.build_native_tasks(
+            b_name, new_entries[b_name], save_dir, known=shared_manifest.lookup_bundle(b_name, "native"),
+            only_uuids=catalog_diff.changed_uuids(cfg_diff, "native")))
+
+        report_bundles[b_name] = {
+            "old_ver": old_vers.get(b_name),
+            "new_ver": new_vers[b_name],
+            "had_old_config": old_cfg is not None,
+            "diff": cfg_diff,
+        }
+
+    print(f"[-] 需要下载: import {len(import_tasks)}，native {len(native_tasks)}")
+
+    # 4. 先下 import (native 的后缀解析依赖它)，再下 native
+    if import_tasks:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            import_results = list(tqdm(executor.map(step2.worker_task, import_tasks),
+                                       total=len(import_tasks), unit="file", desc="⬇️ import"))
+        # 下载失败的 import 所在 Bundle 保留旧版本号，下次同步重新比对
+        for task, ok in zip(import_tasks, import_results):
+            if not ok:
+                failed_bundles.add(task[0])
+                report_bundles[task[0]].setdefault("failed_import", []).append(task[1])
+
+    if native_tasks:
+        # 走 BundleScheduler：5xx / 超时的资源退避后重新入队，不占用工作线程
+        def on_task_done(b_name, task, ok):
+            if not ok:
+                failed_bundles.add(b_name)
+                report_bundles[b_name].setdefault("failed_native", []).append(task[1])
+
+        tasks_by_bundle = {}
+        for task in native_tasks:
+            tasks_by_bundle.setdefault(task[0], []).append(task)
+        # 原生文件按资源路径命名，hash 变化时旧版本就在目标路径上，必须忽略已有文件强制重新下载
+        worker = functools.partial(step5.process_asset_task, overwrite=True)
+        scheduler = bundle_scheduler.BundleScheduler(worker, MAX_WORKERS,
+                                                     total_bundles=len(tasks_by_bundle), on_task_done=on_task_done,
+                                                     stage="native")
+        for b_name, tasks in tasks_by_bundle.items():
+            scheduler.submit_bundle(b_name, tasks)
+        scheduler.join()
+        print(scheduler.format_summary())
+
+    # 5. 变更过的 Bundle 重新提取 Spine
+    for b_name, entries in new_entries.items():
+        step5.extract_spines_for_bundle(b_name, entries, os.path.join(step5.DOWNLOAD_ROOT, b_name))
+
+    shared_manifest.close()
+    step5.EXT_PREDICTOR.save()
+
+    # 6. 报告 + 快照 (失败的 Bundle 保留旧版本号，下次同步会重新比对)
+    report = {
+        "settings": settings_name,
+        "bundles": {k: v for k, v in bundle_diff.items() if k != "unchanged"},
+        "unchanged": bundle_diff["unchanged"],
+        "import_tasks": len(import_tasks),
+        "native_tasks": len(native_tasks),
+        "failed_bundles": sorted(failed_bundles),
+        "details": report_bundles,
+    }
+    report_path = catalog_diff.write_report(report)
+
+    snapshot_vers = dict(new_vers)
+    for b_name in failed_bundles:
+        if b_name in old_vers:
+            snapshot_vers[b_name] = old_vers[b_name]
+        else:
+            snapshot_vers.pop(b_name, None)
+    catalog_diff.save_snapshot(snapshot_vers, settings_name)
+    asset_index.build_index(CONFIG_DIR, bundle_vers=snapshot_vers)
+
+    print(f"\n✅ 增量同步完成！变更报告: {os.path.abspath(report_path)}")
+    if failed_bundles:
+        print(f"⚠️ {len(failed_bundles)} 个 Bundle 未完全同步，下次运行会重试: {sorted(failed_bundles)}")
+    print(step5.SPINE_LOCATOR.format_stats())
+    print(http_client.format_stats())
+    metrics.finish()
+    print(metrics.format_stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+清理游戏更新后残留的旧版本文件。
+
+以当前 configs/ (或 asset_index.bin) 中的 (uuid, hash) 为准：
+  imports/<bundle>/import/xx/<uuid>.<hash>.json|.cconb   hash 不在当前 config 中的视为过期
+  assets_restored/                                       只清理下载清单中记录过、且已不被当前 config 引用的原生文件
+                                                         (Spine 导出、视频等清单外的文件一律保留)
+  两个目录中中断下载留下的 *.part 临时文件
+没有 config 的 Bundle 整个跳过，不做任何判断。
+
+自底向上遍历一次目录，删除 / 隔离文件的同时把因此变空的目录一并删除。
+
+    python 9_gc_stale_files.py              # 只统计可回收的空间，不改动任何文件
+    python 9_gc_stale_files.py quarantine   # 移动到 QUARANTINE_DIR，确认无误后再手动删除
+    python 9_gc_stale_files.py delete       # 直接删除
+"""
+import os
+import sys
+import time
+import shutil
+import asset_index
+import manifest
+import cocos_import
+import atomic_io
+
+# ================= ⚙️ 配置区域 =================
+CONFIG_DIR = "configs"
+IMPORT_ROOT = "imports"
+ASSETS_ROOT = "assets_restored"
+QUARANTINE_DIR = "gc_quarantine"
+# 默认模式: "report" / "quarantine" / "delete" (命令行参数优先)
+MODE = "report"
+# 比这更新的 .part 文件可能是正在进行的下载，不清理 (秒)
+PART_MIN_AGE = 3600
+# 汇总中列出可回收空间最多的前几个 Bundle
+TOP_BUNDLES = 10
+# ===============================================
+
+# 中断的下载 / 原子写入 (atomic_io) 与视频渲染 (4_video_maker) 留下的临时文件
+PART_SUFFIXES = (atomic_io.TEMP_SUFFIX, ".part.mp4")
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def load_live_set(index):
+    """ 返回 {bundle: (存活的 import (uuid, hash) 集合, 存活的 native (uuid, hash) 集合)} """
+    live = {}
+    for b_name, ver in asset_index.current_versions(CONFIG_DIR).items():
+        try:
+            entries = asset_index.bundle_entries(b_name, index, ver, config_dir=CONFIG_DIR)
+        except Exception as e:
+            print(f"[!] 跳过无法解析的 Config ({b_name}): {e}")
+            continue
+        if entries is None:
+            continue
+        imports, natives = set(), set()
+        for e in entries:
+            if e.import_hash:
+                # 本地文件名可能是长 uuid，也可能是短 uuid
+                imports.add((e.uuid, e.import_hash))
+                imports.add((e.long_uuid, e.import_hash))
+            if e.native_hash:
+                natives.add((e.uuid, e.native_hash))
+        live[b_name] = (imports, natives)
+    return live
+
+
+def parse_import_name(name):
+    """ <uuid>.<hash>.json -> (uuid, hash)；不是 import 文件名返回 None """
+    for ext in cocos_import.IMPORT_EXTS:
+        if name.endswith(ext):
+            stem = name[:-len(ext)]
+            if "." in stem:
+                return tuple(stem.rsplit(".", 1))
+    return None
+
+
+def is_stale_part(path, name, now):
+    if not name.endswith(PART_SUFFIXES):
+        return False
+    try:
+        return now - os.path.getmtime(path) >= PART_MIN_AGE
+    except OSError:
+        return False
+
+
+class Collector:
+    def __init__(self, mode):
+        self.mode = mode
+        self.files = 0
+        self.bytes = 0
+        self.dirs = 0
+        self.errors = 0
+        self.by_reason = {}
+        self.by_bundle = {}
+        self.removed_paths = set()
+
+    def take(self, root, path, reason, bundle):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        if self.mode == "delete":
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.errors += 1
+                print(f"[!] 删除失败: {path} -> {e}")
+                return False
+        elif self.mode == "quarantine":
+            dst = os.path.join(QUARANTINE_DIR, os.path.basename(os.path.normpath(root)), os.path.relpath(path, root))
+            try:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.move(path, dst)
+            except OSError as e:
+                self.errors += 1
+                print(f"[!] 移动失败: {path} -> {e}")
+                return False
+        self.files += 1
+        self.bytes += size
+        self.by_reason[reason] = self.by_reason.get(reason, 0) + size
+        if bundle:
+            self.by_bundle[bundle] = self.by_bundle.get(bundle, 0) + size
+        self.removed_paths.add(_norm(path))
+        return True
+
+
+def sweep(root, classify, collector):
+    """
+    自底向上遍历 root：classify(路径, 文件名, 相对路径分段) 返回 (原因, bundle) 或 None。
+    目录里的文件和子目录都被清理掉后立即删除该目录 (report 模式只统计)。
+    """
+    if not os.path.exists(root):
+        return
+    emptied = set()
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        rel_parts = os.path.relpath(dirpath, root).split(os.sep)
+        if rel_parts == ["."]:
+            rel_parts = []
+        kept = 0
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            verdict = classify(path, name, rel_parts)
+            if verdict is None or not collector.take(root, path, *verdict):
+                kept += 1
+        kept += sum(1 for d in dirnames if os.path.join(dirpath, d) not in emptied)
+        if kept or dirpath == root:
+            continue
+        if collector.mode != "report":
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                continue
+        emptied.add(dirpath)
+        collector.dirs += 1
+
+
+def stale_native_paths(live, dm):
+    """ 清单中已不被当前 config 引用的原生文件 {规范化路径: [清单键...]}；同一路径被新版本复用的保留 """
+    stale, live_paths = {}, set()
+    for b_name, (_, natives) in live.items():
+        for (u, h), (path, _, _, _) in dm.lookup_bundle(b_name, "native").items():
+            if (u, h) in natives:
+                live_paths.add(_norm(path))
+            else:
+                stale.setdefault(_norm(path), []).append((b_name, u, "native", h))
+    for path in live_paths:
+        stale.pop(path, None)
+    return stale
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else MODE
+    if mode not in ("report", "quarantine", "delete"):
+        print(f"❌ 未知模式: {mode} (report / quarantine / delete)")
+        return
+    print(f"=== 过期文件清理 ({mode}) ===")
+
+    t0 = time.time()
+    live = load_live_set(asset_index.AssetIndex.load())
+    if not live:
+        print(f"❌ {CONFIG_DIR} 中没有可用的 Config，为安全起见不做清理。")
+        return
+    print(f"[-] 当前 Config: {len(live)} 个 Bundle ({time.time() - t0:.2f}s)")
+
+    dm = manifest.DownloadManifest()
+    native_stale = stale_native_paths(live, dm)
+    now = time.time()
+    collector = Collector(mode)
+
+    def classify_import(path, name, rel_parts):
+        # rel_parts: [bundle, "import", "xx"]
+        bundle = rel_parts[0] if rel_parts else None
+        if is_stale_part(path, name, now):
+            return "part", bundle
+        if len(rel_parts) < 2 or rel_parts[1] != "import" or bundle not in live:
+            return None
+        parsed = parse_import_name(name)
+        if parsed is None or parsed in live[bundle][0]:
+            return None
+        return "import", bundle
+
+    def classify_native(path, name, rel_parts):
+        bundle = rel_parts[0] if rel_parts else None
+        if is_stale_part(path, name, now):
+            return "part", bundle
+        if bundle in live and _norm(path) in native_stale:
+            return "native", bundle
+        return None
+
+    sweep(IMPORT_ROOT, classify_import, collector)
+    sweep(ASSETS_ROOT, classify_native, collector)
+
+    # 已删除 / 隔离的文件从下载清单中移除，下次同步会重新判断
+    if mode != "report":
+        forget = [key for path, keys in native_stale.items() if path in collector.removed_paths for key in keys]
+        for b_name in live:
+            for (u, h), (path, _, _, _) in dm.lookup_bundle(b_name, "import").items():
+                if _norm(path) in collector.removed_paths:
+                    forget.append((b_name, u, "import", h))
+        dm.forget_many(forget)
+    dm.close()
+
+    action = {"report": "可回收", "quarantine": "已隔离", "delete": "已删除"}[mode]
+    print("\n" + "=" * 30)
+    print(f"{action}: {collector.files} 个文件，{collector.bytes / 1024 / 1024:.1f} MB；空目录 {collector.dirs} 个")
+    for reason, size in sorted(collector.by_reason.items()):
+        print(f"    {reason}: {size / 1024 / 1024:.1f} MB")
+    top = sorted(collector.by_bundle.items(), key=lambda kv: kv[1], reverse=True)[:TOP_BUNDLES]
+    for b_name, size in top:
+        print(f"    📦 {b_name}: {size / 1024 / 1024:.1f} MB")
+    if collector.errors:
+        print(f"⚠️ {collector.errors} 个文件处理失败")
+    if mode == "report" and collector.files:
+        print("确认无误后运行 `python 9_gc_stale_files.py quarantine` 或 `delete`。")
+    elif mode == "quarantine" and collector.files:
+        print(f"文件已移动到: {os.path.abspath(QUARANTINE_DIR)}")
+    print(f"耗时 {time.time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
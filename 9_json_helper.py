@@ -1,63 +1,120 @@
 import os
-import json
+import concurrent.futures
+import json_codec
+import atomic_io
 from tqdm import tqdm
 
 # ================= ⚙️ 配置区域 =================
-# 输入下载好的资源根目录文件夹名称
-TARGET_DIR = input("资源根目录文件夹（configs，imports等等）：")
-
 # 缩进空格数 (VSCode 默认通常是 2 或 4)
-INDENT_SIZE = 4 
+INDENT_SIZE = 4
+
+# 输出到同级镜像目录 (imports -> imports_pretty)，原目录不变，其他脚本照常读取。
+# 留空则原地改写：下载的文件 md5 会变，校验时会被当作损坏文件删除并重新下载
+MIRROR_SUFFIX = "_pretty"
+
+WORKERS = os.cpu_count() or 4
+# 每次派发给子进程的文件数，文件很多时减少进程间通信开销
+CHUNK_SIZE = 256
+# 只读取文件开头这么多字节判断是否已格式化
+SNIFF_BYTES = 64
 # ===============================================
 
-def format_local_json_files():
-    if not os.path.exists(TARGET_DIR):
-        print(f"❌ 错误：找不到文件夹 '{TARGET_DIR}'，请检查配置。")
-        return
+def is_formatted(head, indent=INDENT_SIZE):
+    """ 已按 indent 格式化的文件：开头为 [ 或 { + 换行 + 恰好 indent 个空格；空容器也算 """
+    head = head.lstrip()
+    if head[:1] not in (b"[", b"{"):
+        return False
+    rest = head[1:]
+    if rest.lstrip()[:1] in (b"]", b"}"):
+        return True
+    prefix = b"\n" + b" " * indent
+    return rest.startswith(prefix) and rest[len(prefix):len(prefix) + 1] not in (b" ", b"")
 
-    # 1. 扫描所有 json 文件
-    print(f"[-] 正在扫描目录: {os.path.abspath(TARGET_DIR)} ...")
-    json_files_list = []
-    
-    for root, dirs, files in os.walk(TARGET_DIR):
+def format_one(src_path, dst_path, indent=INDENT_SIZE):
+    """ 子进程任务：返回 (状态, 路径, 错误信息)，状态为 ok / skipped / error """
+    try:
+        if dst_path == src_path:
+            with open(src_path, 'rb') as f:
+                if is_formatted(f.read(SNIFF_BYTES), indent):
+                    return "skipped", src_path, None
+        else:
+            # 镜像目录中的文件比源文件新则说明已经处理过
+            try:
+                if os.stat(dst_path).st_mtime_ns >= os.stat(src_path).st_mtime_ns:
+                    return "skipped", src_path, None
+            except FileNotFoundError:
+                pass
+
+        data = json_codec.load_path(src_path)
+        # 写入临时文件后改名，中断时不会留下半截的 JSON (中文/日文保持原样，不会变成 \uXXXX)
+        atomic_io.write_bytes_atomic(dst_path, json_codec.dumps(data, indent=indent))
+        return "ok", src_path, None
+    except Exception as e:
+        return "error", src_path, str(e)
+
+def _format_job(job):
+    return format_one(*job)
+
+def scan_json_files(target_dir, mirror_dir=""):
+    """ 返回 [(源路径, 目标路径, 缩进)]；镜像目录位于目标目录内时不扫描它 """
+    mirror_abs = os.path.abspath(mirror_dir) if mirror_dir else None
+    jobs = []
+    for root, dirs, files in os.walk(target_dir):
+        if mirror_abs:
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != mirror_abs]
         for file in files:
             if file.lower().endswith(".json"):
-                full_path = os.path.join(root, file)
-                json_files_list.append(full_path)
+                src_path = os.path.join(root, file)
+                if mirror_dir:
+                    dst_path = os.path.join(mirror_dir, os.path.relpath(src_path, target_dir))
+                else:
+                    dst_path = src_path
+                jobs.append((src_path, dst_path, INDENT_SIZE))
+    return jobs
+
+def default_mirror_dir(target_dir):
+    """ 按 MIRROR_SUFFIX 推出镜像目录，为空表示原地改写 """
+    if not MIRROR_SUFFIX:
+        return ""
+    return os.path.normpath(target_dir) + MIRROR_SUFFIX
+
+def format_local_json_files(target_dir, mirror_dir=None, workers=WORKERS):
+    if not os.path.exists(target_dir):
+        print(f"❌ 错误：找不到文件夹 '{target_dir}'，请检查配置。")
+        return
+    if mirror_dir is None:
+        mirror_dir = default_mirror_dir(target_dir)
 
-    if not json_files_list:
+    # 1. 扫描所有 json 文件
+    print(f"[-] 正在扫描目录: {os.path.abspath(target_dir)} ...")
+    jobs = scan_json_files(target_dir, mirror_dir)
+
+    if not jobs:
         print("⚠️ 未找到任何 JSON 文件。")
         return
 
-    print(f"[-] 找到 {len(json_files_list)} 个 JSON 文件，开始格式化...")
-
-    # 2. 批量处理
-    success_count = 0
-    error_count = 0
-
-    for file_path in tqdm(json_files_list, unit="file"):
-        try:
-            # 读取原始数据
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 重新写入（带格式化）
-            with open(file_path, 'w', encoding='utf-8') as f:
-                # indent=INDENT_SIZE: 开启缩进
-                # ensure_ascii=False: 保证中文/日文正常显示，不会变成 \uXXXX
-                json.dump(data, f, indent=INDENT_SIZE, ensure_ascii=False)
-            
-            success_count += 1
-            
-        except Exception as e:
-            error_count += 1
-            tqdm.write(f"[!] 处理失败: {file_path} -> {e}")
+    dest = f"输出到 {os.path.abspath(mirror_dir)}" if mirror_dir else "原地改写"
+    print(f"[-] 找到 {len(jobs)} 个 JSON 文件，{workers} 个进程开始格式化 ({dest})...")
+    if not mirror_dir:
+        print("⚠️ 原地改写会改变文件 md5，之后运行下载脚本时这些文件会校验失败并被重新下载。")
+
+    # 2. 多进程批量处理，已格式化的文件跳过
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_format_job, jobs, chunksize=CHUNK_SIZE)
+        for status, file_path, err in tqdm(results, total=len(jobs), unit="file"):
+            counts[status] += 1
+            if status == "error":
+                tqdm.write(f"[!] 处理失败: {file_path} -> {err}")
 
     print("\n" + "="*30)
     print(f"✅ 处理完成！")
-    print(f"成功: {success_count}")
-    print(f"失败: {error_count}")
+    print(f"成功: {counts['ok']}")
+    print(f"跳过 (已格式化): {counts['skipped']}")
+    print(f"失败: {counts['error']}")
     print("现在用 VSCode 打开文件夹，JSON 应该已经自动分行并着色了。")
 
 if __name__ == "__main__":
-    format_local_json_files()
\ No newline at end of file
+    # 输入下载好的资源根目录文件夹名称 (放在这里，子进程导入本模块时不会再次询问)
+    target = input("资源根目录文件夹（configs，imports等等）：")
+    format_local_json_files(target)
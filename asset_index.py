@@ -0,0 +1,237 @@
+"""
+全局资源索引。
+
+把 configs/ 下所有 Bundle 的 config 预编译成一个紧凑的二进制文件 (asset_index.bin)，
+每个资源一行：uuid / 长 uuid / bundle / path / type / import hash / native hash。
+文件是按列存放的 marshal 数据，加载只需几毫秒，各工具直接查询，不再各自解析 config。
+
+    python asset_index.py          # 重新编译索引
+"""
+import os
+import json_codec
+import marshal
+from collections import namedtuple
+import uuid_codec
+
+# ================= ⚙️ 配置区域 =================
+CONFIG_DIR = "configs"
+INDEX_FILE = "asset_index.bin"
+# 用于挑选每个 Bundle 的当前版本 (与 1_config_downloader 保存的 settings 文件一致)
+SETTINGS_FILE = "settings.4229e.json"
+# ===============================================
+
+_MAGIC = b"SHMIDX1\n"
+
+AssetEntry = namedtuple("AssetEntry", "uuid long_uuid bundle path type import_hash native_hash")
+
+
+def _version_by_index(config, kind):
+    arr = config.get("versions", {}).get(kind, [])
+    return {arr[i]: arr[i + 1] for i in range(0, len(arr) - 1, 2)}
+
+
+def entries_from_config(bundle_name, config):
+    """ 把单个 config 编译成 AssetEntry 列表 (索引缺失或过期时各工具也用它做回退) """
+    uuids = config.get("uuids", [])
+    paths = config.get("paths", {})
+    types = config.get("types", [])
+    import_vers = _version_by_index(config, "import")
+    native_vers = _version_by_index(config, "native")
+
+    long_uuids = uuid_codec.decompress_many(uuids)
+
+    entries = []
+    for idx, u in enumerate(uuids):
+        path_info = None
+        res_type = None
+        data_arr = paths.get(str(idx))
+        if isinstance(data_arr, list) and data_arr:
+            path_info = data_arr[0]
+            if len(data_arr) > 1 and isinstance(data_arr[1], int) and data_arr[1] < len(types):
+                res_type = types[data_arr[1]]
+        entries.append(AssetEntry(u, long_uuids[idx], bundle_name, path_info, res_type,
+                                  import_vers.get(idx), native_vers.get(idx)))
+    return entries
+
+
+def _pick_version(b_dir, wanted_ver=None):
+    """ 优先 settings 中的版本，否则取目录里最新修改的 config；没有 config 返回 None """
+    if not os.path.isdir(b_dir):
+        return None
+    cfgs = [f for f in os.listdir(b_dir) if f.startswith("config.") and f.endswith(".json")]
+    if not cfgs:
+        return None
+    wanted = f"config.{wanted_ver}.json" if wanted_ver else None
+    if wanted not in cfgs:
+        wanted = max(cfgs, key=lambda f: os.path.getmtime(os.path.join(b_dir, f)))
+    return wanted[len("config."):-len(".json")]
+
+
+def _current_versions(config_dir, bundle_vers):
+    versions = {}
+    if not os.path.exists(config_dir):
+        return versions
+    for b_name in os.listdir(config_dir):
+        ver = _pick_version(os.path.join(config_dir, b_name), bundle_vers.get(b_name))
+        if ver:
+            versions[b_name] = ver
+    return versions
+
+
+def _load_settings_vers():
+    if not os.path.exists(SETTINGS_FILE):
+        return {}
+    try:
+        return json_codec.load_path(SETTINGS_FILE).get("assets", {}).get("bundleVers", {})
+    except Exception:
+        return {}
+
+
+def current_versions(config_dir=CONFIG_DIR, bundle_vers=None):
+    """ {bundle: 当前 config 版本}，版本选择规则与 build_index 相同 """
+    if bundle_vers is None:
+        bundle_vers = _load_settings_vers()
+    return _current_versions(config_dir, bundle_vers)
+
+
+def build_index(config_dir=CONFIG_DIR, path=INDEX_FILE, bundle_vers=None):
+    """ 编译所有 config，返回写入的资源条数 """
+    versions = current_versions(config_dir, bundle_vers)
+
+    bundle_names, bundle_ver_list, type_names = [], [], []
+    type_pos = {}
+    cols = {k: [] for k in ("uuid", "long_uuid", "bundle", "path", "type", "import_hash", "native_hash")}
+    for b_name, ver in sorted(versions.items()):
+        try:
+            config = json_codec.load_path(os.path.join(config_dir, b_name, f"config.{ver}.json"))
+            entries = entries_from_config(b_name, config)
+        except Exception as e:
+            # 不写入索引：has_bundle 为 False，下载脚本会回退到逐个解析 / 重新获取 Config
+            print(f"[!] 跳过无法解析的 Config ({b_name}): {e}")
+            continue
+        b_idx = len(bundle_names)
+        bundle_names.append(b_name)
+        bundle_ver_list.append(ver)
+        for e in entries:
+            if e.type not in type_pos:
+                type_pos[e.type] = len(type_names)
+                type_names.append(e.type)
+            cols["uuid"].append(e.uuid)
+            cols["long_uuid"].append(e.long_uuid)
+            cols["bundle"].append(b_idx)
+            cols["path"].append(e.path)
+            cols["type"].append(type_pos[e.type])
+            cols["import_hash"].append(e.import_hash)
+            cols["native_hash"].append(e.native_hash)
+
+    payload = (bundle_names, bundle_ver_list, type_names,
+               cols["uuid"], cols["long_uuid"], cols["bundle"], cols["path"],
+               cols["type"], cols["import_hash"], cols["native_hash"])
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(marshal.dumps(payload))
+    os.replace(tmp_path, path)
+    return len(cols["uuid"])
+
+
+class AssetIndex:
+    def __init__(self, payload):
+        (self.bundle_names, bundle_ver_list, self.type_names,
+         self._uuid, self._long_uuid, self._bundle, self._path,
+         self._type, self._import_hash, self._native_hash) = payload
+        self.bundle_vers = dict(zip(self.bundle_names, bundle_ver_list))
+        self._bundle_pos = {b: i for i, b in enumerate(self.bundle_names)}
+        self._by_uuid = None
+        self._by_bundle = None
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        """ 索引不存在或格式不符时返回 None，调用方应回退到直接解析 config """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if not data.startswith(_MAGIC):
+                return None
+            return cls(marshal.loads(data[len(_MAGIC):]))
+        except Exception:
+            return None
+
+    def __len__(self):
+        return len(self._uuid)
+
+    def _entry(self, row):
+        return AssetEntry(self._uuid[row], self._long_uuid[row], self.bundle_names[self._bundle[row]],
+                          self._path[row], self.type_names[self._type[row]],
+                          self._import_hash[row], self._native_hash[row])
+
+    def _build_bundle_rows(self):
+        # 行本来就按 Bundle 连续存放，只需记录每个 Bundle 的起止位置
+        self._by_bundle = {}
+        for row, b_idx in enumerate(self._bundle):
+            start, _ = self._by_bundle.get(b_idx, (row, row))
+            self._by_bundle[b_idx] = (start, row + 1)
+
+    def bundle_version(self, bundle_name):
+        return self.bundle_vers.get(bundle_name)
+
+    def has_bundle(self, bundle_name, bundle_ver=None):
+        """ 传入 bundle_ver 时还会校验索引里的版本是否一致 """
+        ver = self.bundle_vers.get(bundle_name)
+        return ver is not None and (bundle_ver is None or ver == bundle_ver)
+
+    def bundle_assets(self, bundle_name):
+        if self._by_bundle is None:
+            self._build_bundle_rows()
+        b_idx = self._bundle_pos.get(bundle_name)
+        if b_idx is None:
+            return []
+        start, end = self._by_bundle.get(b_idx, (0, 0))
+        return [self._entry(row) for row in range(start, end)]
+
+    def find(self, bundle_name, type_name):
+        return [e for e in self.bundle_assets(bundle_name) if e.type == type_name]
+
+    def bundles_with_type(self, type_name):
+        if type_name not in self.type_names:
+            return []
+        t_idx = self.type_names.index(type_name)
+        return sorted({self.bundle_names[self._bundle[row]] for row, t in enumerate(self._type) if t == t_idx})
+
+    def lookup(self, uuid):
+        """ 按压缩 uuid 或长 uuid 查询，返回 AssetEntry 或 None """
+        if self._by_uuid is None:
+            by_uuid = {}
+            for row in range(len(self._uuid)):
+                by_uuid.setdefault(self._uuid[row], row)
+                by_uuid.setdefault(self._long_uuid[row], row)
+            self._by_uuid = by_uuid
+        row = self._by_uuid.get(uuid)
+        return None if row is None else self._entry(row)
+
+
+def bundle_entries(bundle_name, index=None, bundle_ver=None, config_dir=CONFIG_DIR):
+    """
+    取某个 Bundle 的全部资源条目：索引里有 (且版本一致) 就直接用，
+    否则回退到解析 configs/<bundle>/ 下的 config。找不到返回 None。
+    """
+    if index is not None and index.has_bundle(bundle_name, bundle_ver):
+        return index.bundle_assets(bundle_name)
+    b_dir = os.path.join(config_dir, bundle_name)
+    ver = bundle_ver or _pick_version(b_dir, _load_settings_vers().get(bundle_name))
+    cfg_path = os.path.join(b_dir, f"config.{ver}.json")
+    if not ver or not os.path.exists(cfg_path):
+        return None
+    return entries_from_config(bundle_name, json_codec.load_path(cfg_path))
+
+
+if __name__ == "__main__":
+    import time
+    t0 = time.time()
+    count = build_index()
+    print(f"✅ 索引编译完成: {count} 条资源 -> {os.path.abspath(INDEX_FILE)} ({time.time() - t0:.2f}s)")
+    t0 = time.time()
+    idx = AssetIndex.load()
+    print(f"[-] 加载耗时: {(time.time() - t0) * 1000:.1f} ms，{len(idx.bundle_names)} 个 Bundle")
@@ -0,0 +1,281 @@
+"""
+基于 asyncio + aiohttp 的原生资源下载引擎。
+
+直接驱动 process_bundle 生成的任务元组：
+  (bundle_name, compressed_uuid, native_hash, import_hash, save_dir, path_info, known_type)
+调用方提供 plan_fn(task) -> (mode, [(url, save_path), ...])：
+  mode == "serial" 按顺序尝试，第一个成功即停止；
+  mode == "race"   先 GET 第一个 (预测的) 候选，落空后并发 HEAD 其余候选，第一个 2xx 胜出并取消其余，再只 GET 胜出者。
+同时在途的请求数由 concurrency.AsyncAdaptiveLimiter 按服务器反馈调整，MAX_IN_FLIGHT 只是上限；
+已开始的任务数不超过 max_pending，任务不会一次性全部创建。
+响应体逐块写入临时文件 (边写边算 md5)，不会整体读进内存。
+错误分类与线程池路径相同 (retry_scheduler)：只有 403 / 404 / 410 会继续试探下一个后缀；
+429 / 5xx / 超时 / 连接错误按 backoff_delay 退避后整个资源重来 (最多 MAX_ATTEMPTS 次)，
+每个请求前检查 Host 熔断器并反馈结果，熔断期间的等待不计入重试次数。
+每个资源包在 metrics.task(bundle) 中，请求与 404 试探按 Bundle 计入运行指标。
+"""
+import os
+import asyncio
+import contextvars
+import aiohttp
+from tqdm import tqdm
+import http_client
+import atomic_io
+import verifier
+import retry_scheduler
+import concurrency
+import metrics
+
+# ================= ⚙️ 配置区域 =================
+# 全局同时在途请求数的上限 (所有 Bundle 共用一个自适应限流器)
+MAX_IN_FLIGHT = 256
+REQUEST_TIMEOUT = 15
+# ===============================================
+
+# 最近一次运行的限流器，供结束时输出统计
+LAST_LIMITER = None
+
+
+def _call(fn, *args):
+    """ 放到线程池执行；run_in_executor 不会复制 contextvars，这里带上当前 context (metrics.task 的 Bundle 归属) """
+    return asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, fn, *args)
+
+
+def _is_transient(exc):
+    # aiohttp 的连接断开 / 响应体截断不都是 OSError 子类，单独判断；其余按 classify_error (本地磁盘错误不重试)
+    if isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return True
+    return retry_scheduler.classify_error(exc) == "retry"
+
+
+async def _existing_ok(path, url):
+    # 已有文件的 md5 校验要读盘，放到线程池
+    return await _call(verifier.existing_ok, path, verifier.hash_from_url(url))
+
+
+def _write_chunk(f, hasher, chunk):
+    f.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+async def _stream_to_file(resp, path, expected_hash):
+    """ 响应体逐块写入临时文件，完整且与版本 hash 一致才原子改名为 path；内容不符抛出 verifier.HashMismatch (重新下载) """
+    hasher = verifier.new_hasher() if verifier.should_verify(expected_hash) else None
+    f, tmp_path = await _call(atomic_io.open_temp, path)
+    total = 0
+    try:
+        async for chunk in resp.content.iter_chunked(http_client.CHUNK_SIZE):
+            total += len(chunk)
+            # 磁盘写入丢给线程池，避免阻塞事件循环
+            await _call(_write_chunk, f, hasher, chunk)
+            wait = http_client.reserve_bandwidth(len(chunk))
+            if wait > 0:
+                await asyncio.sleep(wait)
+        if hasher is not None:
+            digest = hasher.hexdigest()
+            if verifier.check(digest, expected_hash) is False:
+                raise verifier.HashMismatch(path, expected_hash, digest)
+    except BaseException:
+        atomic_io.discard_temp(f, tmp_path)
+        raise
+    finally:
+        # 中途失败的部分同样占用了带宽
+        metrics.add_bytes(total)
+    await _call(atomic_io.commit_temp, f, tmp_path, path)
+
+
+async def _fetch_to_file(session, limiter, url, path, headers, overwrite):
+    """
+    与 http_client.fetch_to_file 相同：200 返回 True，404 等 (不存在) 返回 False，
+    429 / 5xx / 超时 / 连接错误抛出 RetryLater，熔断中抛出 CircuitOpen，其余状态码抛出 RuntimeError (不再试探其他后缀)，
+    内容与 URL 中的版本 hash 不符抛出 verifier.HashMismatch (同样是 RetryLater)。
+    """
+    if not overwrite and await _existing_ok(path, url):
+        return True
+    breaker = retry_scheduler.breaker_for(url)
+    breaker.check()
+    status = None
+    # 每条路径都要反馈给熔断器；本地磁盘错误不算源站故障
+    origin_ok = True
+    try:
+        async with limiter.slot() as slot:
+            async with session.get(url, headers=headers) as resp:
+                status = resp.status
+                slot.observe(status)
+                metrics.record_request("GET", status, slot.latency)
+                kind = retry_scheduler.classify_status(status)
+                origin_ok = kind != "retry"
+                if kind == "ok":
+                    # 并发名额一直占用到响应体写完，和线程池路径一致；内容不符抛出 HashMismatch，同一 URL 退避后重新下载
+                    await _stream_to_file(resp, path, verifier.hash_from_url(url))
+    except retry_scheduler.RetryLater:
+        raise
+    except Exception as e:
+        if not _is_transient(e):
+            raise
+        if status is None:
+            metrics.record_request("GET", None)
+        origin_ok = False
+        raise retry_scheduler.RetryLater(f"{type(e).__name__}: {e}") from e
+    finally:
+        breaker.record(origin_ok)
+    if kind == "retry":
+        raise retry_scheduler.RetryLater(f"HTTP {status}")
+    if kind == "fail":
+        raise RuntimeError(f"HTTP {status}")
+    return kind == "ok"
+
+
+async def _probe_one(session, limiter, url, headers):
+    """ 返回错误分类 (retry_scheduler.classify_status / classify_error) """
+    try:
+        async with limiter.slot() as slot:
+            async with session.head(url, headers=headers, allow_redirects=True) as resp:
+                slot.observe(resp.status)
+                metrics.record_request("HEAD", resp.status, slot.latency)
+                kind = retry_scheduler.classify_status(resp.status)
+    except Exception as e:
+        if not _is_transient(e):
+            raise
+        metrics.record_request("HEAD", None)
+        kind = "retry"
+    retry_scheduler.breaker_for(url).record(kind != "retry")
+    return kind
+
+
+async def _race_probe(session, limiter, urls, headers):
+    """
+    返回第一个 2xx 的下标，其余试探立即取消；全部 404 等返回 None。
+    没有胜出者且有候选遇到 5xx / 超时 (结果不可信) 时抛出 RetryLater；熔断中抛出 CircuitOpen。
+    """
+    if not urls:
+        return None
+    retry_scheduler.breaker_for(urls[0]).check()
+    probes = {asyncio.ensure_future(_probe_one(session, limiter, url, headers)): i for i, url in enumerate(urls)}
+    pending = set(probes)
+    transient = 0
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                kind = "retry" if fut.cancelled() or fut.exception() is not None else fut.result()
+                if kind == "ok":
+                    return probes[fut]
+                if kind == "retry":
+                    transient += 1
+    finally:
+        for fut in pending:
+            fut.cancel()
+    if transient:
+        raise retry_scheduler.RetryLater(f"{transient}/{len(urls)} 个后缀试探暂时失败")
+    return None
+
+
+async def _run_asset(session, limiter, plan_fn, task, headers, overwrite):
+    """ 返回 (尝试次数, url, 保存路径)，全部失败返回 None """
+    # plan_fn 可能读取本地 import 文件，同样放到线程池里执行
+    mode, candidates = await _call(plan_fn, task)
+    if mode == "race":
+        if not overwrite:
+            # 只校验第一个已存在的候选，下面下载时不再重复读取
+            for probes, (url, path) in enumerate(candidates, 1):
+                if os.path.exists(path):
+                    if await _existing_ok(path, url):
+                        return probes, url, path
+                    break
+        url, path = candidates[0]
+        if await _fetch_to_file(session, limiter, url, path, headers, True):
+            return 1, url, path
+        rest = candidates[1:]
+        idx = await _race_probe(session, limiter, [url for url, _ in rest], headers)
+        if idx is None:
+            return None
+        url, path = rest[idx]
+        if await _fetch_to_file(session, limiter, url, path, headers, True):
+            return idx + 2, url, path
+        return None
+    for probes, (url, path) in enumerate(candidates, 1):
+        if await _fetch_to_file(session, limiter, url, path, headers, overwrite):
+            return probes, url, path
+    return None
+
+
+async def _run_all(tasks, plan_fn, headers, max_in_flight, max_pending, overwrite, on_done, desc):
+    global LAST_LIMITER
+    limiter = LAST_LIMITER = concurrency.AsyncAdaptiveLimiter(max_in_flight)
+    metrics.set_workers(max_in_flight)
+    connector = aiohttp.TCPConnector(limit=max_in_flight, ssl=False)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    results = [None] * len(tasks)
+    # 与 BundleScheduler 的 max_pending 相同：已开始但未结束的任务数有上限，任务列表再长也不会一次性建出全部协程
+    slots = asyncio.Semaphore(max_pending or max_in_flight * 4)
+    pbar = tqdm(total=len(tasks), desc=desc, unit="file")
+
+    async def attempt(task):
+        # 每个协程有自己的 context，块内 (包括并发试探) 的请求都计入这个资源
+        with metrics.task(task[0]) as t:
+            hit = await _run_asset(session, limiter, plan_fn, task, headers, overwrite)
+            t.ok = hit is not None
+            return hit
+
+    async def runner(i, task):
+        # 与 BundleScheduler 相同的重试规则；等待期间只占 max_pending 名额，不占在途请求
+        retries = deferrals = 0
+        try:
+            while True:
+                try:
+                    results[i] = await attempt(task)
+                    break
+                except retry_scheduler.CircuitOpen as e:
+                    # 熔断不是任务本身的问题，不消耗重试次数
+                    if deferrals >= retry_scheduler.MAX_DEFERRALS:
+                        break
+                    deferrals += 1
+                    metrics.record_retry("deferrals", bundle=task[0])
+                    await asyncio.sleep(e.delay)
+                except retry_scheduler.RetryLater as e:
+                    if retries + 1 >= retry_scheduler.MAX_ATTEMPTS:
+                        break
+                    delay = max(e.delay or 0, retry_scheduler.backoff_delay(retries))
+                    retries += 1
+                    metrics.record_retry("retries", bundle=task[0])
+                    await asyncio.sleep(delay)
+        except Exception:
+            results[i] = None
+        finally:
+            slots.release()
+        pbar.update(1)
+        if on_done:
+            on_done(task, results[i])
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        running = set()
+        for i, task in enumerate(tasks):
+            await slots.acquire()
+            fut = asyncio.ensure_future(runner(i, task))
+            running.add(fut)
+            fut.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running)
+    pbar.close()
+    return [hit is not None for hit in results]
+
+
+def _limiter_stats():
+    return LAST_LIMITER.stats() if LAST_LIMITER is not None else {}
+
+
+metrics.register_collector("async_concurrency", _limiter_stats)
+
+
+def run_asset_tasks(tasks, plan_fn, headers=None, max_in_flight=MAX_IN_FLIGHT, max_pending=None,
+                    overwrite=False, on_done=None, desc="   ⬇️ async"):
+    """
+    同步入口：跑完全部任务后返回与 tasks 对应的成功标记列表。
+    max_pending 为同时进行中的任务数上限 (默认 max_in_flight * 4)。
+    on_done(task, hit) 在每个任务结束时回调，hit 为 (尝试次数, url, 保存路径) 或 None。
+    """
+    if not tasks:
+        return []
+    return asyncio.run(_run_all(tasks, plan_fn, headers, max_in_flight, max_pending, overwrite, on_done, desc))
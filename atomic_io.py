@@ -0,0 +1,71 @@
+"""
+原子写文件：写入同目录下的临时文件，fsync 后 os.replace 改名为目标路径。
+中途崩溃或出错只会留下 *.part 临时文件，目标路径上永远只有完整文件。
+只依赖标准库，离线工具 (如 9_json_helper) 也可以直接使用。
+"""
+import os
+import tempfile
+
+# ================= ⚙️ 配置区域 =================
+# 未完成临时文件的后缀
+TEMP_SUFFIX = ".part"
+# ===============================================
+
+
+def _default_file_mode():
+    # os.umask 只能先设置再读回，模块导入时取一次 (此时还没有工作线程)
+    mask = os.umask(0)
+    os.umask(mask)
+    return 0o666 & ~mask
+
+
+# mkstemp 创建的临时文件权限是 0600，改名前恢复成普通 open() 创建文件时的权限
+_FILE_MODE = _default_file_mode()
+
+
+def open_temp(path):
+    """ 分步写入 (如异步下载逐块写)：返回 (临时文件对象, 临时路径)，写完调用 commit_temp，出错调用 discard_temp """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=TEMP_SUFFIX, dir=directory)
+    return os.fdopen(fd, 'wb'), tmp_path
+
+
+def commit_temp(f, tmp_path, path):
+    """ fsync 后原子改名为 path；失败时删除临时文件 """
+    try:
+        with f:
+            f.flush()
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), _FILE_MODE)
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        discard_temp(f, tmp_path)
+        raise
+
+
+def discard_temp(f, tmp_path):
+    try:
+        f.close()
+    except OSError:
+        pass
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+
+
+def write_atomic(path, write_fn):
+    """ write_fn(f) 向打开的临时文件写入内容；抛出异常时删除临时文件，目标文件保持不变 """
+    f, tmp_path = open_temp(path)
+    try:
+        write_fn(f)
+    except BaseException:
+        discard_temp(f, tmp_path)
+        raise
+    commit_temp(f, tmp_path, path)
+
+
+def write_bytes_atomic(path, data):
+    write_atomic(path, lambda f: f.write(data))
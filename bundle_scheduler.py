@@ -0,0 +1,149 @@
+"""
+跨 Bundle 的全局任务调度器。
+
+所有选中 Bundle 的资源任务流式送入同一个线程池，不再逐个 Bundle 等待线程池清空；
+每个 Bundle 单独统计进度，最后一个资源落地时触发 on_bundle_done (如 Spine 提取)。
+worker_fn 抛出 retry_scheduler.RetryLater 时，任务按退避延迟重新入队，等待期间不占用工作线程。
+每次执行都包在 metrics.task(bundle) 中，请求 / 耗时 / 重试按 Bundle 计入运行指标。
+"""
+import time
+import threading
+import concurrent.futures
+from tqdm import tqdm
+import retry_scheduler
+import metrics
+
+
+class BundleScheduler:
+    def __init__(self, worker_fn, max_workers, on_bundle_done=None, total_bundles=None, max_pending=None,
+                 on_task_done=None, stage=None):
+        """
+        worker_fn(task) -> bool        单个资源任务，返回是否成功；暂时性失败抛出 RetryLater
+        on_bundle_done(bundle, ctx)     Bundle 全部任务结束后调用，ctx 为 submit_bundle 传入的 context
+        on_task_done(bundle, task, ok)  每个任务最终结束 (不再重试) 时调用
+        max_pending                     在途 + 排队 + 等待重试的任务上限，规划线程超过上限会阻塞 (默认 max_workers * 4)
+        stage                           运行指标中的阶段名，默认为 metrics.start 的阶段
+        """
+        self.worker_fn = worker_fn
+        self.on_bundle_done = on_bundle_done
+        self.on_task_done = on_task_done
+        self.stage = stage or metrics.current_stage()
+        metrics.set_workers(max_workers, self.stage)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_pending or max_workers * 4)
+        self.retry_timer = retry_scheduler.RetryTimer()
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.outstanding = 0
+        self.retry_counts = {"retries": 0, "deferrals": 0}
+        self.active = {}    # bundle -> 进行中的统计
+        self.finished = {}  # bundle -> 完成后的统计
+        self.hook_errors = []
+        self.pbar_bundles = tqdm(total=total_bundles, unit="pkg", desc="📦 Total Bundles", position=0)
+        self.pbar_files = tqdm(total=0, unit="file", desc="   ⬇️ Files", position=1, leave=False)
+
+    def submit_bundle(self, bundle_name, tasks, context=None):
+        """ 在调用线程中逐个提交任务；没有任务的 Bundle 直接触发完成回调 """
+        state = {"total": len(tasks), "done": 0, "ok": 0, "failed": 0,
+                 "started": time.time(), "context": context}
+        with self.lock:
+            self.active[bundle_name] = state
+            self.pbar_files.total += len(tasks)
+            self.pbar_files.refresh()
+        if not tasks:
+            self._finish_bundle(bundle_name)
+            return
+        for task in tasks:
+            self.slots.acquire()
+            with self.lock:
+                self.outstanding += 1
+            self.executor.submit(self._run, bundle_name, task)
+
+    def skip_bundle(self):
+        """ 规划失败 (例如 Config 获取失败) 的 Bundle 只计入总进度 """
+        with self.lock:
+            self.pbar_bundles.update(1)
+
+    def _run(self, bundle_name, task, attempt=0, deferrals=0):
+        try:
+            with metrics.task(bundle_name, self.stage) as t:
+                ok = t.ok = bool(self.worker_fn(task))
+        except retry_scheduler.CircuitOpen as e:
+            # 熔断不是任务本身的问题，不消耗重试次数
+            if deferrals < retry_scheduler.MAX_DEFERRALS:
+                self._retry_later(e.delay, bundle_name, task, attempt, deferrals + 1, "deferrals")
+                return
+            ok = False
+        except retry_scheduler.RetryLater as e:
+            if attempt + 1 < retry_scheduler.MAX_ATTEMPTS:
+                delay = max(e.delay or 0, retry_scheduler.backoff_delay(attempt))
+                self._retry_later(delay, bundle_name, task, attempt + 1, deferrals, "retries")
+                return
+            ok = False
+        except Exception:
+            ok = False
+        # 任务最终结束才归还名额，等待重试的任务同样计入 max_pending
+        self.slots.release()
+        if self.on_task_done:
+            try:
+                self.on_task_done(bundle_name, task, ok)
+            except Exception:
+                pass
+        with self.lock:
+            state = self.active[bundle_name]
+            state["done"] += 1
+            state["ok" if ok else "failed"] += 1
+            self.pbar_files.update(1)
+            last = state["done"] == state["total"]
+        if last:
+            self._finish_bundle(bundle_name)
+        with self.lock:
+            self.outstanding -= 1
+            if self.outstanding == 0:
+                self.idle.notify_all()
+
+    def _retry_later(self, delay, bundle_name, task, attempt, deferrals, counter):
+        with self.lock:
+            self.retry_counts[counter] += 1
+        metrics.record_retry(counter, self.stage, bundle_name)
+        self.retry_timer.schedule(delay, lambda: self.executor.submit(self._run, bundle_name, task, attempt, deferrals))
+
+    def _finish_bundle(self, bundle_name):
+        with self.lock:
+            state = self.active.pop(bundle_name)
+        if self.on_bundle_done:
+            try:
+                self.on_bundle_done(bundle_name, state["context"])
+            except Exception as e:
+                self.hook_errors.append((bundle_name, str(e)))
+        state["elapsed"] = time.time() - state["started"]
+        del state["context"]
+        with self.lock:
+            self.finished[bundle_name] = state
+            self.pbar_bundles.update(1)
+
+    def join(self):
+        """ 等待所有任务 (包括等待重试的) 和完成回调结束，返回 {bundle: 统计} """
+        with self.lock:
+            while self.outstanding:
+                self.idle.wait()
+        self.retry_timer.close()
+        self.executor.shutdown(wait=True)
+        self.pbar_files.close()
+        self.pbar_bundles.close()
+        return self.finished
+
+    def format_summary(self):
+        ok = sum(s["ok"] for s in self.finished.values())
+        failed = sum(s["failed"] for s in self.finished.values())
+        lines = [f"[-] 📊 {len(self.finished)} 个 Bundle，成功 {ok} 个资源，失败 {failed} 个"]
+        retries, deferrals = self.retry_counts["retries"], self.retry_counts["deferrals"]
+        if retries or deferrals:
+            lines.append(f"[-] 🔁 重试 {retries} 次，熔断延后 {deferrals} 次 "
+                         f"(熔断触发 {retry_scheduler.breaker_trips()} 次)")
+        for b_name, s in sorted(self.finished.items(), key=lambda kv: -kv[1]["failed"]):
+            if s["failed"]:
+                lines.append(f"    ⚠️ {b_name}: 失败 {s['failed']}/{s['total']}")
+        for b_name, err in self.hook_errors:
+            lines.append(f"    ❌ {b_name} 后处理出错: {err}")
+        return "\n".join(lines)
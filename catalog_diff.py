@@ -0,0 +1,88 @@
+"""
+目录版本比对工具 (增量同步用)。
+
+- Settings 层：比较新旧 bundleVers，找出新增 / 变更 / 删除的 Bundle
+- Config 层：比较新旧 config 的 versions.import / versions.native，找出 hash 变化的资源
+"""
+import os
+import json_codec
+import time
+
+# ================= ⚙️ 配置区域 =================
+SNAPSHOT_FILE = "sync_snapshot.json"
+REPORT_DIR = "sync_reports"
+# ===============================================
+
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """ 读取上次同步完成时的 bundleVers 快照，不存在返回 None """
+    if not os.path.exists(path):
+        return None
+    try:
+        return json_codec.load_path(path)
+    except Exception as e:
+        print(f"[!] 同步快照读取失败: {e}")
+        return None
+
+
+def save_snapshot(bundle_vers, settings_name, path=SNAPSHOT_FILE):
+    data = {"settings": settings_name, "synced_at": time.strftime("%Y-%m-%d %H:%M:%S"), "bundleVers": bundle_vers}
+    tmp_path = path + ".tmp"
+    json_codec.dump_path(tmp_path, data, indent=2)
+    os.replace(tmp_path, path)
+
+
+def diff_bundle_vers(old_vers, new_vers):
+    """ 返回 {"added": {b: ver}, "changed": {b: (old, new)}, "removed": {b: ver}, "unchanged": n} """
+    added, changed, removed = {}, {}, {}
+    unchanged = 0
+    for b_name, ver in new_vers.items():
+        if b_name not in old_vers:
+            added[b_name] = ver
+        elif old_vers[b_name] != ver:
+            changed[b_name] = (old_vers[b_name], ver)
+        else:
+            unchanged += 1
+    for b_name, ver in old_vers.items():
+        if b_name not in new_vers:
+            removed[b_name] = ver
+    return {"added": added, "changed": changed, "removed": removed, "unchanged": unchanged}
+
+
+def version_map(config, kind):
+    """ config.versions[kind] 的 [idx, hash, idx, hash, ...] 展开为 {uuid: hash} """
+    uuids = config.get("uuids", [])
+    arr = config.get("versions", {}).get(kind, [])
+    v_map = {}
+    for i in range(0, len(arr), 2):
+        idx = arr[i]
+        if idx < len(uuids):
+            v_map[uuids[idx]] = arr[i + 1]
+    return v_map
+
+
+def diff_config(old_config, new_config):
+    """ 对 import / native 分别给出 added / changed / removed 的 uuid 列表；old_config 为 None 时全部视为新增 """
+    result = {}
+    for kind in ("import", "native"):
+        old_map = version_map(old_config, kind) if old_config else {}
+        new_map = version_map(new_config, kind)
+        result[kind] = {
+            "added": [u for u in new_map if u not in old_map],
+            "changed": [u for u in new_map if u in old_map and old_map[u] != new_map[u]],
+            "removed": [u for u in old_map if u not in new_map],
+        }
+    return result
+
+
+def changed_uuids(config_diff, kind):
+    """ 需要重新下载的 uuid 集合 (新增 + hash 变化) """
+    part = config_diff[kind]
+    return set(part["added"]) | set(part["changed"])
+
+
+def write_report(report, report_dir=REPORT_DIR):
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"sync_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    json_codec.dump_path(path, report, indent=2)
+    return path
@@ -0,0 +1,80 @@
+"""
+Cocos Creator 二进制 CCON (.cconb) 读取。
+
+    u32 magic (0x4E4F4343, "CCON")  u32 version (1)  u32 文件总长度
+    u32 json 长度  json 文档 (UTF-8)
+    若干 chunk：每个 chunk 从 8 字节对齐处开始，u32 长度 + 数据
+
+json 文档与 .json import 的结构完全相同，可直接交给 cocos_import / 扩展名解析 / Spine 提取；
+chunk 为文档中 TypedArray 等引用的二进制数据。全部基于 memoryview 切片，不复制数据。
+"""
+import struct
+import json_codec
+
+MAGIC = 0x4E4F4343
+VERSION = 1
+
+_U32 = struct.Struct("<I")
+_HEADER = struct.Struct("<IIII")
+
+
+class CCONError(ValueError):
+    pass
+
+
+class CCON:
+    __slots__ = ("document", "chunks")
+
+    def __init__(self, document, chunks):
+        self.document = document
+        self.chunks = chunks
+
+
+def is_ccon(data):
+    return len(data) >= 4 and _U32.unpack_from(data, 0)[0] == MAGIC
+
+
+def split_ccon(data):
+    """ 返回 (json 部分, [chunk, ...])，均为原缓冲区上的 memoryview """
+    view = memoryview(data)
+    if len(view) < _HEADER.size:
+        raise CCONError("CCON 数据过短")
+    magic, version, total_len, json_len = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise CCONError("不是 CCON 数据")
+    if version != VERSION:
+        raise CCONError(f"不支持的 CCON 版本: {version}")
+    if total_len != len(view):
+        raise CCONError(f"CCON 长度不符: 头部 {total_len}，实际 {len(view)}")
+
+    pos = _HEADER.size
+    if pos + json_len > total_len:
+        raise CCONError("CCON json 段越界")
+    json_view = view[pos:pos + json_len]
+    pos += json_len
+
+    chunks = []
+    while pos < total_len:
+        if pos % 8:
+            pos += 8 - pos % 8
+            if pos >= total_len:
+                break
+        if pos + 4 > total_len:
+            raise CCONError("CCON chunk 头越界")
+        (chunk_len,) = _U32.unpack_from(view, pos)
+        pos += 4
+        if pos + chunk_len > total_len:
+            raise CCONError("CCON chunk 越界")
+        chunks.append(view[pos:pos + chunk_len])
+        pos += chunk_len
+    return json_view, chunks
+
+
+def decode(data):
+    json_view, chunks = split_ccon(data)
+    return CCON(json_codec.loads(json_view), chunks)
+
+
+def load_path(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
@@ -0,0 +1,202 @@
+"""
+Cocos Creator 紧凑 import 格式 (列表形式) 的反序列化。
+.cconb 二进制 import 由 ccon_reader 拆出 json 文档后按相同方式处理。
+
+    [0] version  [1] sharedUuids  [2] sharedStrings  [3] sharedClasses  [4] sharedMasks
+    [5] instances  [6] instanceTypes  [7] refs  [8] dependObjs  [9] dependKeys  [10] dependUuidIndices
+
+class  = [类名, [字段名...], 高级类型偏移, ...]
+mask   = [class 下标, 字段下标..., 高级类型起点]
+实例   = [mask 下标, 值...]   第 i 个值对应字段 keys[mask[i]]
+
+每种 (类名, 字段, mask) 组合只编译一次成 {字段名: 值位置} 的偏移表并缓存，
+之后按字段名直接取值，不再整棵树递归搜索。高级类型 (引用、嵌套类等) 的字段返回原始编码值。
+旧的字典格式 ({"__type__": ...} 或其列表) 也按同样的接口访问。
+"""
+import os
+import json_codec
+import ccon_reader
+
+# ================= ⚙️ 配置区域 =================
+MAX_SCHEMA_CACHE = 4096
+# import 文件可能是 JSON 或二进制 CCON，按顺序查找
+IMPORT_EXTS = (".json", ".cconb")
+# ===============================================
+
+F_CLASSES = 3
+F_MASKS = 4
+F_INSTANCES = 5
+
+_SCHEMA_CACHE = {}
+
+
+def _compile_schema(cls_def, mask):
+    """ 返回 (类名, {字段名: 实例数组中的位置})，按 schema 元组缓存 """
+    keys = cls_def[1] if len(cls_def) > 1 and isinstance(cls_def[1], list) else []
+    key = (cls_def[0], tuple(keys), tuple(mask))
+    schema = _SCHEMA_CACHE.get(key)
+    if schema is None:
+        offsets = {}
+        # mask 最后一个元素是高级类型的起点，不是字段下标
+        for pos in range(1, len(mask) - 1):
+            k_idx = mask[pos]
+            if isinstance(k_idx, int) and k_idx < len(keys):
+                offsets[keys[k_idx]] = pos
+        schema = (cls_def[0], offsets)
+        if len(_SCHEMA_CACHE) >= MAX_SCHEMA_CACHE:
+            _SCHEMA_CACHE.clear()
+        _SCHEMA_CACHE[key] = schema
+    return schema
+
+
+class Instance:
+    """ 单个对象，type 为类名，get(field) 直接按偏移取值；base 为该对象在原始数据中的路径 """
+    __slots__ = ("type", "base", "_offsets", "_values")
+
+    def __init__(self, type_name, offsets, values, base=()):
+        self.type = type_name
+        self.base = base
+        self._offsets = offsets
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, d, base=()):
+        return cls(d.get("__type__"), None, d, base)
+
+    def has(self, field):
+        if self._offsets is None:
+            return field in self._values
+        pos = self._offsets.get(field)
+        return pos is not None and pos < len(self._values)
+
+    def get(self, field, default=None):
+        if self._offsets is None:
+            return self._values.get(field, default)
+        pos = self._offsets.get(field)
+        if pos is None or pos >= len(self._values):
+            return default
+        return self._values[pos]
+
+    def path_to(self, field):
+        """ 字段值在原始数据中的路径 (下标 / 键组成的元组)，字段不存在返回 None """
+        if not self.has(field):
+            return None
+        return self.base + ((field,) if self._offsets is None else (self._offsets[field],))
+
+    def fields(self):
+        if self._offsets is None:
+            return [k for k in self._values if k != "__type__"]
+        return [k for k, pos in self._offsets.items() if pos < len(self._values)]
+
+
+class ImportFile:
+    def __init__(self, data):
+        self.data = data
+        self.instances = []
+        self.root_index = 0
+        self._root_pos = 0
+        if isinstance(data, dict):
+            self.instances = [Instance.from_dict(data)]
+        elif isinstance(data, list) and len(data) > F_INSTANCES and isinstance(data[F_INSTANCES], list):
+            self._parse_compact(data)
+        elif isinstance(data, list):
+            self.instances = [Instance.from_dict(d, (i,)) for i, d in enumerate(data) if isinstance(d, dict)]
+
+    def _parse_compact(self, data):
+        classes = data[F_CLASSES] or []
+        masks = data[F_MASKS] or []
+        raw = data[F_INSTANCES]
+        # instances 末尾为数字时表示根对象下标
+        if raw and isinstance(raw[-1], int):
+            self.root_index = raw[-1]
+            raw = raw[:-1]
+        for i, obj in enumerate(raw):
+            if not (isinstance(obj, list) and obj and isinstance(obj[0], int) and obj[0] < len(masks)):
+                continue
+            mask = masks[obj[0]]
+            if not (isinstance(mask, list) and mask and isinstance(mask[0], int) and mask[0] < len(classes)):
+                continue
+            cls_def = classes[mask[0]]
+            if not (isinstance(cls_def, list) and cls_def):
+                continue
+            type_name, offsets = _compile_schema(cls_def, mask)
+            if i == self.root_index:
+                self._root_pos = len(self.instances)
+            self.instances.append(Instance(type_name, offsets, obj, (F_INSTANCES, i)))
+
+    @property
+    def root(self):
+        if not self.instances:
+            return None
+        return self.instances[self._root_pos]
+
+    def find_type(self, type_name):
+        return [inst for inst in self.instances if inst.type == type_name]
+
+    def field(self, name, default=None):
+        """ 先查根对象，再按顺序查其余实例，返回第一个拥有该字段的值 """
+        root = self.root
+        if root is not None and root.has(name):
+            return root.get(name, default)
+        for inst in self.instances:
+            if inst.has(name):
+                return inst.get(name, default)
+        return default
+
+
+def load(data):
+    """ data 为已解析的 import JSON """
+    return ImportFile(data)
+
+
+def native_ext(data):
+    """ 资源原生文件后缀 (_native 字段) """
+    return load(data).field("_native")
+
+
+def root_type(data):
+    root = load(data).root
+    return root.type if root is not None else None
+
+
+def is_skeleton(d):
+    """ Spine 骨骼结构：字典同时包含 skeleton(dict) 和 bones(list) """
+    return isinstance(d, dict) and isinstance(d.get("skeleton"), dict) and isinstance(d.get("bones"), list)
+
+
+def skeleton_json(data):
+    """ sp.SkeletonData 的 _skeletonJson，不是 Spine 骨骼结构时返回 None """
+    skel = load(data).field("_skeletonJson")
+    return skel if is_skeleton(skel) else None
+
+
+def json_payload(data):
+    """ cc.JsonAsset 的 json 字段 """
+    return load(data).field("json")
+
+
+def import_paths(import_root, bundle_name, uuid_str, long_uuid, file_hash):
+    """ 本地 import 文件的候选路径：长 / 短 uuid 各两种格式 """
+    base = os.path.join(import_root, bundle_name, "import", uuid_str[:2])
+    return [os.path.join(base, f"{u}.{file_hash}{ext}") for ext in IMPORT_EXTS for u in (long_uuid, uuid_str)]
+
+
+def find_import_file(import_root, bundle_name, uuid_str, long_uuid, file_hash):
+    return next((p for p in import_paths(import_root, bundle_name, uuid_str, long_uuid, file_hash)
+                 if os.path.exists(p)), None)
+
+
+def read_file(path):
+    """ 读取 import 文件 (.json 或 .cconb)，返回 JSON 文档 """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if ccon_reader.is_ccon(data):
+        return ccon_reader.decode(data).document
+    return json_codec.loads(data)
+
+
+def parse_bytes(data):
+    """ 网络下载的 import 内容，同样自动识别 CCON """
+    if ccon_reader.is_ccon(data):
+        return ccon_reader.decode(data).document
+    return json_codec.loads(data)
@@ -0,0 +1,232 @@
+"""
+根据服务器反馈自适应调整并发 (AIMD)，以及按字节限速的令牌桶。
+
+AdaptiveLimiter 控制同时在途的请求数 limit：
+  慢启动   还没遇到过拥塞时，每个健康的响应 limit +1 (每轮约翻倍)
+  加性增   之后只有在并发被用满且延迟健康时，每个响应 +1/limit (每轮约 +1)
+  乘性减   429 / 5xx / 超时 / 连接错误时 limit 乘以 BACKOFF_RATIO；
+           上次降速之前就已发出的请求再失败不重复降速 (同一波拥塞只减一次，窗口长度自然跟随 RTT)
+延迟健康 = 首字节延迟不超过基线 (最近 BASELINE_WINDOW 个样本的最小值) 的 LATENCY_TOLERANCE 倍。
+404 等正常响应不算拥塞。线程池 / 连接池的大小只是 limit 的上限，实际并发由上面的规则决定。
+
+AsyncAdaptiveLimiter 是同样规则的 asyncio 版本；TokenBucket 的 reserve 返回需要等待的秒数，
+同步和异步代码各自 sleep。
+"""
+import time
+import asyncio
+import threading
+
+# ================= ⚙️ 配置区域 =================
+INITIAL_LIMIT = 8
+MIN_LIMIT = 1
+BACKOFF_RATIO = 0.7
+LATENCY_TOLERANCE = 2.0
+BASELINE_WINDOW = 100
+# ===============================================
+
+
+def is_congestion_status(status):
+    return status == 429 or status >= 500
+
+
+class _AIMD:
+    """ 只负责计算，不加锁；由子类在各自的锁里调用 """
+
+    def __init__(self, max_limit, initial=INITIAL_LIMIT, min_limit=MIN_LIMIT):
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.slow_start = True
+        self.baseline = None
+        self._window_min = float("inf")
+        self._window_n = 0
+        self._last_decrease = 0.0
+        self.counts = {"ok": 0, "congestion": 0, "increases": 0, "decreases": 0}
+
+    def _can_admit(self):
+        return self.inflight < int(self.limit)
+
+    def _admit(self):
+        self.inflight += 1
+        self.peak_inflight = max(self.peak_inflight, self.inflight)
+
+    def _record(self, congested, latency, started):
+        saturated = self.inflight >= int(self.limit)
+        self.inflight -= 1
+        if congested:
+            self.counts["congestion"] += 1
+            if started >= self._last_decrease:
+                self._last_decrease = time.monotonic()
+                self.slow_start = False
+                self.limit = max(self.min_limit, self.limit * BACKOFF_RATIO)
+                self.counts["decreases"] += 1
+            return
+
+        self.counts["ok"] += 1
+        if latency is None:
+            return
+        self._window_min = min(self._window_min, latency)
+        self._window_n += 1
+        if self._window_n >= BASELINE_WINDOW:
+            # 每个窗口重新取最小值，网络环境变化后基线也能跟着变
+            self.baseline = self._window_min
+            self._window_min, self._window_n = float("inf"), 0
+        reference = self.baseline if self.baseline is not None else self._window_min
+        if latency > reference * LATENCY_TOLERANCE:
+            return
+
+        old = int(self.limit)
+        if self.slow_start:
+            self.limit = min(self.max_limit, self.limit + 1)
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        if int(self.limit) > old:
+            self.counts["increases"] += 1
+
+    def stats(self):
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "inflight": self.inflight,
+            "peak_inflight": self.peak_inflight,
+            "baseline_latency": self.baseline,
+            **self.counts,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[-] 🚦 自适应并发: 当前上限 {s['limit']} ({s['min_limit']}-{s['max_limit']})，"
+                f"峰值在途 {s['peak_inflight']}，拥塞信号 {s['congestion']} 次，"
+                f"升 {s['increases']} / 降 {s['decreases']} 次")
+
+
+class _Slot:
+    """ observe(status) 记录响应状态和首字节延迟；块内抛出 Exception 视为拥塞 """
+    __slots__ = ("start", "status", "latency")
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.status = None
+        self.latency = None
+
+    def observe(self, status):
+        self.status = status
+        self.latency = time.monotonic() - self.start
+
+    def _congested(self, exc):
+        if exc is not None:
+            # 取消 (KeyboardInterrupt / CancelledError 等 BaseException) 不算拥塞
+            return isinstance(exc, Exception)
+        return self.status is not None and is_congestion_status(self.status)
+
+
+class AdaptiveLimiter(_AIMD):
+    """ 线程版：with limiter.slot() as slot: resp = ...; slot.observe(resp.status_code) """
+
+    def __init__(self, max_limit, initial=INITIAL_LIMIT, min_limit=MIN_LIMIT):
+        super().__init__(max_limit, initial, min_limit)
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while not self._can_admit():
+                self._cond.wait()
+            self._admit()
+
+    def release(self, congested=False, latency=None, started=None):
+        with self._cond:
+            self._record(congested, latency, time.monotonic() if started is None else started)
+            free = int(self.limit) - self.inflight
+            if free > 0:
+                self._cond.notify(free)
+
+    def slot(self):
+        return _SyncSlot(self)
+
+    def stats(self):
+        with self._cond:
+            return super().stats()
+
+
+class _SyncSlot(_Slot):
+    __slots__ = ("limiter",)
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def __enter__(self):
+        self.limiter.acquire()
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.limiter.release(self._congested(exc), self.latency, self.start)
+        return False
+
+
+class AsyncAdaptiveLimiter(_AIMD):
+    """ asyncio 版：async with limiter.slot() as slot: ... """
+
+    def __init__(self, max_limit, initial=INITIAL_LIMIT, min_limit=MIN_LIMIT):
+        super().__init__(max_limit, initial, min_limit)
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(self._can_admit)
+            self._admit()
+
+    async def release(self, congested=False, latency=None, started=None):
+        async with self._cond:
+            self._record(congested, latency, time.monotonic() if started is None else started)
+            free = int(self.limit) - self.inflight
+            if free > 0:
+                self._cond.notify(free)
+
+    def slot(self):
+        return _AsyncSlot(self)
+
+
+class _AsyncSlot(_Slot):
+    __slots__ = ("limiter",)
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    async def __aenter__(self):
+        await self.limiter.acquire()
+        self.start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.limiter.release(self._congested(exc), self.latency, self.start)
+        return False
+
+
+class TokenBucket:
+    """ rate 字节/秒，burst 为桶容量；reserve(n) 先扣除令牌 (可以透支)，返回需要等待的秒数 """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, n):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def consume(self, n):
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,53 @@
+"""
+按版本寻址的本地 Config 仓库。
+
+config.{ver}.json 的文件名带版本 hash，内容不可变：
+本地 configs/<bundle>/ 下已有同版本文件就直接读取，没有才走网络，并把下载结果写回仓库。
+"""
+import os
+import json_codec
+import http_client
+import atomic_io
+
+# ================= ⚙️ 配置区域 =================
+CONFIG_DIR = "configs"  # 与 1_config_downloader 的 DOWNLOAD_ROOT 一致
+# ===============================================
+
+
+def config_path(bundle_name, bundle_ver, config_dir=CONFIG_DIR):
+    return os.path.join(config_dir, bundle_name, f"config.{bundle_ver}.json")
+
+
+def load_local(bundle_name, bundle_ver, config_dir=CONFIG_DIR):
+    """ 只读本地仓库，不存在或损坏返回 None """
+    if not bundle_ver:
+        return None
+    path = config_path(bundle_name, bundle_ver, config_dir)
+    if not (os.path.exists(path) and os.path.getsize(path) > 0):
+        return None
+    try:
+        return json_codec.load_path(path)
+    except Exception:
+        return None
+
+
+def load_config(base_url, bundle_name, bundle_ver, headers=None, timeout=10, config_dir=CONFIG_DIR):
+    """ 本地优先；未命中时从 {base_url}assets/<bundle>/config.<ver>.json 下载并写回，失败返回 None """
+    config = load_local(bundle_name, bundle_ver, config_dir)
+    if config is not None:
+        return config
+
+    url = f"{base_url}assets/{bundle_name}/config.{bundle_ver}.json"
+    try:
+        resp = http_client.get(url, headers=headers, timeout=timeout)
+        if resp.status_code != 200:
+            return None
+        config = json_codec.loads(resp.content)
+    except Exception:
+        return None
+
+    try:
+        atomic_io.write_bytes_atomic(config_path(bundle_name, bundle_ver, config_dir), resp.content)
+    except OSError as e:
+        print(f"[!] Config 写回本地失败 ({bundle_name}): {e}")
+    return config
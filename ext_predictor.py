@@ -0,0 +1,127 @@
+"""
+原生资源后缀预测器。
+
+按 (资源类型, Bundle 名前缀, 路径前缀) 记录每次真正下载成功的后缀，
+下次同类资源先试历史上命中最多的后缀，把 404 试探压到最少。
+查不到精确键时依次退化到 (类型, Bundle 前缀) 和 (类型)。
+"""
+import os
+import re
+import json_codec
+import threading
+
+# ================= ⚙️ 配置区域 =================
+# 后缀命中统计的持久化文件 (跨运行累积)
+EXT_STATS_FILE = "ext_stats.json"
+# 路径前缀截断长度
+PATH_PREFIX_LEN = 16
+# ===============================================
+
+
+def _bundle_prefix(bundle_name):
+    # Castcast007102 -> Castcast, AdvStillstill102030 -> AdvStillstill
+    m = re.match(r"[A-Za-z_]+", bundle_name or "")
+    return m.group(0) if m else ""
+
+
+def _path_prefix(path_info):
+    if not path_info:
+        return ""
+    head = path_info.split("/", 1)[0]
+    # 数字统一归一化，102005_6 与 102011_2 视为同一类
+    return re.sub(r"\d+", "#", head)[:PATH_PREFIX_LEN]
+
+
+class ExtensionPredictor:
+    def __init__(self, path=EXT_STATS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.counts = {}  # "type|bundle|path" -> {ext: count}
+        self.total = 0
+        self.first_hits = 0
+        self.probes = 0
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            data = json_codec.load_path(self.path)
+            self.counts = data.get("counts", {})
+        except Exception as e:
+            print(f"[!] 后缀统计文件读取失败，将重新学习: {e}")
+            self.counts = {}
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"counts": self.counts}
+            self.dirty = False
+        tmp_path = self.path + ".tmp"
+        json_codec.dump_path(tmp_path, data)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def make_key(resource_type, bundle_name, path_info):
+        return (resource_type or "", _bundle_prefix(bundle_name), _path_prefix(path_info))
+
+    @staticmethod
+    def _levels(key):
+        t, b, p = key
+        return [f"{t}|{b}|{p}", f"{t}|{b}|", f"{t}||"]
+
+    def order(self, key, candidates, pinned=None):
+        """
+        按历史命中次数重排候选后缀；学到的但不在候选里的后缀也会被加在前面。
+        pinned: 来自 import 数据 (_native) 的确定后缀，始终排第一。
+        """
+        ordered = self._rank(key, candidates)
+        if pinned:
+            ordered = [pinned] + [ext for ext in ordered if ext != pinned]
+        return ordered
+
+    def _rank(self, key, candidates):
+        with self.lock:
+            learned = None
+            for level in self._levels(key):
+                if level in self.counts:
+                    learned = self.counts[level]
+                    break
+            if not learned:
+                return list(candidates)
+            ranked = sorted(learned.items(), key=lambda kv: -kv[1])
+        ordered = [ext for ext, _ in ranked]
+        for ext in candidates:
+            if ext not in ordered:
+                ordered.append(ext)
+        return ordered
+
+    def record(self, key, ext, probes):
+        """ probes: 本次命中前一共尝试了几个后缀 (含命中的那一个) """
+        with self.lock:
+            for level in self._levels(key):
+                bucket = self.counts.setdefault(level, {})
+                bucket[ext] = bucket.get(ext, 0) + 1
+            self.total += 1
+            self.probes += probes
+            if probes == 1:
+                self.first_hits += 1
+            self.dirty = True
+
+    def stats(self):
+        with self.lock:
+            return {"total": self.total, "first_hits": self.first_hits, "probes": self.probes}
+
+    def hit_rate(self):
+        with self.lock:
+            return (self.first_hits / self.total) if self.total else 0.0
+
+    def format_stats(self):
+        with self.lock:
+            total, first, probes = self.total, self.first_hits, self.probes
+        if not total:
+            return "[-] 🎯 后缀预测: 本次没有命中记录"
+        return (f"[-] 🎯 后缀预测: 首次命中 {first}/{total} ({first / total:.1%})，"
+                f"平均每个资源 {probes / total:.2f} 次请求")
@@ -0,0 +1,348 @@
+import time
+import threading
+import contextvars
+import concurrent.futures
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import atomic_io
+import concurrency
+import retry_scheduler
+import verifier
+import metrics
+
+# ================= ⚙️ 配置区域 =================
+# 连接池大小，一般与各脚本的 MAX_WORKERS 保持一致 (由 configure 覆盖)
+DEFAULT_POOL_SIZE = 16
+# 同时保留连接池的 Host 数量 (我们基本只访问一个域名)
+POOL_HOSTS = 4
+DEFAULT_TIMEOUT = 10
+# 并发试探后缀时使用的请求方式: "HEAD" 或 "RANGE" (GET + Range: bytes=0-0)
+PROBE_METHOD = "HEAD"
+PROBE_WORKERS = 32
+# 流式下载的分块大小
+CHUNK_SIZE = 256 * 1024
+# 按服务器反馈自适应调整同时在途的请求数 (上限为连接池大小)，False 则只受线程数限制
+ADAPTIVE_CONCURRENCY = True
+# 下载带宽上限 (字节/秒)，0 为不限速
+BANDWIDTH_LIMIT = 0
+# ===============================================
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# 全进程共享一个 Session：urllib3 的连接池本身是线程安全的，
+# 这样每个 Bundle 新建的线程池也能复用之前已经握手好的 TCP/TLS 连接
+_session = None
+_pool_size = DEFAULT_POOL_SIZE
+_session_lock = threading.Lock()
+
+_probe_executor = None
+_limiter = None
+_bucket = concurrency.TokenBucket(BANDWIDTH_LIMIT, max(BANDWIDTH_LIMIT, CHUNK_SIZE)) if BANDWIDTH_LIMIT else None
+# 每个线程一块复用的读缓冲区，避免每个分块重新分配
+_local = threading.local()
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "new_connections": 0}
+
+
+def _count_new_connection():
+    with _stats_lock:
+        _stats["new_connections"] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    """ 替换 urllib3 的连接池类，用于统计新建连接数 (未命中) """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _build_session(pool_size):
+    session = requests.Session()
+    adapter = _PooledAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def configure(pool_size):
+    """ 按 MAX_WORKERS 设置连接池大小 (同时是自适应并发的上限)，需在启动线程池之前调用 """
+    global _session, _pool_size, _limiter
+    with _session_lock:
+        if _session is not None and pool_size == _pool_size:
+            return
+        old = _session
+        _pool_size = pool_size
+        _session = _build_session(pool_size)
+        _limiter = None
+    if old is not None:
+        old.close()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _session_lock:
+            if _limiter is None and ADAPTIVE_CONCURRENCY:
+                _limiter = concurrency.AdaptiveLimiter(_pool_size)
+            elif _limiter is None:
+                # 关闭自适应时上下限都固定为连接池大小，只做统计
+                _limiter = concurrency.AdaptiveLimiter(_pool_size, initial=_pool_size, min_limit=_pool_size)
+    return _limiter
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(_pool_size)
+    return _session
+
+
+def reserve_bandwidth(n):
+    """ 供异步引擎使用：扣除 n 字节的带宽配额，返回需要等待的秒数 (不限速时为 0) """
+    return _bucket.reserve(n) if _bucket is not None else 0.0
+
+
+def _send(method, url, headers, timeout, kwargs):
+    kwargs.setdefault("verify", False)
+    with _stats_lock:
+        _stats["requests"] += 1
+    start = time.monotonic()
+    try:
+        resp = get_session().request(method, url, headers=headers, timeout=timeout, **kwargs)
+    except Exception:
+        metrics.record_request(method, None, time.monotonic() - start)
+        raise
+    # 非流式请求的响应体已经读完；流式下载的字节数由 _copy_body 计入
+    metrics.record_request(method, resp.status_code, time.monotonic() - start,
+                           0 if kwargs.get("stream") else len(resp.content))
+    return resp
+
+
+def _limited(method, url, headers, timeout, kwargs):
+    """ 占用一个并发名额直到响应头返回，并把状态码 / 延迟反馈给限流器 """
+    with get_limiter().slot() as slot:
+        resp = _send(method, url, headers, timeout, kwargs)
+        slot.observe(resp.status_code)
+    return resp
+
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """ 与 requests.get 用法一致，但走共享连接池 (默认 verify=False) """
+    return _limited("GET", url, headers, timeout, kwargs)
+
+
+def head(url, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    kwargs.setdefault("allow_redirects", True)
+    return _limited("HEAD", url, headers, timeout, kwargs)
+
+
+def _probe_one(url, headers, timeout):
+    """ 返回错误分类 (retry_scheduler.classify_status / classify_error) """
+    try:
+        if PROBE_METHOD == "HEAD":
+            resp = head(url, headers=headers, timeout=timeout)
+        else:
+            range_headers = dict(headers or {})
+            range_headers["Range"] = "bytes=0-0"
+            resp = get(url, headers=range_headers, timeout=timeout, stream=True)
+        resp.close()
+        kind = retry_scheduler.classify_status(resp.status_code)
+    except Exception as e:
+        kind = retry_scheduler.classify_error(e)
+    retry_scheduler.breaker_for(url).record(kind != "retry")
+    return kind
+
+
+def _get_probe_executor():
+    global _probe_executor
+    if _probe_executor is None:
+        with _session_lock:
+            if _probe_executor is None:
+                _probe_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+    return _probe_executor
+
+
+def race_probe(urls, headers=None, timeout=DEFAULT_TIMEOUT):
+    """
+    并发试探所有候选 URL (HEAD / 零字节 Range)，返回第一个 2xx 的下标，全部 404 等返回 None。
+    胜出后取消其余尚未发出的试探，调用方只需要再 GET 胜出的那一个。
+    没有胜出者且有候选遇到 5xx / 超时 (结果不可信) 时抛出 retry_scheduler.RetryLater；熔断中抛出 CircuitOpen。
+    """
+    if not urls:
+        return None
+    retry_scheduler.breaker_for(urls[0]).check()
+    executor = _get_probe_executor()
+    # 试探线程沿用调用方的 metrics 上下文，404 计入当前资源
+    futures = {executor.submit(contextvars.copy_context().run, _probe_one, url, headers, timeout): i
+               for i, url in enumerate(urls)}
+    winner = None
+    transient = 0
+    try:
+        for fut in concurrent.futures.as_completed(futures):
+            kind = fut.result()
+            if kind == "ok":
+                winner = futures[fut]
+                break
+            if kind == "retry":
+                transient += 1
+    finally:
+        for fut in futures:
+            fut.cancel()
+    if winner is None and transient:
+        raise retry_scheduler.RetryLater(f"{transient}/{len(urls)} 个后缀试探暂时失败")
+    return winner
+
+
+def _get_buffer():
+    buf = getattr(_local, "buf", None)
+    if buf is None or len(buf) != CHUNK_SIZE:
+        buf = _local.buf = bytearray(CHUNK_SIZE)
+    return buf
+
+
+def _copy_body(resp, f, hasher=None):
+    raw = resp.raw
+    total = 0
+    try:
+        if resp.headers.get("Content-Encoding", "identity") in ("", "identity"):
+            # 未压缩 (图片 / mp3 等绝大多数原生资源)：直接 readinto 到复用缓冲区
+            buf = _get_buffer()
+            view = memoryview(buf)
+            while True:
+                n = raw.readinto(buf)
+                if not n:
+                    break
+                total += n
+                f.write(view[:n])
+                if hasher is not None:
+                    hasher.update(view[:n])
+                if _bucket is not None:
+                    _bucket.consume(n)
+        else:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                total += len(chunk)
+                f.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                if _bucket is not None:
+                    _bucket.consume(len(chunk))
+    finally:
+        # 中途失败的部分同样占用了带宽
+        metrics.add_bytes(total)
+
+
+def write_response_atomic(resp, path, expected_hash=None):
+    """
+    把响应体流式写入同目录下的临时文件，fsync 后原子改名为 path。
+    中途崩溃或超时只会留下 *.part 临时文件，目标路径上永远只有完整文件。
+    expected_hash 为版本 hash 时边写边算 md5，不符则删除临时文件并抛出 verifier.HashMismatch。
+    """
+    if not verifier.should_verify(expected_hash):
+        atomic_io.write_atomic(path, lambda f: _copy_body(resp, f))
+        return
+
+    def write_and_check(f):
+        hasher = verifier.new_hasher()
+        _copy_body(resp, f, hasher)
+        digest = hasher.hexdigest()
+        if verifier.check(digest, expected_hash) is False:
+            raise verifier.HashMismatch(path, expected_hash, digest)
+
+    atomic_io.write_atomic(path, write_and_check)
+
+
+def download_to_file(url, path, headers=None, timeout=DEFAULT_TIMEOUT, expected_hash=None):
+    """
+    流式 + 原子下载，返回 HTTP 状态码 (只有 200 才会写文件)；网络异常照常抛出。
+    传入 expected_hash (版本 hash) 时校验内容，不符抛出 verifier.HashMismatch，文件不会落盘。
+    """
+    mismatch = None
+    # 并发名额一直占用到响应体写完，传输中途超时同样算作拥塞
+    with get_limiter().slot() as slot:
+        resp = _send("GET", url, headers, timeout, {"stream": True})
+        slot.observe(resp.status_code)
+        try:
+            if resp.status_code == 200:
+                try:
+                    write_response_atomic(resp, path, expected_hash)
+                except verifier.HashMismatch as e:
+                    mismatch = e  # 内容损坏不是拥塞信号，离开限流器之后再抛出
+        finally:
+            resp.close()
+    if mismatch is not None:
+        raise mismatch
+    return resp.status_code
+
+
+def fetch_to_file(url, path, headers=None, timeout=DEFAULT_TIMEOUT, expected_hash=None):
+    """
+    供重试调度器驱动的下载：200 返回 True，404 等 (不存在 / 不重试) 返回 False，
+    429 / 5xx / 超时 / 连接错误抛出 retry_scheduler.RetryLater，熔断中抛出 CircuitOpen，
+    内容与 expected_hash 不符抛出 verifier.HashMismatch (同样是 RetryLater，会重新下载)。
+    """
+    breaker = retry_scheduler.breaker_for(url)
+    breaker.check()
+    # 每条路径都要反馈给熔断器，否则半开状态下的试探请求一旦抛出其他异常，熔断器会一直停在 half_open；
+    # 内容不符 (源站有响应) 和本地磁盘错误都不算源站故障
+    origin_ok = True
+    try:
+        status = download_to_file(url, path, headers=headers, timeout=timeout, expected_hash=expected_hash)
+        kind = retry_scheduler.classify_status(status)
+        origin_ok = kind != "retry"
+    except retry_scheduler.RetryLater:
+        raise
+    except Exception as e:
+        if retry_scheduler.classify_error(e) != "retry":
+            raise
+        origin_ok = False
+        raise retry_scheduler.RetryLater(f"{type(e).__name__}: {e}") from e
+    finally:
+        breaker.record(origin_ok)
+    if kind == "retry":
+        raise retry_scheduler.RetryLater(f"HTTP {status}")
+    return kind == "ok"
+
+
+def stats():
+    with _stats_lock:
+        total = _stats["requests"]
+        misses = min(_stats["new_connections"], total)
+    hits = total - misses
+    return {
+        "requests": total,
+        "connection_hits": hits,
+        "connection_misses": misses,
+        "hit_rate": (hits / total) if total else 0.0,
+        "concurrency": get_limiter().stats(),
+        "breaker_trips": retry_scheduler.breaker_trips(),
+    }
+
+
+def format_stats():
+    s = stats()
+    return (f"[-] 🔌 连接复用: 请求 {s['requests']}，复用 {s['connection_hits']}，"
+            f"新建 {s['connection_misses']} (命中率 {s['hit_rate']:.1%})\n"
+            + get_limiter().format_stats())
+
+
+metrics.register_collector("http", stats)
@@ -0,0 +1,61 @@
+"""
+JSON 编解码层。
+
+安装了 orjson 或 msgspec 时自动使用 (解析 import / config 快数倍)，否则回退到标准库 json。
+统一按 bytes 读写文件，省去一次 str 解码；输出始终是 UTF-8，不转义中文/日文。
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+elif msgspec is not None:
+    BACKEND = "msgspec"
+else:
+    BACKEND = "json"
+
+# 各后端解析失败时抛出的异常 (orjson.JSONDecodeError 本身是 ValueError 的子类)
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec is not None else ValueError
+
+
+def loads(data):
+    """ data 可以是 bytes / str / memoryview """
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        return msgspec.json.decode(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(obj, indent=None):
+    """ 返回 UTF-8 bytes；indent 为 None 时输出紧凑格式 """
+    if orjson is not None and indent in (None, 2):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if msgspec is not None:
+        data = msgspec.json.encode(obj)
+        return msgspec.json.format(data, indent=indent) if indent else data
+    # orjson 只支持 2 空格缩进，其他缩进交给标准库
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=indent).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def load_path(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump_path(path, obj, indent=None):
+    with open(path, 'wb') as f:
+        f.write(dumps(obj, indent=indent))
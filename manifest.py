@@ -0,0 +1,134 @@
+"""
+下载清单 (SQLite)。
+
+以 (bundle, uuid, kind, hash) 为键记录已经落盘的 import / native 文件，
+uuid 使用 config 里的原始写法 (压缩短码)，kind 为 "import" 或 "native"。
+规划任务时按 Bundle 批量查询，代替逐个文件的 os.path.exists / getsize 和整树 os.walk。
+verified=1 表示文件内容的 md5 已与版本 hash 核对过 (见 verifier)。
+"""
+import os
+import time
+import sqlite3
+import threading
+
+# ================= ⚙️ 配置区域 =================
+MANIFEST_FILE = "manifest.sqlite3"
+# 累积多少条记录提交一次事务
+BATCH_SIZE = 200
+# ===============================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    bundle  TEXT NOT NULL,
+    uuid    TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    hash    TEXT NOT NULL,
+    path    TEXT NOT NULL,
+    size    INTEGER NOT NULL,
+    ext     TEXT,
+    updated REAL NOT NULL,
+    verified INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bundle, uuid, kind, hash)
+)
+"""
+
+
+class DownloadManifest:
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(_SCHEMA)
+        # 旧版清单没有 verified 列
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        if "verified" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN verified INTEGER NOT NULL DEFAULT 0")
+        self.conn.commit()
+
+    def lookup_bundle(self, bundle, kind):
+        """ 返回 {(uuid, hash): (path, size, ext, verified)}，供规划阶段批量判断是否跳过 """
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT uuid, hash, path, size, ext, verified FROM files WHERE bundle = ? AND kind = ?",
+                (bundle, kind)).fetchall()
+        return {(u, h): (p, size, ext, bool(v)) for u, h, p, size, ext, v in rows}
+
+    def lookup(self, bundle, uuid, kind, file_hash):
+        """ 单条记录 (path, size, ext, verified)，没有返回 None；工作线程调用，只查已提交的记录，不触发 flush """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT path, size, ext, verified FROM files WHERE bundle = ? AND uuid = ? AND kind = ? AND hash = ?",
+                (bundle, uuid, kind, file_hash)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2], bool(row[3])
+
+    def rows(self, verified=None):
+        """ [(bundle, uuid, kind, hash, path, updated)]；verified 为 True / False 时只返回对应的记录 """
+        self.flush()
+        sql = "SELECT bundle, uuid, kind, hash, path, updated FROM files"
+        with self.lock:
+            if verified is None:
+                return self.conn.execute(sql).fetchall()
+            return self.conn.execute(sql + " WHERE verified = ?", (int(verified),)).fetchall()
+
+    def record(self, bundle, uuid, kind, file_hash, path, ext=None, size=None, verified=False):
+        """ 下载完成后调用；攒够 BATCH_SIZE 条在一个事务里写入 """
+        if size is None:
+            size = os.path.getsize(path)
+        with self.lock:
+            self.pending.append((bundle, uuid, kind, file_hash, path, size, ext, time.time(), int(verified)))
+            if len(self.pending) < BATCH_SIZE:
+                return
+            self._flush_locked()
+
+    def forget(self, bundle, uuid, kind, file_hash):
+        with self.lock:
+            self._flush_locked()
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM files WHERE bundle = ? AND uuid = ? AND kind = ? AND hash = ?",
+                    (bundle, uuid, kind, file_hash))
+
+    def mark_verified(self, keys):
+        """ keys: [(bundle, uuid, kind, hash), ...] """
+        with self.lock:
+            self._flush_locked()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE files SET verified = 1 WHERE bundle = ? AND uuid = ? AND kind = ? AND hash = ?", keys)
+
+    def forget_many(self, keys):
+        """ keys: [(bundle, uuid, kind, hash), ...]，一个事务删除 """
+        with self.lock:
+            self._flush_locked()
+            with self.conn:
+                self.conn.executemany(
+                    "DELETE FROM files WHERE bundle = ? AND uuid = ? AND kind = ? AND hash = ?", keys)
+
+    def _flush_locked(self):
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def count(self, kind=None):
+        self.flush()
+        with self.lock:
+            if kind:
+                return self.conn.execute("SELECT COUNT(*) FROM files WHERE kind = ?", (kind,)).fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,457 @@
+"""
+下载流水线的运行指标：按阶段 / Bundle 统计请求数、流量、耗时，后缀试探的 404 浪费、重试次数、延迟分布和线程利用率。
+
+请求由 http_client / async_engine 记录，归属到当前线程 (或协程) 所在的 task(bundle) 上下文；
+BundleScheduler 与各脚本的工作函数用 task() 包住单个资源任务，顺带统计该资源命中之前收到的 404 次数。
+http_client / verifier / async_engine 等模块用 register_collector 注册各自已有的统计，导出时一并写出。
+
+脚本开头调用 start(阶段名, 线程数)，之后每 EXPORT_INTERVAL 秒、以及 finish() (或进程退出) 时写出：
+  metrics/<阶段名>.json   JSON 汇总
+  metrics/<阶段名>.prom   Prometheus 文本格式 (可交给 node_exporter 的 textfile collector)
+"""
+import os
+import time
+import atexit
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+import json_codec
+import retry_scheduler
+
+# ================= ⚙️ 配置区域 =================
+METRICS_DIR = "metrics"
+# 运行期间定时导出的间隔 (秒)，0 为只在结束时导出
+EXPORT_INTERVAL = 30
+METRIC_PREFIX = "dmm"
+# Prometheus 文件中是否输出按 Bundle 的指标 (Bundle 很多时可以关闭，JSON 中始终保留)
+PROM_PER_BUNDLE = True
+# 请求延迟 (到响应头) 与单个任务耗时的分桶上界 (秒)
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 每个成功的资源在命中之前收到的 404 次数分桶
+PROBE_BUCKETS = (0, 1, 2, 3, 5, 8)
+# ===============================================
+
+RESULTS = ("ok", "missing", "retry", "fail", "error")
+
+_lock = threading.Lock()
+_scope = contextvars.ContextVar("metrics_scope", default=None)
+_run = {"name": None, "stage": "main", "workers": None, "started": time.time(), "finished": False}
+_stages = {}   # stage -> 统计
+_bundles = {}  # (stage, bundle) -> 统计
+_collectors = {}
+_stop = threading.Event()
+_thread = None
+
+
+class Histogram:
+    """ Prometheus 风格的累积分桶 (le)，另外给出按桶估算的分位数 """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """ 落在第 q 分位的桶的上界；超出最大桶时返回最大上界 """
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return self.bounds[-1]
+
+    def cumulative(self):
+        out, seen = [], 0
+        for bound, n in zip(self.bounds + ("+Inf",), self.counts):
+            seen += n
+            out.append((bound, seen))
+        return out
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {str(bound): n for bound, n in self.cumulative()},
+        }
+
+
+class _Scope:
+    __slots__ = ("stage", "bundle", "missing", "ok")
+
+    def __init__(self, stage, bundle):
+        self.stage = stage
+        self.bundle = bundle
+        self.missing = 0
+        self.ok = None
+
+
+def _new_counts():
+    return {"requests": 0, "bytes": 0, "request_seconds": 0.0, "missing": 0,
+            "tasks": 0, "ok": 0, "failed": 0, "errors": 0, "retries": 0, "deferrals": 0,
+            "busy_seconds": 0.0, "first": None, "last": None}
+
+
+def _stage_stats(stage):
+    s = _stages.get(stage)
+    if s is None:
+        s = _stages[stage] = _new_counts()
+        s.update(results=dict.fromkeys(RESULTS, 0),
+                 workers=None, busy_now=0, peak_busy=0,
+                 latency={}, task_seconds=Histogram(TASK_BUCKETS), probe_misses=Histogram(PROBE_BUCKETS))
+    return s
+
+
+def _targets(stage, bundle):
+    """ 需要同时累加的统计：阶段 + (有 Bundle 时) 该阶段下的 Bundle """
+    targets = [_stage_stats(stage)]
+    if bundle:
+        b = _bundles.get((stage, bundle))
+        if b is None:
+            b = _bundles[(stage, bundle)] = _new_counts()
+        targets.append(b)
+    return targets
+
+
+def _touch(d, start, end):
+    if d["first"] is None or start < d["first"]:
+        d["first"] = start
+    if d["last"] is None or end > d["last"]:
+        d["last"] = end
+
+
+def current_stage():
+    scope = _scope.get()
+    return scope.stage if scope is not None else _run["stage"]
+
+
+def _current():
+    scope = _scope.get()
+    if scope is not None:
+        return scope, scope.stage, scope.bundle
+    return None, _run["stage"], None
+
+
+# --- 记录 ---
+
+def set_workers(workers, stage=None):
+    with _lock:
+        _stage_stats(stage or current_stage())["workers"] = workers
+
+
+@contextmanager
+def task(bundle=None, stage=None):
+    """
+    包住一个资源任务 (一次尝试)：with metrics.task(bundle) as t: t.ok = ...
+    块内发出的请求计入该 Bundle；正常结束时按 t.ok 计成功 / 失败，抛出异常 (重试 / 出错) 计入 errors。
+    """
+    scope = _Scope(stage or current_stage(), bundle)
+    token = _scope.set(scope)
+    start = time.monotonic()
+    with _lock:
+        s = _stage_stats(scope.stage)
+        s["busy_now"] += 1
+        s["peak_busy"] = max(s["peak_busy"], s["busy_now"])
+    failed = True
+    try:
+        yield scope
+        failed = False
+    finally:
+        _scope.reset(token)
+        end = time.monotonic()
+        with _lock:
+            targets = _targets(scope.stage, bundle)
+            s = targets[0]
+            s["busy_now"] -= 1
+            for d in targets:
+                d["busy_seconds"] += end - start
+                _touch(d, start, end)
+                if failed:
+                    d["errors"] += 1
+                else:
+                    d["tasks"] += 1
+                    d["ok" if scope.ok else "failed"] += 1
+            if not failed:
+                s["task_seconds"].observe(end - start)
+                if scope.ok:
+                    s["probe_misses"].observe(scope.missing)
+
+
+def record_request(method, status, latency=None, nbytes=0):
+    """ status 为 None 表示请求异常 (超时 / 连接错误)；latency 为到响应头的秒数 """
+    result = "error" if status is None else retry_scheduler.classify_status(status)
+    scope, stage, bundle = _current()
+    now = time.monotonic()
+    with _lock:
+        targets = _targets(stage, bundle)
+        s = targets[0]
+        s["results"][result] += 1
+        for d in targets:
+            d["requests"] += 1
+            d["bytes"] += nbytes
+            if latency is not None:
+                d["request_seconds"] += latency
+            if result == "missing":
+                d["missing"] += 1
+            _touch(d, now - (latency or 0.0), now)
+        if latency is not None:
+            hist = s["latency"].get(method)
+            if hist is None:
+                hist = s["latency"][method] = Histogram(LATENCY_BUCKETS)
+            hist.observe(latency)
+        if scope is not None and result == "missing":
+            scope.missing += 1
+
+
+def add_bytes(nbytes):
+    """ 流式下载的响应体字节数 (响应头已由 record_request 计入请求数) """
+    if not nbytes:
+        return
+    _, stage, bundle = _current()
+    with _lock:
+        for d in _targets(stage, bundle):
+            d["bytes"] += nbytes
+
+
+def record_retry(kind, stage=None, bundle=None):
+    """
+    kind: "retries" (暂时性失败退避重试) / "deferrals" (熔断延后)，同时计入阶段与 Bundle；
+    stage / bundle 不传时取当前 metrics.task 的 (在任务内部重试的调用方不必自己传)
+    """
+    _, cur_stage, cur_bundle = _current()
+    with _lock:
+        for d in _targets(stage or cur_stage, bundle or cur_bundle):
+            d[kind] += 1
+
+
+def register_collector(name, fn):
+    """ fn() 返回 (可嵌套的) dict，导出时原样写入 JSON，数值项写入 Prometheus """
+    with _lock:
+        _collectors[name] = fn
+
+
+# --- 汇总 ---
+
+def _span(d):
+    return (d["last"] - d["first"]) if d["first"] is not None else 0.0
+
+
+def _plain(d):
+    out = {k: v for k, v in d.items() if k not in ("first", "last")}
+    out["request_seconds"] = round(out["request_seconds"], 3)
+    out["busy_seconds"] = round(out["busy_seconds"], 3)
+    out["span_seconds"] = round(_span(d), 3)
+    return out
+
+
+def snapshot():
+    with _lock:
+        stages = {}
+        for stage, s in _stages.items():
+            out = _plain(s)
+            workers = s["workers"] or _run["workers"]
+            span = _span(s)
+            out["workers"] = workers
+            out["utilization"] = round(s["busy_seconds"] / (workers * span), 4) if workers and span else None
+            out["latency"] = {m: h.to_dict() for m, h in s["latency"].items()}
+            out["task_seconds"] = s["task_seconds"].to_dict()
+            out["probe_misses"] = s["probe_misses"].to_dict()
+            stages[stage] = out
+        bundles = {}
+        for (stage, bundle), b in _bundles.items():
+            bundles.setdefault(stage, {})[bundle] = _plain(b)
+        collectors = dict(_collectors)
+    collected = {}
+    for name, fn in collectors.items():
+        try:
+            collected[name] = fn()
+        except Exception as e:
+            collected[name] = {"error": str(e)}
+    return {
+        "name": _run["name"],
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_run["started"])),
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "elapsed": round(time.time() - _run["started"], 3),
+        "final": _run["finished"],
+        "stages": stages,
+        "bundles": bundles,
+        "collectors": collected,
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _sample(name, labels, value):
+    if labels:
+        inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        return f"{name}{{{inner}}} {value}"
+    return f"{name} {value}"
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}_{k}", v, out)
+    elif isinstance(value, bool):
+        out.append((prefix, int(value)))
+    elif isinstance(value, (int, float)):
+        out.append((prefix, value))
+
+
+def to_prometheus(snap):
+    p = METRIC_PREFIX
+    families = {}  # 名称 -> (类型, 说明, [行])
+
+    def add(name, kind, help_text, labels, value):
+        if value is None:
+            return
+        families.setdefault(f"{p}_{name}", (kind, help_text, []))[2].append(_sample(f"{p}_{name}", labels, value))
+
+    def add_hist(name, help_text, labels, hist):
+        fam = families.setdefault(f"{p}_{name}", ("histogram", help_text, []))[2]
+        for bound, n in hist["buckets"].items():
+            fam.append(_sample(f"{p}_{name}_bucket", labels + [("le", bound)], n))
+        fam.append(_sample(f"{p}_{name}_sum", labels, hist["sum"]))
+        fam.append(_sample(f"{p}_{name}_count", labels, hist["count"]))
+
+    for stage, s in snap["stages"].items():
+        sl = [("stage", stage)]
+        for result, n in s["results"].items():
+            add("requests_total", "counter", "HTTP 请求数 (按结果分类)", sl + [("result", result)], n)
+        add("response_bytes_total", "counter", "下载的响应体字节数", sl, s["bytes"])
+        add("request_seconds_total", "counter", "等待响应头的累计秒数", sl, s["request_seconds"])
+        for result in ("ok", "failed", "errors"):
+            add("tasks_total", "counter", "资源任务数 (errors 为抛出异常的尝试)", sl + [("result", result)], s[result])
+        for kind in ("retries", "deferrals"):
+            add("retries_total", "counter", "任务重新入队次数", sl + [("kind", kind)], s[kind])
+        add("busy_seconds_total", "counter", "工作线程处理任务的累计秒数", sl, s["busy_seconds"])
+        add("span_seconds", "gauge", "阶段第一个到最后一个任务 / 请求的时间跨度", sl, s["span_seconds"])
+        add("workers", "gauge", "线程数 (异步引擎为在途上限)", sl, s["workers"])
+        add("busy_workers", "gauge", "当前正在处理任务的线程数", sl, s["busy_now"])
+        add("worker_utilization", "gauge", "busy_seconds / (workers * span_seconds)", sl, s["utilization"])
+        for method, hist in s["latency"].items():
+            add_hist("request_latency_seconds", "到响应头的延迟", sl + [("method", method)], hist)
+        add_hist("task_seconds", "单个资源任务耗时", sl, s["task_seconds"])
+        add_hist("probe_misses_per_asset", "每个成功的资源命中前收到的 404 次数", sl, s["probe_misses"])
+
+    if PROM_PER_BUNDLE:
+        for stage, bundles in snap["bundles"].items():
+            for bundle, b in bundles.items():
+                bl = [("stage", stage), ("bundle", bundle)]
+                add("bundle_requests_total", "counter", "按 Bundle 的请求数", bl, b["requests"])
+                add("bundle_missing_total", "counter", "按 Bundle 的 404 等请求数", bl, b["missing"])
+                add("bundle_response_bytes_total", "counter", "按 Bundle 的下载字节数", bl, b["bytes"])
+                add("bundle_busy_seconds_total", "counter", "按 Bundle 的任务累计秒数", bl, b["busy_seconds"])
+                add("bundle_span_seconds", "gauge", "按 Bundle 的时间跨度", bl, b["span_seconds"])
+                add("bundle_failed_total", "counter", "按 Bundle 的失败任务数", bl, b["failed"])
+                for kind in ("retries", "deferrals"):
+                    add("bundle_retries_total", "counter", "按 Bundle 的任务重新入队次数", bl + [("kind", kind)], b[kind])
+
+    for name, data in snap["collectors"].items():
+        flat = []
+        _flatten(name, data, flat)
+        for key, value in flat:
+            add(key, "gauge", f"{name} 模块统计", [], value)
+    add("last_export_timestamp_seconds", "gauge", "最近一次导出的时间", [], round(time.time(), 3))
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def _write(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def output_paths():
+    base = os.path.join(METRICS_DIR, _run["name"] or _run["stage"])
+    return base + ".json", base + ".prom"
+
+
+def export():
+    """ 写出 JSON 汇总与 Prometheus 文本文件，返回两个路径 """
+    snap = snapshot()
+    json_path, prom_path = output_paths()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _write(json_path, json_codec.dumps(snap, indent=2))
+    _write(prom_path, to_prometheus(snap).encode("utf-8"))
+    return json_path, prom_path
+
+
+def _export_loop():
+    while not _stop.wait(EXPORT_INTERVAL):
+        try:
+            export()
+        except Exception:
+            pass
+
+
+def start(name, workers=None):
+    """ 脚本开头调用：name 同时是默认阶段名和输出文件名；开始定时导出，进程退出时自动 finish() """
+    global _thread
+    _run.update(name=name, stage=name, workers=workers, started=time.time(), finished=False)
+    if workers:
+        set_workers(workers, name)
+    atexit.register(finish)
+    if EXPORT_INTERVAL > 0 and _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=_export_loop, name="metrics-export", daemon=True)
+        _thread.start()
+
+
+def finish():
+    """ 停止定时导出并写出最终结果 (可重复调用) """
+    global _thread
+    if _run["finished"] or _run["name"] is None:
+        return
+    _stop.set()
+    if _thread is not None:
+        _thread.join()
+        _thread = None
+    _run["finished"] = True
+    try:
+        export()
+    except Exception as e:
+        print(f"[!] 指标导出失败: {e}")
+
+
+def format_stats():
+    snap = snapshot()
+    lines = []
+    for stage, s in snap["stages"].items():
+        if not s["requests"] and not s["tasks"]:
+            continue
+        line = f"[-] 📈 {stage}: 请求 {s['requests']} 次 (404 等 {s['missing']})，下载 {s['bytes'] / 1024 / 1024:.1f} MB"
+        get = s["latency"].get("GET")
+        if get and get["count"]:
+            line += f"，GET 延迟 p50≤{get['p50']}s / p95≤{get['p95']}s"
+        if s["utilization"] is not None:
+            line += f"，线程利用率 {s['utilization']:.0%}"
+        probes = s["probe_misses"]
+        if probes["count"]:
+            line += f"，每个资源平均 404 {probes['sum'] / probes['count']:.2f} 次"
+        if s["retries"] or s["deferrals"]:
+            line += f"，重试 {s['retries']} / 延后 {s['deferrals']}"
+        lines.append(line)
+    json_path, prom_path = output_paths()
+    lines.append(f"[-] 📈 运行指标: {os.path.abspath(json_path)} / {os.path.basename(prom_path)}")
+    return "\n".join(lines)
@@ -0,0 +1,214 @@
+"""
+非阻塞重试 + 按 Host 熔断。
+
+错误分类 (classify_status / classify_error)：
+  ok       2xx
+  missing  404 / 403 / 410，后缀试探落空是常态，不重试
+  retry    429 / 5xx / 超时 / 连接错误
+  fail     其余状态码，不重试
+暂时性失败由工作函数抛出 RetryLater，BundleScheduler 把整个任务交给 RetryTimer，
+按指数退避 + 抖动延迟后重新投递线程池，等待期间不占用工作线程。
+没有使用 BundleScheduler 的脚本 (config / import 下载) 用 call_with_retry 在当前线程里退避重试。
+
+CircuitBreaker 统计每个 Host 连续的暂时性失败，达到 FAILURE_THRESHOLD 后熔断 OPEN_SECONDS：
+期间不再向该 Host 发请求 (直接抛出 CircuitOpen，任务延后到熔断结束)，
+到期后只放行一个试探请求 (半开)，成功则恢复，失败则熔断时间加倍 (最多 MAX_OPEN_SECONDS)。
+"""
+import time
+import errno
+import heapq
+import random
+import threading
+from urllib.parse import urlsplit
+
+# ================= ⚙️ 配置区域 =================
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+# 熔断导致的延后不计入 MAX_ATTEMPTS，但超过这个次数同样放弃
+MAX_DEFERRALS = 50
+FAILURE_THRESHOLD = 8
+OPEN_SECONDS = 5.0
+MAX_OPEN_SECONDS = 120.0
+# ===============================================
+
+MISSING_STATUS = (403, 404, 410)
+
+# 本地文件系统的错误 (磁盘满、只读、权限等)，与源站无关，不重试也不计入熔断
+_LOCAL_ERRNOS = {getattr(errno, name) for name in
+                 ("ENOSPC", "EDQUOT", "EROFS", "EACCES", "EPERM", "EMFILE", "ENFILE", "EISDIR", "ENOTDIR")
+                 if hasattr(errno, name)}
+
+
+class RetryLater(Exception):
+    """ 暂时性失败，delay 为建议的最短等待秒数 (None 则按退避计算) """
+
+    def __init__(self, reason, delay=None):
+        super().__init__(reason)
+        self.delay = delay
+
+
+class CircuitOpen(RetryLater):
+    def __init__(self, host, delay):
+        super().__init__(f"{host} 熔断中", delay)
+        self.host = host
+
+
+def classify_status(status):
+    if 200 <= status < 300:
+        return "ok"
+    if status in MISSING_STATUS:
+        return "missing"
+    if status == 429 or status >= 500:
+        return "retry"
+    return "fail"
+
+
+def is_local_error(exc):
+    """ 读写本地文件时的 OSError (带文件名，或 errno 属于磁盘 / 权限类) """
+    return isinstance(exc, OSError) and (exc.filename is not None or exc.errno in _LOCAL_ERRNOS)
+
+
+def classify_error(exc):
+    # requests 的超时 / 连接错误、socket.timeout、aiohttp.ClientOSError 都是 OSError 的子类；本地磁盘错误除外
+    if isinstance(exc, OSError) and not is_local_error(exc):
+        return "retry"
+    return "fail"
+
+
+def backoff_delay(attempt):
+    """ 第 attempt 次重试的等待时间：指数退避，在 [d/2, d] 之间随机，避免所有任务同时重试 """
+    d = min(MAX_DELAY, BASE_DELAY * (2 ** attempt))
+    return d / 2 + random.uniform(0, d / 2)
+
+
+def call_with_retry(fn, *args, on_retry=None, **kwargs):
+    """
+    没有接入 BundleScheduler 的简单脚本用：fn 抛出 RetryLater (含内容校验失败) 时在当前线程退避后重新调用，
+    最多 MAX_ATTEMPTS 次，熔断延后不计次数 (最多 MAX_DEFERRALS 次)；用尽后抛出最后一次的 RetryLater。
+    on_retry(kind) 在每次等待前调用，kind 为 "retries" / "deferrals"。
+    """
+    attempt = deferrals = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except CircuitOpen as e:
+            if deferrals >= MAX_DEFERRALS:
+                raise
+            deferrals += 1
+            if on_retry:
+                on_retry("deferrals")
+            time.sleep(e.delay)
+        except RetryLater as e:
+            if attempt + 1 >= MAX_ATTEMPTS:
+                raise
+            delay = max(e.delay or 0, backoff_delay(attempt))
+            attempt += 1
+            if on_retry:
+                on_retry("retries")
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    def __init__(self, host):
+        self.host = host
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.open_seconds = OPEN_SECONDS
+        self.open_until = 0.0
+        self.trips = 0
+
+    def check(self):
+        """ 发请求前调用；熔断中抛出 CircuitOpen """
+        with self.lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            if self.state == "open" and now >= self.open_until:
+                # 半开：只放行当前这一个试探请求
+                self.state = "half_open"
+                return
+            delay = max(self.open_until - now, BASE_DELAY)
+        raise CircuitOpen(self.host, delay)
+
+    def record(self, ok):
+        """ ok=False 仅用于暂时性失败 (429 / 5xx / 网络错误)，404 等说明源站正常，应记为 True """
+        with self.lock:
+            if ok:
+                self.failures = 0
+                if self.state != "closed":
+                    self.state = "closed"
+                    self.open_seconds = OPEN_SECONDS
+                return
+            self.failures += 1
+            if self.state == "half_open":
+                self.open_seconds = min(self.open_seconds * 2, MAX_OPEN_SECONDS)
+                self._trip()
+            elif self.state == "closed" and self.failures >= FAILURE_THRESHOLD:
+                self._trip()
+
+    def _trip(self):
+        self.state = "open"
+        self.open_until = time.monotonic() + self.open_seconds
+        self.trips += 1
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(url):
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def breaker_trips():
+    with _breakers_lock:
+        return sum(b.trips for b in _breakers.values())
+
+
+class RetryTimer:
+    """ 单个后台线程按到期时间执行回调 (通常是把任务重新提交到线程池) """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []
+        self.seq = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._loop, name="retry-timer", daemon=True)
+        self.thread.start()
+
+    def schedule(self, delay, fn):
+        with self.cond:
+            self.seq += 1
+            heapq.heappush(self.heap, (time.monotonic() + delay, self.seq, fn))
+            self.cond.notify()
+
+    def __len__(self):
+        with self.cond:
+            return len(self.heap)
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.closed and (not self.heap or self.heap[0][0] > time.monotonic()):
+                    timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+                    self.cond.wait(timeout)
+                if self.closed:
+                    return
+                _, _, fn = heapq.heappop(self.heap)
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
@@ -0,0 +1,104 @@
+"""
+Spine 骨骼数据定位器。
+
+按顺序尝试三种策略，并按 Bundle 统计各策略命中次数：
+  learned  同一 import schema 上次命中的位置 (实例 / 字段偏移) 直接取值
+  field    按 class schema 读取各实例的 _skeletonJson 字段
+  search   显式栈深度优先搜索，找到第一个骨骼结构立即返回，不会进入已匹配的子树，也不受递归深度限制
+命中后把位置记为该 schema 的 learned 路径，后续同类文件只需一次取值。
+"""
+import threading
+import cocos_import
+
+STRATEGIES = ("learned", "field", "search")
+
+
+def schema_key(data):
+    """ 同一类 import 文件的结构签名 """
+    if isinstance(data, dict):
+        return ("dict", data.get("__type__"))
+    if isinstance(data, list):
+        if len(data) > cocos_import.F_INSTANCES and isinstance(data[cocos_import.F_CLASSES], list):
+            return tuple((c[0], tuple(c[1]) if len(c) > 1 and isinstance(c[1], list) else ())
+                         for c in data[cocos_import.F_CLASSES] if isinstance(c, list) and c)
+        return ("list", tuple(d.get("__type__") for d in data if isinstance(d, dict)))
+    return None
+
+
+def follow_path(data, path):
+    node = data
+    try:
+        for step in path:
+            node = node[step]
+    except (IndexError, KeyError, TypeError):
+        return None
+    return node
+
+
+def search_skeleton(data):
+    """ 返回 (骨骼 dict, 路径)；显式栈迭代，字符串和数字不入栈 """
+    stack = [(data, ())]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, dict):
+            if cocos_import.is_skeleton(node):
+                return node, path
+            # 逆序压栈，保证与递归版本相同的遍历顺序
+            for k, v in reversed(list(node.items())):
+                if isinstance(v, (dict, list)):
+                    stack.append((v, path + (k,)))
+        elif isinstance(node, list):
+            for i in range(len(node) - 1, -1, -1):
+                v = node[i]
+                if isinstance(v, (dict, list)):
+                    stack.append((v, path + (i,)))
+    return None, None
+
+
+class SkeletonLocator:
+    def __init__(self):
+        self.learned = {}  # schema_key -> 路径
+        self.stats = {}    # bundle -> {strategy: 次数}
+        self.lock = threading.Lock()
+
+    def _count(self, bundle_name, strategy):
+        with self.lock:
+            per_bundle = self.stats.setdefault(bundle_name, {})
+            per_bundle[strategy] = per_bundle.get(strategy, 0) + 1
+
+    def locate(self, data, bundle_name=None):
+        """ 返回 (骨骼 dict, 命中策略)；找不到时为 (None, None) """
+        key = schema_key(data)
+
+        path = self.learned.get(key)
+        if path is not None:
+            skel = follow_path(data, path)
+            if cocos_import.is_skeleton(skel):
+                self._count(bundle_name, "learned")
+                return skel, "learned"
+
+        skel, path = None, None
+        for inst in cocos_import.load(data).instances:
+            candidate = inst.get("_skeletonJson")
+            if cocos_import.is_skeleton(candidate):
+                skel, path, strategy = candidate, inst.path_to("_skeletonJson"), "field"
+                break
+        if skel is None:
+            skel, path = search_skeleton(data)
+            strategy = "search"
+
+        if skel is None:
+            self._count(bundle_name, "miss")
+            return None, None
+        if key is not None:
+            self.learned[key] = path
+        self._count(bundle_name, strategy)
+        return skel, strategy
+
+    def format_stats(self, bundle_name=None):
+        items = [(bundle_name, self.stats.get(bundle_name, {}))] if bundle_name else sorted(self.stats.items())
+        lines = []
+        for b_name, counts in items:
+            parts = [f"{s} {counts[s]}" for s in STRATEGIES + ("miss",) if counts.get(s)]
+            lines.append(f"[-] 🦴 {b_name}: {', '.join(parts) if parts else '无 Spine 资源'}")
+        return "\n".join(lines)
@@ -0,0 +1,128 @@
+"""
+Cocos Creator UUID 编解码 (所有脚本共用，避免各自复制一份)。
+
+压缩格式：22 位 = 2 位原样保留的十六进制前缀 + 20 位 base64 (15 字节)，
+可带 '_' 前缀 (23 位) 或 '@xxx' 子资源后缀；无法识别的输入原样返回。
+
+    python uuid_codec.py           # 运行编解码基准测试
+"""
+import base64
+import binascii
+from functools import lru_cache
+
+# ================= ⚙️ 配置区域 =================
+CACHE_SIZE = 1 << 18  # 全量目录约几十万个 uuid
+# ===============================================
+
+_HEX_LEN = 30   # 15 字节
+
+
+def _split_suffix(uuid_str):
+    pos = uuid_str.find("@")
+    if pos < 0:
+        return uuid_str, ""
+    return uuid_str[:pos], uuid_str[pos:]
+
+
+def _format(prefix, hex_s):
+    return f"{prefix}{hex_s[0:6]}-{hex_s[6:10]}-{hex_s[10:14]}-{hex_s[14:18]}-{hex_s[18:]}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def decompress_uuid(uuid_str):
+    """ 22/23 位短码 (可带 @ 后缀) -> 36 位标准 UUID """
+    base_uuid, suffix = _split_suffix(uuid_str) if "@" in uuid_str else (uuid_str, "")
+    if len(base_uuid) == 23 and base_uuid[0] == '_':
+        base_uuid = base_uuid[1:]
+    if len(base_uuid) != 22:
+        return uuid_str
+    try:
+        hex_s = binascii.hexlify(base64.b64decode(base_uuid[2:].replace('-', '+').replace('_', '/'))).decode('ascii')
+    except (binascii.Error, ValueError):
+        return uuid_str
+    return _format(base_uuid[:2], hex_s) + suffix
+
+
+def decompress_many(uuids):
+    """
+    批量解压整个 config 的 uuids 数组：所有 base64 部分拼接后只调用一次 b64decode / hexlify。
+    (每段恰好 20 个字符 = 15 字节，不需要填充，可以直接拼接)
+    """
+    result = list(uuids)
+    rows = [i for i, u in enumerate(result) if len(u) == 22]
+    if not rows:
+        return [decompress_uuid(u) for u in result]
+
+    try:
+        payload = "".join([result[i][2:] for i in rows]).replace('-', '+').replace('_', '/')
+        hex_all = binascii.hexlify(base64.b64decode(payload, validate=True)).decode('ascii')
+    except (binascii.Error, ValueError):
+        # 其中有非法字符，逐个解码 (非法的原样保留)
+        return [decompress_uuid(u) for u in result]
+
+    hexes = [hex_all[p:p + _HEX_LEN] for p in range(0, len(hex_all), _HEX_LEN)]
+    if len(rows) == len(result):
+        return [f"{u[:2]}{h[:6]}-{h[6:10]}-{h[10:14]}-{h[14:18]}-{h[18:]}" for u, h in zip(result, hexes)]
+    for i, h in zip(rows, hexes):
+        result[i] = f"{result[i][:2]}{h[:6]}-{h[6:10]}-{h[10:14]}-{h[14:18]}-{h[18:]}"
+    # 带 '_' 前缀或 '@' 后缀的少数 uuid 走逐个解码
+    for i, u in enumerate(result):
+        if len(u) != 36:
+            result[i] = decompress_uuid(u)
+    return result
+
+
+def compress_uuid(long_uuid):
+    """ 36 位标准 UUID (可带 @ 后缀) -> 22 位短码；不是标准 UUID 时原样返回 """
+    base_uuid, suffix = _split_suffix(long_uuid)
+    hex_s = base_uuid.replace('-', '')
+    if len(base_uuid) != 36 or len(hex_s) != 32:
+        return long_uuid
+    try:
+        b64 = base64.b64encode(binascii.unhexlify(hex_s[2:])).decode('ascii')
+    except (binascii.Error, ValueError):
+        return long_uuid
+    return hex_s[:2] + b64 + suffix
+
+
+def compress_many(long_uuids):
+    return [compress_uuid(u) for u in long_uuids]
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    def _legacy_decompress(uuid_str):
+        # 各脚本原来的逐个实现，作为对照
+        if len(uuid_str) != 22 and len(uuid_str) != 23: return uuid_str
+        temp_uuid = uuid_str[1:] if uuid_str.startswith('_') else uuid_str
+        try:
+            b64 = temp_uuid[2:].replace('-', '+').replace('_', '/')
+            pad = len(b64) % 4
+            if pad > 0: b64 += '=' * (4 - pad)
+            hex_s = binascii.hexlify(base64.b64decode(b64)).decode('utf-8')
+            return _format(temp_uuid[:2], hex_s)
+        except Exception:
+            return uuid_str
+
+    count = 200_000
+    longs = [_format(os.urandom(1).hex(), os.urandom(15).hex()) for _ in range(count)]
+    shorts = compress_many(longs)
+    assert decompress_many(shorts) == longs
+    assert [_legacy_decompress(u) for u in shorts] == longs
+    assert decompress_uuid(shorts[0] + "@6c48a") == longs[0] + "@6c48a"
+
+    def bench(name, fn):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        print(f"  {name:<22} {dt * 1000:8.1f} ms  ({count / dt / 1e6:.2f} M/s)")
+
+    print(f"=== UUID 解压基准 ({count} 个) ===")
+    bench("逐个 (原实现)", lambda: [_legacy_decompress(u) for u in shorts])
+    decompress_uuid.cache_clear()
+    bench("逐个 (缓存未命中)", lambda: [decompress_uuid(u) for u in shorts])
+    bench("逐个 (缓存命中)", lambda: [decompress_uuid(u) for u in shorts])
+    bench("批量 decompress_many", lambda: decompress_many(shorts))
+    bench("批量 compress_many", lambda: compress_many(longs))
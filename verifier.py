@@ -0,0 +1,184 @@
+"""
+按 Cocos 版本 hash 校验文件内容。
+
+config 中 import / native 的版本 hash (也就是文件名 <uuid>.<hash>.<ext> 中间那段) 是文件内容 md5 的前几位，
+下载时边写边算 md5，与 hash 不符的文件不会落盘 (抛出 HashMismatch，由重试调度器重新下载)。
+清单中 verified=1 的记录规划时直接信任，不再读取文件；已存在但未校验过的文件在下载器里读一遍校验。
+
+安全阀：如果最先校验的 AUTO_DISABLE_AFTER 个文件全部不符 (说明源站的 hash 不是按内容 md5 生成的)，
+自动关闭校验，避免把所有下载都当成损坏。本地已有文件 (可能本来就是旧版本) 的校验不计入安全阀。
+
+    python verifier.py            # 多线程校验清单中所有未校验的文件，不符的删除并移出清单，下次运行会重新下载
+    python verifier.py all        # 清单中已校验过的也重新校验
+"""
+import os
+import sys
+import hashlib
+import threading
+import concurrent.futures
+from tqdm import tqdm
+import retry_scheduler
+import metrics
+
+# ================= ⚙️ 配置区域 =================
+VERIFY_DOWNLOADS = True
+AUTO_DISABLE_AFTER = 20
+VERIFY_WORKERS = 8
+READ_SIZE = 1024 * 1024
+# ===============================================
+
+_HEX = set("0123456789abcdef")
+
+_lock = threading.Lock()
+_counts = {"match": 0, "mismatch": 0}
+_disabled = not VERIFY_DOWNLOADS
+
+
+class HashMismatch(retry_scheduler.RetryLater):
+    def __init__(self, path, expected, actual):
+        super().__init__(f"内容校验失败: {os.path.basename(path)} (hash {expected}，实际 md5 {actual[:len(expected)]})")
+        self.expected = expected
+        self.actual = actual
+
+
+def is_verifiable(version_hash):
+    return bool(version_hash) and len(version_hash) <= 32 and set(version_hash.lower()) <= _HEX
+
+
+def active():
+    return not _disabled
+
+
+def should_verify(version_hash):
+    return active() and is_verifiable(version_hash)
+
+
+def trusted(verified, version_hash):
+    """ 规划阶段：清单记录已校验过，或 hash 本身无法校验时直接跳过；其余重新入队，由下载器读一遍文件校验 """
+    return verified or not should_verify(version_hash)
+
+
+def hash_from_url(url):
+    """ .../<uuid>.<hash>.<ext> 中的 hash，没有则返回 None """
+    parts = url.rsplit("/", 1)[-1].split(".")
+    return parts[1] if len(parts) >= 3 else None
+
+
+def new_hasher():
+    return hashlib.md5()
+
+
+def check(hexdigest, version_hash, count=True):
+    """ 返回是否一致；count 为 True 时计入安全阀。校验已关闭时返回 None """
+    global _disabled
+    if _disabled:
+        return None
+    ok = hexdigest.startswith(version_hash.lower())
+    if not count:
+        return ok
+    with _lock:
+        _counts["match" if ok else "mismatch"] += 1
+        if not ok and not _counts["match"] and _counts["mismatch"] >= AUTO_DISABLE_AFTER and not _disabled:
+            _disabled = True
+            print(f"\n[!] 前 {_counts['mismatch']} 个文件的内容 md5 都与版本 hash 不符，已自动关闭内容校验")
+            return None
+    return ok
+
+
+def hash_file(path):
+    hasher = new_hasher()
+    buf = bytearray(READ_SIZE)
+    view = memoryview(buf)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def verify_file(path, version_hash, count=True):
+    """ True 一致 / False 不符 / None 无法校验 (hash 不是 md5 前缀、校验已关闭或文件不可读) """
+    if not should_verify(version_hash):
+        return None
+    try:
+        digest = hash_file(path)
+    except OSError:
+        return None
+    return check(digest, version_hash, count)
+
+
+def existing_ok(path, version_hash):
+    """ 下载器的跳过判断：文件存在且非空，并且内容与版本 hash 不冲突 (无法校验的视为可用) """
+    if not (os.path.exists(path) and os.path.getsize(path) > 0):
+        return False
+    return verify_file(path, version_hash, count=False) is not False
+
+
+def stats():
+    with _lock:
+        return dict(_counts, active=active())
+
+
+def format_stats():
+    s = stats()
+    state = "" if s["active"] else " (已关闭)"
+    return f"[-] 🔐 内容校验{state}: 一致 {s['match']}，不符 {s['mismatch']}"
+
+
+metrics.register_collector("verify", stats)
+
+
+def _verify_row(row):
+    bundle, uuid, kind, file_hash, path, _ = row
+    if not os.path.exists(path):
+        return row, "missing"
+    ok = verify_file(path, file_hash)
+    if ok is None:
+        return row, "skipped"
+    return row, "ok" if ok else "bad"
+
+
+def verify_manifest(recheck=False, workers=VERIFY_WORKERS):
+    """ 批量校验清单中的文件：一致的标记 verified，不符的删除，不符和已丢失的移出清单 """
+    import manifest
+    dm = manifest.DownloadManifest()
+    # 原生文件按资源路径命名，新版本会覆盖同一个文件：每个路径只校验最新的一条记录
+    latest = {}
+    for row in dm.rows():
+        if row[4] not in latest or row[5] > latest[row[4]][5]:
+            latest[row[4]] = row
+    verified = {row[:4] for row in dm.rows(verified=True)}
+    rows = [row for row in latest.values() if recheck or row[:4] not in verified]
+    print(f"[-] 待校验: {len(rows)} 个文件 ({workers} 线程)")
+    results = {"ok": [], "bad": [], "missing": [], "skipped": []}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for row, status in tqdm(executor.map(_verify_row, rows), total=len(rows), unit="file"):
+            results[status].append(row)
+
+    if not active():
+        # 安全阀触发：hash 不是内容 md5，之前判为不符的结果也不可信
+        results["skipped"] += results.pop("bad")
+        results["bad"] = []
+
+    for bundle, uuid, kind, file_hash, path, _ in results["bad"]:
+        tqdm.write(f"[!] 内容不符，已删除: {path}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    dm.mark_verified([row[:4] for row in results["ok"]])
+    dm.forget_many([row[:4] for row in results["bad"] + results["missing"]])
+    dm.close()
+
+    print("\n" + "=" * 30)
+    print(f"✅ 一致 {len(results['ok'])}，❌ 不符 {len(results['bad'])}，"
+          f"丢失 {len(results['missing'])}，无法校验 {len(results['skipped'])}")
+    if results["bad"] or results["missing"]:
+        print("不符 / 丢失的文件已移出清单，重新运行对应的下载脚本即可补全。")
+    print(format_stats())
+
+
+if __name__ == "__main__":
+    verify_manifest(recheck=sys.argv[1:] == ["all"])
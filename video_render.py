@@ -0,0 +1,246 @@
+"""
+视频渲染后端。
+
+concat 后端：compile_timeline 先把连续相同的帧合并成 [(图片, 精确时长)]，
+再用 ffmpeg concat demuxer 以可变帧率编码，每张不同的图片只解码、编码一次，时间点与原始 time 一致。
+concat demuxer 要求所有输入是同一种编码，.jpg / .png 混用的序列 auto 模式下直接交给管道后端。
+ffmpeg 管道后端：小线程池解码图片，原始 RGB 帧经管道按固定帧率流式写入 ffmpeg，
+同一时刻内存中最多只有 MAX_BUFFERED_FRAMES 张解码后的图片。
+都不可用或出错时回退到 moviepy (旧实现)。
+
+segments 为 [(图片路径, 持续秒数), ...]
+"""
+import os
+import shutil
+import tempfile
+import subprocess
+import collections
+import concurrent.futures
+
+# ================= ⚙️ 配置区域 =================
+DEFAULT_FPS = 30
+DECODE_WORKERS = 4
+MAX_BUFFERED_FRAMES = 8
+X264_PRESET = "medium"
+X264_CRF = 18
+# 关键帧间隔小于该值时使用默认时长 (与原 video_maker 一致)
+DEFAULT_FRAME_DURATION = 0.033
+# mp4 时间基 (每秒刻度数)，1000 即毫秒精度
+VFR_TIMESCALE = 1000
+# ===============================================
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def find_ffmpeg():
+    """ 优先 PATH 中的 ffmpeg，其次 moviepy 依赖的 imageio-ffmpeg 自带的二进制 """
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def compile_timeline(keys, resolve_image, default_duration=DEFAULT_FRAME_DURATION):
+    """
+    把动画 keys 编译成 [(图片路径, 时长)]：
+    每个 key 的时长为与下一个 key 的 time 差 (不足 1ms 或最后一帧用 default_duration)，
+    图片缺失的 key 跳过，连续相同图片合并为一段。resolve_image(idx) 返回图片路径或 None。
+    """
+    segments = []
+    for i, key in enumerate(keys):
+        img_path = resolve_image(key.get("idx", 0))
+        if not img_path:
+            continue
+
+        duration = default_duration
+        if i < len(keys) - 1:
+            diff = keys[i + 1].get("time", 0) - key.get("time", 0)
+            if diff > 0.001: duration = diff
+
+        if segments and segments[-1][0] == img_path:
+            segments[-1] = (img_path, segments[-1][1] + duration)
+        else:
+            segments.append((img_path, duration))
+    return segments
+
+
+def _concat_quote(path):
+    return "'" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+
+_EXT_CODEC = {".jpeg": ".jpg"}
+
+
+def image_codecs(segments):
+    """ 序列中用到的图片格式 (按扩展名，.jpeg 与 .jpg 视为同一种) """
+    codecs = set()
+    for path, _ in segments:
+        ext = os.path.splitext(path)[1].lower()
+        codecs.add(_EXT_CODEC.get(ext, ext))
+    return codecs
+
+
+def render_concat(segments, output_path, fps=DEFAULT_FPS):
+    """ concat demuxer + 可变帧率：每段只输出一帧，时间戳精确到 1/VFR_TIMESCALE 秒 (不使用 fps) """
+    codecs = image_codecs(segments)
+    if len(codecs) > 1:
+        raise ValueError(f"concat 后端不支持混用的图片格式: {sorted(codecs)}")
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("找不到 ffmpeg")
+
+    if Image is not None:
+        # 与管道 / moviepy 后端一致：小图原样居中不放大，只有超出画布时才等比缩小
+        w, h = canvas_size([p for p, _ in segments])
+        vf = (f"scale='min(iw,{w})':'min(ih,{h})':force_original_aspect_ratio=decrease,"
+              f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,format=yuv420p")
+    else:
+        vf = "pad=ceil(iw/2)*2:ceil(ih/2)*2,format=yuv420p"
+
+    lines = ["ffconcat version 1.0"]
+    for path, duration in segments:
+        lines.append(f"file {_concat_quote(path)}")
+        lines.append(f"duration {duration:.6f}")
+    # concat demuxer 会忽略最后一个 duration，需要把最后一帧再列一次
+    lines.append(f"file {_concat_quote(segments[-1][0])}")
+
+    fd, list_path = tempfile.mkstemp(suffix=".ffconcat", text=True)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        cmd = [ffmpeg, "-y", "-loglevel", "error",
+               "-f", "concat", "-safe", "0", "-i", list_path,
+               "-an", "-vf", vf, "-vsync", "vfr",
+               "-c:v", "libx264", "-preset", X264_PRESET, "-crf", str(X264_CRF),
+               "-video_track_timescale", str(VFR_TIMESCALE), output_path]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg 退出码 {result.returncode}: {result.stderr.decode('utf-8', 'replace')[-500:]}")
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def canvas_size(paths):
+    """ 与 moviepy compose 一致：取所有图片的最大宽高 (只读文件头)，并补成偶数以满足 yuv420p """
+    w = h = 0
+    for p in set(paths):
+        with Image.open(p) as img:
+            w = max(w, img.width)
+            h = max(h, img.height)
+    return w + w % 2, h + h % 2
+
+
+def _decode_frame(path, size):
+    """ 解码为 RGB 并居中贴到黑色画布上，返回原始字节 """
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        if img.size != size:
+            canvas = Image.new("RGB", size)
+            canvas.paste(img, ((size[0] - img.width) // 2, (size[1] - img.height) // 2))
+            img = canvas
+        return img.tobytes()
+
+
+def frame_counts(segments, fps):
+    """ 按累计时间取整分配帧数，避免逐段四舍五入的误差累积 """
+    counts = []
+    t = 0.0
+    for _, duration in segments:
+        start = round(t * fps)
+        t += duration
+        counts.append(max(round(t * fps) - start, 0))
+    return counts
+
+
+def render_ffmpeg(segments, output_path, fps=DEFAULT_FPS, workers=DECODE_WORKERS, max_buffered=MAX_BUFFERED_FRAMES):
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("找不到 ffmpeg")
+    if Image is None:
+        raise RuntimeError("未安装 Pillow")
+
+    size = canvas_size([p for p, _ in segments])
+    counts = frame_counts(segments, fps)
+    cmd = [ffmpeg, "-y", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+           "-an", "-c:v", "libx264", "-preset", X264_PRESET, "-crf", str(X264_CRF), "-pix_fmt", "yuv420p",
+           output_path]
+
+    with tempfile.TemporaryFile() as err_log, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=err_log)
+        pending = collections.deque()
+        prev_path, prev_future = None, None
+        try:
+            for (path, _), count in zip(segments, counts):
+                if count == 0:
+                    continue
+                # 连续重复的图片只解码一次
+                if path != prev_path:
+                    prev_path, prev_future = path, executor.submit(_decode_frame, path, size)
+                pending.append((prev_future, count))
+                # 解码窗口有上限，保证内存占用有界
+                while len(pending) >= max_buffered:
+                    future, n = pending.popleft()
+                    frame = future.result()
+                    for _ in range(n):
+                        proc.stdin.write(frame)
+            while pending:
+                future, n = pending.popleft()
+                frame = future.result()
+                for _ in range(n):
+                    proc.stdin.write(frame)
+            proc.stdin.close()
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        if proc.wait() != 0:
+            err_log.seek(0)
+            raise RuntimeError(f"ffmpeg 退出码 {proc.returncode}: {err_log.read().decode('utf-8', 'replace')[-500:]}")
+    return output_path
+
+
+def render_moviepy(segments, output_path, fps=DEFAULT_FPS):
+    from moviepy.editor import ImageClip, concatenate_videoclips
+
+    clips = [ImageClip(path).set_duration(duration) for path, duration in segments]
+    final_clip = concatenate_videoclips(clips, method="compose")
+    final_clip.write_videofile(output_path, fps=fps, codec="libx264", audio=False)
+    return output_path
+
+
+BACKENDS = {
+    "concat": render_concat,
+    "ffmpeg": render_ffmpeg,
+    "moviepy": render_moviepy,
+}
+
+
+def render(segments, output_path, fps=DEFAULT_FPS, backend="auto"):
+    """
+    backend: "auto" 依次尝试 concat -> ffmpeg 管道 -> moviepy；也可指定 BACKENDS 中的某一个。
+    返回实际使用的后端。
+    """
+    order = list(BACKENDS) if backend == "auto" else [backend]
+    if backend == "auto" and len(image_codecs(segments)) > 1:
+        # 混用格式时 concat demuxer 会输出损坏的流，直接使用逐帧解码的管道后端
+        order.remove("concat")
+    for name in order:
+        try:
+            BACKENDS[name](segments, output_path, fps)
+            return name
+        except Exception as e:
+            if backend != "auto" or name == order[-1]:
+                raise
+            print(f"[!] {name} 渲染失败，尝试下一个后端: {e}")
+            if os.path.exists(output_path):
+                os.remove(output_path)